@@ -0,0 +1,167 @@
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+# Risk score histogram: RISK_BINS equal-width bins over [0, 1]
+RISK_BINS = 20
+
+# Sliding windows (seconds), each made of WINDOW_BUCKETS time buckets
+WINDOWS = {"1m": 60, "5m": 300, "1h": 3600}
+WINDOW_BUCKETS = 12
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def risk_bin(risk: float) -> int:
+    return min(max(int(risk * RISK_BINS), 0), RISK_BINS - 1)
+
+
+def event_time(event: dict) -> Optional[float]:
+    """Epoch seconds of an event's ISO "timestamp" (None if missing or unparseable)."""
+    ts = event.get("timestamp")
+    if not ts:
+        return None
+    try:
+        parsed = datetime.fromisoformat(ts.rstrip("Z"))
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def to_us(ts: Optional[float]) -> int:
+    return int(round(ts * 1_000_000)) if ts is not None else 0
+
+
+def format_us(us: int) -> str:
+    """
+    Microseconds since the epoch as the "...Z" timestamp the app writes. Always
+    six fraction digits, so timestamps compare correctly as strings.
+    """
+    return (_EPOCH + timedelta(microseconds=int(us))).isoformat(timespec="microseconds") + "Z"
+
+
+def window_bucket(span: int, ts: float) -> int:
+    return int(ts // (span / WINDOW_BUCKETS))
+
+
+def risk_percentiles(histogram: List[int], quantiles=(0.5, 0.9, 0.99)) -> Dict[str, float]:
+    """Percentiles interpolated linearly inside the histogram bins."""
+    total = sum(histogram)
+    out = {}
+    for q in quantiles:
+        key = f"p{round(q * 100):d}"
+        if total == 0:
+            out[key] = 0.0
+            continue
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(histogram):
+            if n and seen + n >= rank:
+                out[key] = round((i + (rank - seen) / n) / RISK_BINS, 4)
+                break
+            seen += n
+    return out
+
+
+def summarize(count: int, fraud: int, risk_sum: float, histogram: List[int], windows: Dict[str, tuple]) -> dict:
+    """Common response shape for both the in-memory and the Redis aggregates."""
+    return {
+        "count": count,
+        "fraud_count": fraud,
+        "fraud_rate": round(fraud / count, 4) if count > 0 else 0,
+        "risk_mean": round(risk_sum / count, 4) if count > 0 else 0,
+        "risk_histogram": histogram,
+        "risk_percentiles": risk_percentiles(histogram),
+        "windows": {
+            name: {
+                "count": w_count,
+                "fraud_count": w_fraud,
+                "fraud_rate": round(w_fraud / w_count, 4) if w_count > 0 else 0,
+                "risk_mean": round(w_risk / w_count, 4) if w_count > 0 else 0,
+            }
+            for name, (w_count, w_fraud, w_risk) in windows.items()
+        },
+    }
+
+
+class _Window:
+    """WINDOW_BUCKETS rotating time buckets covering the last `span` seconds."""
+
+    def __init__(self, span: int):
+        self.span = span
+        self.bucket_ids = [None] * WINDOW_BUCKETS
+        self.counts = [0] * WINDOW_BUCKETS
+        self.fraud = [0] * WINDOW_BUCKETS
+        self.risk = [0.0] * WINDOW_BUCKETS
+
+    def add(self, ts: float, is_fraud: bool, risk: float, now: float, sign: int = 1):
+        bucket = window_bucket(self.span, min(ts, now))
+        if bucket <= window_bucket(self.span, now) - WINDOW_BUCKETS:
+            return  # older than the window
+        slot = bucket % WINDOW_BUCKETS
+        if self.bucket_ids[slot] != bucket:
+            if sign < 0:
+                return  # its bucket has already rotated out
+            self.bucket_ids[slot] = bucket
+            self.counts[slot] = self.fraud[slot] = 0
+            self.risk[slot] = 0.0
+        self.counts[slot] += sign
+        self.fraud[slot] += sign * is_fraud
+        self.risk[slot] += sign * risk
+
+    def totals(self, now: float) -> tuple:
+        oldest = window_bucket(self.span, now) - WINDOW_BUCKETS
+        count = fraud = 0
+        risk = 0.0
+        for slot, bucket in enumerate(self.bucket_ids):
+            if bucket is not None and bucket > oldest:
+                count += self.counts[slot]
+                fraud += self.fraud[slot]
+                risk += self.risk[slot]
+        return count, fraud, risk
+
+
+class RunningStats:
+    """
+    Running aggregates of an event store, updated on every insert / delete so
+    analytics never scan the events. Totals follow the events currently retained;
+    windows count events by their timestamp and ignore capacity evictions.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.fraud = 0
+        self.risk_sum = 0.0
+        self.histogram = [0] * RISK_BINS
+        self.windows = {name: _Window(span) for name, span in WINDOWS.items()}
+
+    def _apply(self, event: dict, sign: int, windows: bool):
+        is_fraud = bool(event.get("is_fraud"))
+        risk = float(event.get("risk_score") or 0.0)
+        self.count += sign
+        self.fraud += sign * is_fraud
+        self.risk_sum += sign * risk
+        self.histogram[risk_bin(risk)] += sign
+
+        if windows:
+            now = time.time()
+            ts = event_time(event)
+            if ts is None:
+                if sign < 0:
+                    return
+                ts = now
+            for window in self.windows.values():
+                window.add(ts, is_fraud, risk, now, sign)
+
+    def add(self, event: dict):
+        self._apply(event, 1, windows=True)
+
+    def remove(self, event: dict, evicted: bool = False):
+        self._apply(event, -1, windows=not evicted)
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        windows = {name: window.totals(now) for name, window in self.windows.items()}
+        return summarize(self.count, self.fraud, self.risk_sum, list(self.histogram), windows)
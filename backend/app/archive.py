@@ -0,0 +1,533 @@
+"""
+Columnar archive of scored transactions.
+
+Transactions evicted from the in-memory store are kept here instead of being
+dropped. They collect in an in-memory buffer and are written as immutable
+segments of ARCHIVE_SEGMENT_ROWS rows (until written, rows are queried from
+that sorted buffer directly). Each segment is a directory of NumPy
+columns:
+
+    ts_us.npy       int64 microseconds since the epoch (rows sorted by it)
+    risk.npy        float32 risk score
+    fraud.npy       bool is_fraud
+    features.npy    float64 (rows, len(feature_names)) model features
+    id.npy          int32 codes into the segment's string dictionary
+    user.npy        int32 codes into the segment's string dictionary
+    strings.npy     uint8 UTF-8 bytes of the dictionary strings
+    offsets.npy     int64 start of string i (and the end of the last one)
+
+Its meta.json holds the row count and min / max timestamp, so a time-range
+query opens only the segments that overlap the range, and inside one, binary
+searches ts_us. Workers sharing the directory each write their own segments
+and pick up each other's with refresh(), at most every ARCHIVE_REFRESH_S. Columns are memory-mapped: reading a page touches a few
+pages of each file, and analytics reduce whole columns with NumPy.
+
+SHAP explanations and behaviour snapshots are not archived (they are most of
+an event's size); explanations can be recomputed from the stored features.
+Neither is a caller-supplied "occurred_at": rows are ordered by the store's
+insert "timestamp".
+"""
+import asyncio
+import bisect
+import heapq
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.analytics import RISK_BINS, event_time, format_us, to_us
+from app.config import settings
+from app.fraud.model import FEATURE_NAMES
+from app.store import event_key
+
+_COLUMNS = ("ts_us", "risk", "fraud", "features", "id", "user", "strings", "offsets")
+
+
+class Segment:
+    """One sorted run of archived rows, as columns (memory-mapped once written)."""
+
+    def __init__(self, columns: Dict[str, np.ndarray], feature_names: List[str], path: Optional[str] = None):
+        self.columns = columns
+        self.feature_names = feature_names
+        self.path = path
+        ts = columns["ts_us"]
+        self.rows = len(ts)
+        self.min_us = int(ts[0]) if self.rows else 0
+        self.max_us = int(ts[-1]) if self.rows else 0
+
+    @classmethod
+    def build(cls, events: List[dict], feature_names: List[str]) -> "Segment":
+        """Columns for a list of events, sorted by timestamp."""
+        ts = np.fromiter((to_us(event_time(e)) for e in events), dtype=np.int64, count=len(events))
+        order = np.argsort(ts, kind="stable")
+        events = [events[i] for i in order]
+
+        codes: Dict[str, int] = {}
+        ids = np.fromiter((codes.setdefault(e["id"], len(codes)) for e in events), dtype=np.int32, count=len(events))
+        users = np.fromiter((codes.setdefault(str(e.get("user_id")), len(codes)) for e in events), dtype=np.int32, count=len(events))
+        encoded = [s.encode() for s in codes]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+        features = np.array(
+            [[e["features"].get(name, np.nan) for name in feature_names] for e in events], dtype=np.float64
+        ).reshape(len(events), len(feature_names))
+        columns = {
+            "ts_us": ts[order],
+            "risk": np.fromiter((e.get("risk_score") or 0.0 for e in events), dtype=np.float32, count=len(events)),
+            "fraud": np.fromiter((bool(e.get("is_fraud")) for e in events), dtype=bool, count=len(events)),
+            "features": features,
+            "id": ids,
+            "user": users,
+            "strings": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            "offsets": offsets,
+        }
+        return cls(columns, feature_names)
+
+    def save(self, path: str):
+        """Writes the columns to a temporary directory, then renames it into place."""
+        tmp = path + ".tmp"
+        os.makedirs(tmp, exist_ok=True)
+        for name in _COLUMNS:
+            np.save(os.path.join(tmp, f"{name}.npy"), self.columns[name])
+        meta = {
+            "rows": self.rows, "min_ts_us": self.min_us, "max_ts_us": self.max_us,
+            "fraud": int(self.columns["fraud"].sum()), "feature_names": self.feature_names,
+            "created_at": time.time(),
+        }
+        with open(os.path.join(tmp, "meta.json"), "w") as fp:
+            json.dump(meta, fp)
+        os.replace(tmp, path)
+        self.path = path
+
+    @classmethod
+    def load(cls, path: str) -> "Segment":
+        with open(os.path.join(path, "meta.json")) as fp:
+            meta = json.load(fp)
+        columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in _COLUMNS}
+        return cls(columns, meta["feature_names"], path)
+
+    def string(self, code: int) -> str:
+        offsets = self.columns["offsets"]
+        return bytes(self.columns["strings"][offsets[code]:offsets[code + 1]]).decode()
+
+    def bounds(self, since_us: Optional[int], until_us: Optional[int]) -> Tuple[int, int]:
+        """Row slice [lo, hi) with since_us <= ts_us <= until_us."""
+        ts = self.columns["ts_us"]
+        lo = int(np.searchsorted(ts, since_us, "left")) if since_us is not None else 0
+        hi = int(np.searchsorted(ts, until_us, "right")) if until_us is not None else self.rows
+        return lo, max(hi, lo)
+
+    def row(self, i: int) -> dict:
+        c = self.columns
+        return {
+            "id": self.string(int(c["id"][i])),
+            "timestamp": format_us(c["ts_us"][i]),
+            "user_id": self.string(int(c["user"][i])),
+            "features": dict(zip(self.feature_names, c["features"][i].tolist())),
+            "risk_score": float(c["risk"][i]),
+            "is_fraud": bool(c["fraud"][i]),
+            "explanations": None,
+            "archived": True,
+        }
+
+    def iter_newest(self, since_us: Optional[int], until_us: Optional[int]) -> Iterator[Tuple[int, dict]]:
+        lo, hi = self.bounds(since_us, until_us)
+        ts = self.columns["ts_us"]
+        for i in range(hi - 1, lo - 1, -1):
+            yield int(ts[i]), self.row(i)
+
+
+if os.name == "nt":
+    import ctypes
+
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    _PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    _STILL_ACTIVE = 259
+    _ERROR_ACCESS_DENIED = 5
+
+    def _pid_alive(pid: int) -> bool:
+        # os.kill(pid, 0) would send CTRL_C_EVENT here: ask for the process' exit code instead
+        handle = _kernel32.OpenProcess(_PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return ctypes.get_last_error() == _ERROR_ACCESS_DENIED
+        try:
+            code = ctypes.c_ulong()
+            if not _kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+                return True
+            return code.value == _STILL_ACTIVE
+        finally:
+            _kernel32.CloseHandle(handle)
+else:
+    def _pid_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+
+def _writer_pid(name: str) -> Optional[int]:
+    """The pid in a segment directory name (seg-<ms>-<pid>-<rand>[.tmp])."""
+    try:
+        return int(name.split("-")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def _writer_alive(name: str) -> bool:
+    """Whether the process that named segment directory `name` is still running (another process)."""
+    pid = _writer_pid(name)
+    if pid is None or pid == os.getpid():
+        return False
+    return _pid_alive(pid)
+
+
+class _Buffer:
+    """
+    Archived rows not in a built segment yet, as raw events kept sorted by
+    timestamp (evictions arrive in order, so appends are O(1)). Queried like a
+    Segment, without building columns on the event loop.
+    """
+
+    def __init__(self):
+        self.events: List[dict] = []
+        self.ts: List[int] = []
+
+    @property
+    def rows(self) -> int:
+        return len(self.ts)
+
+    @property
+    def min_us(self) -> int:
+        return self.ts[0] if self.ts else 0
+
+    @property
+    def max_us(self) -> int:
+        return self.ts[-1] if self.ts else 0
+
+    def append(self, event: dict):
+        ts = to_us(event_time(event))
+        if not self.ts or ts >= self.ts[-1]:
+            self.events.append(event)
+            self.ts.append(ts)
+        else:
+            i = bisect.bisect_right(self.ts, ts)
+            self.events.insert(i, event)
+            self.ts.insert(i, ts)
+
+    def iter_newest(self, since_us: Optional[int], until_us: Optional[int]) -> Iterator[Tuple[int, dict]]:
+        lo = bisect.bisect_left(self.ts, since_us) if since_us is not None else 0
+        hi = bisect.bisect_right(self.ts, until_us) if until_us is not None else self.rows
+        # Copies of the range: the loop keeps appending while a page is read
+        for ts, event in zip(reversed(self.ts[lo:hi]), reversed(self.events[lo:hi])):
+            yield ts, {**event, "timestamp": format_us(ts), "explanations": None, "archived": True}
+
+
+class TransactionArchive:
+    """
+    Evicted transactions: buffered until ARCHIVE_SEGMENT_ROWS are collected,
+    then written as a segment on a background thread (rows waiting for the
+    writer are still queryable). A directory of "" disables the archive.
+    """
+
+    def __init__(self, directory: str, segment_rows: int, feature_names: List[str], refresh_s: float = 0.0):
+        self.directory = directory
+        self.segment_rows = segment_rows
+        self.feature_names = list(feature_names)
+        self.refresh_s = refresh_s
+        self.segments: List[Segment] = []
+        self._loaded = set()  # names of the segment directories in self.segments
+        self._refreshed_at = 0.0
+        self._pending = _Buffer()
+        self._sealed: List[_Buffer] = []  # full segments not yet on disk
+        self._lock = threading.Lock()
+        self._writer: Optional[ThreadPoolExecutor] = None
+        # Running row totals, so count() doesn't touch the segments
+        self._disk_rows = 0
+        self._sealed_rows = 0
+        self.write_errors = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def open(self):
+        """
+        Maps the segments already on disk. Leftover .tmp directories of writers
+        that are gone are removed (other workers may share the directory).
+        """
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        segments = []
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp"):
+                if not _writer_alive(name):
+                    for f in os.listdir(path):
+                        os.remove(os.path.join(path, f))
+                    os.rmdir(path)
+            elif name.startswith("seg-"):
+                segments.append(Segment.load(path))
+        with self._lock:
+            self.segments = segments
+            self._loaded = {os.path.basename(segment.path) for segment in segments}
+            self._disk_rows = sum(segment.rows for segment in segments)
+        self._refreshed_at = time.monotonic()
+
+    def refresh_due(self) -> bool:
+        return self.enabled and time.monotonic() - self._refreshed_at >= self.refresh_s
+
+    def refresh(self):
+        """
+        Maps segments written by other processes since the last open() / refresh().
+        This process' own segments are added by its writer thread (while being
+        written they are still queried from their buffer).
+        """
+        if not self.refresh_due():
+            return
+        self._refreshed_at = time.monotonic()
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            new = [
+                name for name in names
+                if name.startswith("seg-") and not name.endswith(".tmp")
+                and name not in self._loaded and _writer_pid(name) != os.getpid()
+            ]
+        segments = []
+        for name in new:
+            try:
+                segments.append(Segment.load(os.path.join(self.directory, name)))
+            except (OSError, ValueError):
+                continue  # unreadable: tried again on the next refresh
+        with self._lock:
+            for segment in segments:
+                name = os.path.basename(segment.path)
+                if name not in self._loaded:
+                    self._loaded.add(name)
+                    self.segments.append(segment)
+                    self._disk_rows += segment.rows
+
+    def append(self, event: dict):
+        """Archives one evicted event (called by the store on eviction)."""
+        if not self.enabled:
+            return
+        self._pending.append({
+            "id": event["id"],
+            "timestamp": event.get("timestamp"),
+            "user_id": event.get("user_id"),
+            "features": event.get("features") or {},
+            "risk_score": event.get("risk_score"),
+            "is_fraud": event.get("is_fraud"),
+        })
+        if self._pending.rows >= self.segment_rows:
+            self._seal()
+
+    def _seal(self):
+        """Hands the buffer to the writer thread (building columns takes ~100 ms per 16k rows)."""
+        buffer, self._pending = self._pending, _Buffer()
+        # Unique across the uvicorn workers sharing the directory: ms time, pid, random suffix
+        path = os.path.join(self.directory, f"seg-{time.time_ns() // 1_000_000:013d}-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        with self._lock:
+            self._sealed.append(buffer)
+            self._sealed_rows += buffer.rows
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="archive")
+        self._writer.submit(self._write, buffer, path)
+
+    def _write(self, buffer: _Buffer, path: str):
+        try:
+            Segment.build(buffer.events, self.feature_names).save(path)
+            loaded = Segment.load(path)
+        except Exception as exc:
+            # Kept in memory (and queryable) rather than lost
+            self.write_errors += 1
+            self.last_error = f"{type(exc).__name__}: {exc}"
+            return
+        with self._lock:
+            self._sealed = [b for b in self._sealed if b is not buffer]
+            self._sealed_rows -= buffer.rows
+            self._loaded.add(os.path.basename(path))
+            self.segments.append(loaded)
+            self._disk_rows += loaded.rows
+
+    async def close(self):
+        """Writes the partly filled segment and waits for pending writes."""
+        if self._pending.rows:
+            self._seal()
+        if self._writer is not None:
+            writer, self._writer = self._writer, None
+            await asyncio.to_thread(writer.shutdown, wait=True)
+
+    def _snapshot(self) -> list:
+        """Segments on disk plus the buffers of rows not written yet (both iterate newest first)."""
+        with self._lock:
+            runs = list(self.segments) + list(self._sealed)
+        runs.append(self._pending)
+        return [run for run in runs if run.rows]
+
+    @staticmethod
+    def _overlapping(segments: list, since_us: Optional[int], until_us: Optional[int]) -> list:
+        return [
+            s for s in segments
+            if (since_us is None or s.max_us >= since_us) and (until_us is None or s.min_us <= until_us)
+        ]
+
+    def iter_newest(self, since: Optional[float] = None, until: Optional[float] = None) -> Iterator[dict]:
+        """
+        Archived events with since <= timestamp <= until (epoch seconds), newest first.
+        A k-way merge over segments that opens a segment only once the merge
+        reaches its newest timestamp, so a page reads a handful of rows.
+        """
+        since_us = to_us(since) if since is not None else None
+        until_us = to_us(until) if until is not None else None
+        segments = sorted(self._overlapping(self._snapshot(), since_us, until_us), key=lambda s: -s.max_us)
+        heap = []
+        opened = 0
+        while True:
+            while opened < len(segments) and (not heap or segments[opened].max_us >= -heap[0][0]):
+                rows = segments[opened].iter_newest(since_us, until_us)
+                for ts, event in rows:
+                    heapq.heappush(heap, (-ts, opened, event, rows))
+                    break
+                opened += 1
+            if not heap:
+                return
+            _, source, event, rows = heapq.heappop(heap)
+            yield event
+            for ts, following in rows:
+                heapq.heappush(heap, (-ts, source, following, rows))
+                break
+
+    async def aiter_newest(self, since: Optional[float] = None, until: Optional[float] = None,
+                           before: Optional[Tuple[str, str]] = None):
+        """iter_newest as an async iterator; with before=(timestamp, id), only events older than that key."""
+        if self.refresh_due():
+            await asyncio.to_thread(self.refresh)
+        if before is not None:
+            cursor = event_time({"timestamp": before[0]})
+            if cursor is not None:
+                until = cursor if until is None else min(until, cursor)
+        for event in self.iter_newest(since, until):
+            if before is not None and event_key(event) >= before:
+                continue
+            yield event
+
+    def count(self) -> int:
+        with self._lock:
+            written = self._disk_rows + self._sealed_rows
+        return written + self._pending.rows
+
+    def analytics(self, since: Optional[float] = None, until: Optional[float] = None,
+                  bucket_s: int = 3600, top_users: int = 10) -> dict:
+        """Aggregates over the archived rows in [since, until], column by column."""
+        self.refresh()
+        since_us = to_us(since) if since is not None else None
+        until_us = to_us(until) if until is not None else None
+        bucket_us = int(bucket_s * 1_000_000)
+        count = fraud = 0
+        risk_sum = 0.0
+        histogram = np.zeros(RISK_BINS, dtype=np.int64)
+        feature_sums = np.zeros(len(self.feature_names), dtype=np.float64)
+        buckets: Dict[int, List[float]] = {}
+        fraud_by_user: Dict[str, int] = {}
+        # Runs on a worker thread: rows still in buffers get their columns built here
+        segments = [
+            run if isinstance(run, Segment) else Segment.build(run.events[:run.rows], self.feature_names)
+            for run in self._overlapping(self._snapshot(), since_us, until_us)
+        ]
+
+        for segment in segments:
+            lo, hi = segment.bounds(since_us, until_us)
+            if lo == hi:
+                continue
+            c = segment.columns
+            risk = np.asarray(c["risk"][lo:hi], dtype=np.float64)
+            flagged = np.asarray(c["fraud"][lo:hi])
+            count += hi - lo
+            fraud += int(flagged.sum())
+            risk_sum += float(risk.sum())
+            histogram += np.bincount(np.clip((risk * RISK_BINS).astype(np.int64), 0, RISK_BINS - 1), minlength=RISK_BINS)
+            feature_sums += np.nansum(c["features"][lo:hi], axis=0)
+
+            starts, inverse = np.unique(np.asarray(c["ts_us"][lo:hi]) // bucket_us, return_inverse=True)
+            totals = np.bincount(inverse)
+            flagged_totals = np.bincount(inverse, weights=flagged)
+            for start, n, f in zip(starts.tolist(), totals.tolist(), flagged_totals.tolist()):
+                bucket = buckets.setdefault(start, [0, 0])
+                bucket[0] += n
+                bucket[1] += int(f)
+
+            user_counts = np.bincount(np.asarray(c["user"][lo:hi])[flagged])
+            for code in np.flatnonzero(user_counts).tolist():
+                user = segment.string(code)
+                fraud_by_user[user] = fraud_by_user.get(user, 0) + int(user_counts[code])
+
+        return {
+            "since": since,
+            "until": until,
+            "segments_scanned": len(segments),
+            "count": count,
+            "fraud_count": fraud,
+            "fraud_rate": round(fraud / count, 4) if count else 0,
+            "risk_mean": round(risk_sum / count, 4) if count else 0,
+            "risk_histogram": histogram.tolist(),
+            "feature_means": {
+                name: round(float(total) / count, 4) if count else 0
+                for name, total in zip(self.feature_names, feature_sums)
+            },
+            "buckets": [
+                {
+                    "start": format_us(start * bucket_us),
+                    "count": n,
+                    "fraud_count": f,
+                    "fraud_rate": round(f / n, 4) if n else 0,
+                }
+                for start, (n, f) in sorted(buckets.items())
+            ],
+            "top_fraud_users": [
+                {"user_id": user, "fraud_count": n}
+                for user, n in heapq.nlargest(top_users, fraud_by_user.items(), key=lambda item: item[1])
+            ],
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            on_disk = list(self.segments)
+            writing = len(self._sealed)
+        return {
+            "enabled": self.enabled,
+            "directory": self.directory,
+            "segment_rows": self.segment_rows,
+            "segments": len(on_disk),
+            "archived_rows": sum(s.rows for s in on_disk),
+            "pending_rows": self._pending.rows,
+            "segments_writing": writing,
+            "write_errors": self.write_errors,
+            "last_error": self.last_error,
+        }
+
+
+transaction_archive = TransactionArchive(
+    settings.ARCHIVE_DIR, settings.ARCHIVE_SEGMENT_ROWS, FEATURE_NAMES, settings.ARCHIVE_REFRESH_S
+)
+
+
+def open_archive():
+    transaction_archive.open()
+
+
+async def close_archive():
+    await transaction_archive.close()
@@ -1,10 +1,16 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from jose import jwt, JWTError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from app import db
 from app.config import settings
 from app.auth.models import UserOut
+from app.metrics import registry, span
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
@@ -18,23 +24,161 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> UserOut:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-        username: str = payload.get("sub")
-        role: str = payload.get("role")
+class TokenCache:
+    """
+    Verified tokens -> UserOut, so a token's signature is checked once per
+    lifetime rather than on every request.
+
+    Keys are SHA-256 digests of the token (raw tokens are never held), entries
+    expire at the token's exp and the least recently used entry is evicted past
+    `max_size`. Only tokens that verified are cached: an invalid or forged
+    token is decoded (and rejected) on every use, so it can never be served
+    from the cache nor push out valid entries. Revoked digests are kept until
+    the token would have expired anyway. Both maps live in this process; with
+    STORE_BACKEND=redis revocations are also written to Redis (expiring at the
+    token's exp) and verify() checks them there, so a logout applies to every
+    worker at the cost of one EXISTS per request.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()  # authenticate() may also run on threadpool workers
+        self._entries: "OrderedDict[bytes, Tuple[float, UserOut]]" = OrderedDict()
+        self._revoked: Dict[bytes, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def authenticate(self, token: str) -> Optional[UserOut]:
+        """The token's user, or None if it is invalid, expired or revoked."""
+        key = self._digest(token)
+        now = time.time()
+        with self._lock:
+            if key in self._revoked:
+                self.rejected += 1
+                return None
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self.misses += 1
+
+        try:
+            with span("auth.jwt_decode"):
+                payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+        except JWTError:
+            payload = None
+        username = payload and payload.get("sub")
+        role = payload and payload.get("role")
         if username is None or role is None:
-            raise credentials_exception
-        return UserOut(username=username, role=role)
-    except JWTError:
-        raise credentials_exception
+            with self._lock:
+                self.rejected += 1
+            return None
+
+        user = UserOut(username=username, role=role)
+        # exp is optional in JWT; without one the entry is kept for the default token lifetime
+        expires = float(payload.get("exp") or now + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+        with self._lock:
+            if key not in self._revoked:
+                self._entries[key] = (expires, user)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return user
+
+    @staticmethod
+    def _shared() -> bool:
+        return settings.STORE_BACKEND == "redis"
+
+    @staticmethod
+    def _redis_key(key: bytes) -> str:
+        return f"{settings.REDIS_KEY_PREFIX}:revoked:{key.hex()}"
+
+    @property
+    def redis(self):
+        if db.redis_client is None:
+            raise RuntimeError("Redis is not initialized (STORE_BACKEND=redis needs init_redis at startup)")
+        return db.redis_client
+
+    async def verify(self, token: str) -> Optional[UserOut]:
+        """authenticate(), then (STORE_BACKEND=redis) the revocations made by other workers."""
+        user = self.authenticate(token)
+        if user is None or not self._shared():
+            return user
+        key = self._digest(token)
+        if not await self.redis.exists(self._redis_key(key)):
+            return user
+        with self._lock:
+            self._entries.pop(key, None)
+            self.rejected += 1
+        return None
+
+    def _revoke_local(self, key: bytes, expires: float):
+        now = time.time()
+        with self._lock:
+            self._entries.pop(key, None)
+            # Drop revocations of tokens that have expired by now
+            for digest in [d for d, exp in self._revoked.items() if exp <= now]:
+                del self._revoked[digest]
+            self._revoked[key] = expires
+
+    async def revoke(self, token: str):
+        """Rejects the token from now on, even though its signature is valid."""
+        try:
+            claims = jwt.get_unverified_claims(token)
+            expires = float(claims.get("exp") or 0)
+        except (JWTError, TypeError, ValueError):
+            expires = 0.0
+        expires = expires or time.time() + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        key = self._digest(token)
+        self._revoke_local(key, expires)
+        if self._shared() and expires > time.time():
+            await self.redis.set(self._redis_key(key), 1, exat=int(expires) + 1)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def collect_metrics(self):
+        yield "auth_token_cache_hits_total", "counter", "Requests authenticated from the token cache.", [({}, self.hits)]
+        yield "auth_token_cache_misses_total", "counter", "Tokens whose signature had to be verified.", [({}, self.misses)]
+        yield "auth_token_rejected_total", "counter", "Invalid, expired or revoked tokens presented.", [({}, self.rejected)]
+        yield "auth_token_cache_entries", "gauge", "Verified tokens held in the cache.", [({}, len(self._entries))]
+        yield "auth_revoked_tokens", "gauge", "Revoked tokens that have not expired yet.", [({}, len(self._revoked))]
+
+    def stats(self) -> dict:
+        return {
+            "max_size": self.max_size,
+            "entries": len(self._entries),
+            "revoked": len(self._revoked),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+        }
+
+
+token_cache = TokenCache(settings.JWT_CACHE_SIZE)
+registry.add_collector(token_cache.collect_metrics)
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserOut:
+    # async: a cache hit is far cheaper than the threadpool hop a sync dependency costs
+    user = await token_cache.verify(token)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
 
-def get_current_admin(current_user: UserOut = Depends(get_current_user)) -> UserOut:
+async def get_current_admin(current_user: UserOut = Depends(get_current_user)) -> UserOut:
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not enough permissions")
     return current_user
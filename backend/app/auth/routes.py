@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from app.auth.models import Token, UserOut
-from app.auth.jwt_handler import create_access_token, get_current_user
+from app.auth.jwt_handler import create_access_token, get_current_user, oauth2_scheme, token_cache
 
 router = APIRouter()
 
@@ -26,6 +26,15 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+@router.post("/logout")
+async def logout(token: str = Depends(oauth2_scheme), current_user: UserOut = Depends(get_current_user)):
+    """
+    Revokes the bearer token until it expires: in this server process, and for
+    every worker when STORE_BACKEND=redis (shared through Redis).
+    """
+    await token_cache.revoke(token)
+    return {"message": "Logged out"}
+
 @router.get("/me", response_model=UserOut)
 async def get_me(current_user: UserOut = Depends(get_current_user)):
     return current_user
@@ -5,6 +5,88 @@ class Settings(BaseSettings):
     JWT_SECRET: str = "super_secret_jwt_key_hackathon_demo"
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 1 day
+    JWT_CACHE_SIZE: int = 10_000  # verified tokens kept per process (evicted at exp or LRU)
+
+    # Where transactions / DAO logs live: "memory" (per worker) or "redis" (shared)
+    STORE_BACKEND: str = "memory"
+    REDIS_KEY_PREFIX: str = "fraud"
+    REDIS_MAX_CONNECTIONS: int = 50
+    # Retention of recent events per store
+    TRANSACTION_STORE_CAPACITY: int = 100_000
+    DAO_LOG_STORE_CAPACITY: int = 10_000
+    # Transactions evicted from the transaction store go to a columnar archive ("" = dropped)
+    ARCHIVE_DIR: str = "data/archive"
+    ARCHIVE_SEGMENT_ROWS: int = 16_384
+    ARCHIVE_REFRESH_S: float = 2.0  # how often queries look for segments written by other workers
+
+    # Micro-batching for the fraud scoring engine
+    SCORING_MAX_BATCH_SIZE: int = 64
+    SCORING_MAX_WAIT_MS: float = 2.0
+    # Where scoring/SHAP runs: "inline" (event loop), "thread" or "process" pool
+    SCORING_EXECUTOR: str = "thread"
+    SCORING_WORKERS: int = 0  # 0 = one per CPU core
+    # "xgboost" (booster + shap.TreeExplainer) or "numpy" (app.fraud.trees, no xgboost/shap import)
+    SCORING_BACKEND: str = "xgboost"
+    # Model rollout: poll fraud_model.json for changes every N seconds (0 = only POST /fraud/model/reload)
+    MODEL_WATCH_INTERVAL_S: float = 0
+    SHADOW_MAX_PENDING: int = 2  # engine batches queued for the shadow model; more are skipped
+    # SHAP explanation LRU (per scoring process)
+    EXPLAIN_CACHE_SIZE: int = 10000
+    EXPLAIN_CACHE_DECIMALS: int = 2
+    # WebSocket fan-out: per-client queue and what to do with clients that fall behind
+    WS_CLIENT_QUEUE_SIZE: int = 256
+    WS_SLOW_CLIENT_POLICY: str = "drop_oldest"  # or "disconnect"
+    # Default coalescing tick for subscribed /fraud/stream clients (0 = one frame per event)
+    WS_BATCH_MS: int = 100
+    # Face pipeline: long side (px) images are decoded / downscaled to before Haar detection
+    FACE_DETECT_MAX_DIM: int = 640
+    # /dao/verify: face pipeline threads (0 = min(4, cpu count)) and admitted verifications
+    FACE_WORKERS: int = 0
+    FACE_MAX_PENDING: int = 8
+    # Enrolled-face index: exact search up to EXACT_MAX entries, then IVF probing NPROBE lists
+    FACE_INDEX_EXACT_MAX: int = 10_000
+    FACE_INDEX_NPROBE: int = 8
+    FACE_INDEX_TOP_K: int = 5
+    FACE_DUPLICATE_SIMILARITY: float = 0.95  # a prior identity this similar is flagged
+    # Online per-user features (1h / 24h counts, amount sums, distinct devices)
+    FEATURE_STORE_BACKEND: str = "memory"  # or "redis"
+    FEATURE_STORE_MAX_USERS: int = 1_000_000  # memory backend, ~0.75 KB per user
+    FEATURE_STORE_TTL_S: float = 86400  # idle users are dropped after the longest window
+    # Model input velocity_1h: the "client" value as sent, the "server" count or the "max" of both
+    FEATURE_STORE_VELOCITY: str = "client"
+    # DID ledger: append-only hash-chained file + mmap offset index (default <path>.idx)
+    LEDGER_PATH: str = "data/did_ledger.jsonl"
+    LEDGER_INDEX_PATH: str = ""
+    LEDGER_GROUP_COMMIT_MS: float = 5.0  # appends within this window share one fsync
+    LEDGER_FILE_LOCKING: bool = True  # flock, for several worker processes on one ledger
+    # POST /fraud/transactions/bulk
+    BULK_CHUNK_SIZE: int = 1024
+    BULK_SPOOL_MAX_MEMORY: int = 8 * 1024 * 1024  # larger uploads spill to a temp file
+    BULK_MAX_BYTES: int = 256 * 1024 * 1024  # larger request bodies are refused with 413
+    # Background ingestion: comma-separated sources started with the app ("" = off):
+    # "simulator", "redis" (a Redis Stream, consumer group) and/or "file" (an NDJSON file, tailed)
+    INGEST_SOURCES: str = ""
+    INGEST_SIMULATOR_RATE: float = 0  # transactions per second (0 = one every 1-4 s, demo pace)
+    INGEST_REDIS_STREAM: str = "fraud:ingest"  # entries carry one TransactionInput JSON in a "data" field
+    INGEST_REDIS_GROUP: str = "ingest"
+    INGEST_FILE_PATH: str = "data/ingest.ndjson"
+    INGEST_FILE_FROM_START: bool = False  # else only lines appended after start-up
+    # Pipeline: items per stage queue, score/store batch size and workers per stage
+    # (store and broadcast run one worker each, in read order)
+    INGEST_QUEUE_SIZE: int = 1024
+    INGEST_BATCH_SIZE: int = 256
+    INGEST_PARSE_WORKERS: int = 1
+    INGEST_ENRICH_WORKERS: int = 4
+    INGEST_SCORE_WORKERS: int = 2  # batches in flight on the scoring executor
+    # A failing batch is retried with exponential backoff, then given up on (nacked)
+    INGEST_MAX_ATTEMPTS: int = 3
+    INGEST_RETRY_BACKOFF_S: float = 0.5
+    # GET /metrics: span timings (also toggled at runtime) and event-loop lag sampling (0 = off)
+    METRICS_SPANS_ENABLED: bool = True
+    METRICS_LOOP_LAG_INTERVAL_S: float = 0.5
+    # Admin sampling profiler: default sampling interval and stack depth kept per sample
+    PROFILER_INTERVAL_MS: float = 5.0
+    PROFILER_MAX_DEPTH: int = 64
 
     class Config:
         env_file = ".env"
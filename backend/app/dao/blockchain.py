@@ -3,14 +3,15 @@ import json
 import time
 from typing import Optional
 
-# Simulated on-chain storage for hackathon
-MOCK_BLOCKCHAIN = {}
+from app.dao.ledger import ledger
 
-def generate_blockchain_id(user_info: dict) -> str:
+async def generate_blockchain_id(user_info: dict) -> str:
     """
     Simulates writing identity data to a blockchain and returning a transaction hash.
     In reality, this would hash user info (PII, biometrics hash) and sign it 
     or store it to a smart contract on Ethereum/Polygon/Solana, etc.
+    The record is appended to the local hash-chained ledger (app.dao.ledger)
+    and this returns once it is durable.
     """
     
     # Sort keys for consistent hashing
@@ -23,18 +24,22 @@ def generate_blockchain_id(user_info: dict) -> str:
     # Generate SHA-256 hash (simulates Tx Hash or DID identifier)
     did_hash = "did:fraud:" + hashlib.sha256(raw_data.encode('utf-8')).hexdigest()
     
-    # Store in "blockchain" mapping
-    MOCK_BLOCKCHAIN[did_hash] = {
+    # Append to the ledger
+    await ledger.append(did_hash, {
         "timestamp": timestamp,
         "verified": True,
         "payload_hash": hashlib.sha256(payload.encode()).hexdigest(),
         "creator_address": "0xMockedWalletAddress999"
-    }
+    })
     
     return did_hash
 
-def verify_blockchain_id(did_hash: str) -> Optional[dict]:
+async def verify_blockchain_id(did_hash: str) -> Optional[dict]:
     """
-    Retrieves the identity record from the mock blockchain.
+    Retrieves the identity record from the ledger, with its block number and
+    chain hashes.
     """
-    return MOCK_BLOCKCHAIN.get(did_hash)
+    entry = await ledger.lookup(did_hash)
+    if entry is None:
+        return None
+    return {**entry["data"], "block": entry["seq"], "hash": entry["hash"], "prev_hash": entry["prev_hash"]}
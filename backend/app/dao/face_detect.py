@@ -1,70 +1,162 @@
+import struct
+import threading
+import time
+from typing import Optional, Tuple
+
 import cv2
 import numpy as np
 
-def detect_and_compare_faces(image1_bytes: bytes, image2_bytes: bytes) -> dict:
+from app.config import settings
+
+# This cascade file comes with opencv-python
+CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+
+# CascadeClassifier is not thread-safe: one instance per thread, parsed once
+_local = threading.local()
+
+# JPEG start-of-frame markers carrying the image size
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_REDUCED_FLAGS = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def get_face_cascade() -> cv2.CascadeClassifier:
+    cascade = getattr(_local, "cascade", None)
+    if cascade is None:
+        cascade = _local.cascade = cv2.CascadeClassifier(CASCADE_PATH)
+    return cascade
+
+
+def image_size(img_bytes: bytes) -> Optional[Tuple[int, int]]:
+    """(width, height) read from a JPEG / PNG header without decoding, else None."""
+    if img_bytes[:8] == b"\x89PNG\r\n\x1a\n" and len(img_bytes) >= 24:
+        return struct.unpack(">II", img_bytes[16:24])
+    if img_bytes[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 < len(img_bytes):
+        if img_bytes[i] != 0xFF:
+            i += 1
+            continue
+        marker = img_bytes[i + 1]
+        if marker == 0xFF or marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 1 if marker == 0xFF else 2
+            continue
+        if marker in _JPEG_SOF:
+            height, width = struct.unpack(">HH", img_bytes[i + 5:i + 9])
+            return width, height
+        i += 2 + struct.unpack(">H", img_bytes[i + 2:i + 4])[0]
+    return None
+
+
+def decode_image(img_bytes: bytes, max_dim: int):
+    """
+    Decodes at the largest IMREAD_REDUCED_* factor that keeps the image at least
+    max_dim on its long side (JPEG is then decoded at reduced size directly).
+    Returns (image, reduction) or (None, 1).
+    """
+    reduction = 1
+    size = image_size(img_bytes)
+    if size and max_dim > 0:
+        for factor in (8, 4, 2):
+            if max(size) // factor >= max_dim:
+                reduction = factor
+                break
+
+    nparr = np.frombuffer(img_bytes, np.uint8)
+    img = cv2.imdecode(nparr, _REDUCED_FLAGS.get(reduction, cv2.IMREAD_COLOR))
+    if img is None:
+        return None, 1
+    return img, reduction
+
+
+def _timed(timings: Optional[dict], stage: str, started: float) -> float:
+    now = time.perf_counter()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + (now - started)
+    return now
+
+
+def extract_face(img_bytes: bytes, timings: Optional[dict] = None):
+    """
+    Decodes an image and returns (face_roi 200x200 BGR, error, box).
+    Detection runs on a grayscale copy downscaled to FACE_DETECT_MAX_DIM; the
+    box is mapped back onto the decoded image for cropping and is reported in
+    original-image pixels as (x, y, w, h).
+    """
+    max_dim = settings.FACE_DETECT_MAX_DIM
+    started = time.perf_counter()
+    img, reduction = decode_image(img_bytes, max_dim)
+    started = _timed(timings, "decode", started)
+    if img is None:
+        return None, "Failed to decode image", None
+
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    scale = 1.0
+    if max_dim > 0 and max(gray.shape) > max_dim:
+        scale = max_dim / max(gray.shape)
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    faces = get_face_cascade().detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+    started = _timed(timings, "detect", started)
+
+    if len(faces) == 0:
+        return None, "No face detected", None
+
+    # grab the largest face, mapped back to the decoded image
+    x, y, w, h = (int(round(v / scale)) for v in max(faces, key=lambda f: f[2] * f[3]))
+
+    # crop and resize to standard
+    roi = img[y:y+h, x:x+w]
+    roi = cv2.resize(roi, (200, 200))
+    _timed(timings, "crop", started)
+
+    box = (x * reduction, y * reduction, w * reduction, h * reduction)
+    return roi, None, box
+
+
+def face_histogram(face_roi: np.ndarray) -> np.ndarray:
+    """Normalized Hue/Saturation histogram of a face crop."""
+    hsv = cv2.cvtColor(face_roi, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [50, 60], [0, 180, 0, 256])
+    cv2.normalize(hist, hist, 0, 1, cv2.NORM_MINMAX)
+    return hist
+
+
+def detect_and_compare_faces(image1_bytes: bytes, image2_bytes: bytes, timings: Optional[dict] = None) -> dict:
     """
     1. Loads two images from bytes.
     2. Detects faces using OpenCV Haar Cascades.
     3. Crops to the faces.
     4. Computes a similarity score (using a simple histogram comparison for the demo).
     Returns {"match": bool, "score": float, "error": str}
+    If `timings` is given, seconds spent per stage (decode, detect, crop, histogram,
+    compare) are added to it.
     """
-    
-    # Load Haar cascade
-    # This cascade file comes with opencv-python
-    cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-    face_cascade = cv2.CascadeClassifier(cascade_path)
-    
-    # helper func
-    def get_face_roi(img_bytes):
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        if img is None:
-            return None, "Failed to decode image"
-            
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
-        
-        if len(faces) == 0:
-            return None, "No face detected"
-            
-        # grab the largest face
-        faces = sorted(faces, key=lambda x: x[2]*x[3], reverse=True)
-        x, y, w, h = faces[0]
-        
-        # crop and resize to standard
-        roi = img[y:y+h, x:x+w]
-        roi = cv2.resize(roi, (200, 200))
-        return roi, None
-        
-    face1, err1 = get_face_roi(image1_bytes)
+    face1, err1, _ = extract_face(image1_bytes, timings)
     if err1: return {"match": False, "score": 0.0, "error": f"Image 1: {err1}"}
-    
-    face2, err2 = get_face_roi(image2_bytes)
+
+    face2, err2, _ = extract_face(image2_bytes, timings)
     if err2: return {"match": False, "score": 0.0, "error": f"Image 2: {err2}"}
-    
-    # For a hackathon demo without loading massive deep learning models, 
+
+    return compare_faces(face1, face2, timings)
+
+
+def compare_faces(face1: np.ndarray, face2: np.ndarray, timings: Optional[dict] = None) -> dict:
+    # For a hackathon demo without loading massive deep learning models,
     # we compute color histograms of the faces and compare them using Bhattacharyya distance or Correlation.
     # In production, use deepface, dlib, or an external API.
-    
-    # Convert to HSV
-    hsv1 = cv2.cvtColor(face1, cv2.COLOR_BGR2HSV)
-    hsv2 = cv2.cvtColor(face2, cv2.COLOR_BGR2HSV)
-    
-    # Calculate histograms
-    hist1 = cv2.calcHist([hsv1], [0, 1], None, [50, 60], [0, 180, 0, 256])
-    cv2.normalize(hist1, hist1, 0, 1, cv2.NORM_MINMAX)
-    
-    hist2 = cv2.calcHist([hsv2], [0, 1], None, [50, 60], [0, 180, 0, 256])
-    cv2.normalize(hist2, hist2, 0, 1, cv2.NORM_MINMAX)
-    
+    started = time.perf_counter()
+    hist1 = face_histogram(face1)
+    hist2 = face_histogram(face2)
+    started = _timed(timings, "histogram", started)
+
     # Compare
     # CORREL: 1 is perfect match, 0 is no match, -1 is completely mismatched
     score = cv2.compareHist(hist1, hist2, cv2.HISTCMP_CORREL)
-    
+    _timed(timings, "compare", started)
+
     # Threshold for "match"
     is_match = bool(score > 0.6)
-    
+
     return {
         "match": is_match,
         "score": round(float(score), 4),
@@ -0,0 +1,183 @@
+import threading
+from array import array
+from typing import List, Optional
+
+import numpy as np
+
+from app.config import settings
+
+# 16 hue x 16 saturation bins
+DESCRIPTOR_BINS = (16, 16)
+DESCRIPTOR_DIM = DESCRIPTOR_BINS[0] * DESCRIPTOR_BINS[1]
+
+
+def face_descriptor(face_roi: np.ndarray) -> np.ndarray:
+    """
+    256-d float32 descriptor of a face crop: square root of the L1-normalized HS
+    histogram, L2-normalized. The dot product of two descriptors is then the
+    Bhattacharyya coefficient of the histograms (1.0 = identical).
+    """
+    import cv2  # only once face verification runs, not when the app is imported
+
+    hsv = cv2.cvtColor(face_roi, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, list(DESCRIPTOR_BINS), [0, 180, 0, 256]).ravel()
+    vec = np.sqrt(hist / max(hist.sum(), 1.0), dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k largest scores, best first."""
+    if k < len(scores):
+        top = np.argpartition(scores, -k)[-k:]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(scores[top])[::-1]]
+
+
+class FaceIndex:
+    """
+    In-process vector index of enrolled face descriptors. Search is cosine
+    similarity, i.e. matrix-vector products over unit vectors.
+
+    Up to `exact_max` entries the vectors live in one contiguous float32 matrix
+    (grown by doubling) and every row is scored. Past that an IVF coarse
+    quantizer is trained (spherical k-means, 2 * sqrt(n) lists) and each list
+    keeps its own contiguous float32 block, so a search scores only the
+    `nprobe` lists nearest to the query without gathering scattered rows. The
+    quantizer is retrained each time the index has doubled. Thread-safe.
+    """
+
+    def __init__(self, dim: int = DESCRIPTOR_DIM, exact_max: int = 10_000, nprobe: int = 8, initial_capacity: int = 1024):
+        self.dim = dim
+        self.exact_max = exact_max
+        self.nprobe = nprobe
+        self._meta: List[dict] = []
+        self._lock = threading.Lock()
+
+        # exact mode
+        self._vectors: Optional[np.ndarray] = np.zeros((initial_capacity, dim), dtype=np.float32)
+        # IVF mode: per-list vector blocks, their row ids and fill counts
+        self._centroids: Optional[np.ndarray] = None
+        self._blocks: List[np.ndarray] = []
+        self._block_rows: List[array] = []
+        self._block_sizes: List[int] = []
+        self._trained_at = 0
+        self._training = False
+
+    def __len__(self) -> int:
+        return len(self._meta)
+
+    @staticmethod
+    def _append(block: np.ndarray, size: int, vector: np.ndarray) -> np.ndarray:
+        if size == len(block):
+            grown = np.zeros((max(2 * len(block), 16), block.shape[1]), dtype=np.float32)
+            grown[:size] = block
+            block = grown
+        block[size] = vector
+        return block
+
+    def add(self, vector: np.ndarray, meta: dict):
+        with self._lock:
+            row = len(self._meta)
+            self._meta.append(meta)
+            if self._centroids is None:
+                self._vectors = self._append(self._vectors, row, vector)
+            else:
+                c = int(np.argmax(self._centroids @ vector))
+                self._blocks[c] = self._append(self._blocks[c], self._block_sizes[c], vector)
+                self._block_sizes[c] += 1
+                self._block_rows[c].append(row)
+
+            retrain = (
+                not self._training
+                and row + 1 > self.exact_max
+                and row + 1 >= 2 * self._trained_at
+            )
+            if retrain:
+                self._training = True
+        if retrain:
+            self._train()
+
+    def search(self, vector: np.ndarray, k: int = 5) -> List[dict]:
+        """The k most similar enrolled faces, best first: meta + "similarity"."""
+        with self._lock:
+            n = len(self._meta)
+            if n == 0 or k <= 0:
+                return []
+            if self._centroids is None:
+                scores = self._vectors[:n] @ vector
+                rows = None
+            else:
+                probes = _top_k(self._centroids @ vector, self.nprobe)
+                scores = np.concatenate([self._blocks[c][:self._block_sizes[c]] @ vector for c in probes])
+                rows = np.concatenate([np.frombuffer(self._block_rows[c], dtype=np.int32) for c in probes])
+            top = _top_k(scores, k)
+            top_rows = top if rows is None else rows[top]
+            return [
+                {**self._meta[row], "similarity": round(float(scores[i]), 4)}
+                for i, row in zip(top, top_rows)
+            ]
+
+    def _snapshot(self):
+        """(vectors, row ids) of every entry; caller holds the lock."""
+        n = len(self._meta)
+        if self._centroids is None:
+            return self._vectors[:n], np.arange(n, dtype=np.int32)
+        vectors = np.concatenate([b[:size] for b, size in zip(self._blocks, self._block_sizes)])
+        rows = np.concatenate([np.frombuffer(r, dtype=np.int32) for r in self._block_rows])
+        return vectors, rows
+
+    def _train(self, iterations: int = 8, seed: int = 0):
+        """
+        Clusters a sample of the current entries, then regroups every entry into
+        its list. The clustering runs without the lock, so searches and adds
+        continue meanwhile; entries added during it are grouped at the swap.
+        """
+        try:
+            with self._lock:
+                vectors, _ = self._snapshot()
+                n = len(vectors)
+                nlist = max(int(2 * np.sqrt(n)), 1)
+                rng = np.random.default_rng(seed)
+                sample = vectors[rng.choice(n, size=min(n, 32 * nlist), replace=False)]
+
+            centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+            for _ in range(iterations):
+                assign = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assign, sample)
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                filled = norms[:, 0] > 0
+                centroids[filled] = sums[filled] / norms[filled]
+
+            with self._lock:
+                vectors, rows = self._snapshot()
+                n = len(vectors)
+                assign = np.empty(n, dtype=np.int32)
+                for start in range(0, n, 65536):
+                    assign[start:start + 65536] = np.argmax(vectors[start:start + 65536] @ centroids.T, axis=1)
+                order = np.argsort(assign, kind="stable")
+                bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+                self._blocks = [vectors[order[bounds[c]:bounds[c + 1]]] for c in range(nlist)]
+                self._block_rows = [array("i", rows[order[bounds[c]:bounds[c + 1]]].tobytes()) for c in range(nlist)]
+                self._block_sizes = [len(block) for block in self._blocks]
+                self._centroids = centroids
+                self._vectors = None
+                self._trained_at = n
+        finally:
+            self._training = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._meta),
+                "dim": self.dim,
+                "mode": "exact" if self._centroids is None else "ivf",
+                "lists": len(self._blocks),
+                "nprobe": self.nprobe,
+                "trained_at": self._trained_at,
+            }
+
+
+face_index = FaceIndex(exact_max=settings.FACE_INDEX_EXACT_MAX, nprobe=settings.FACE_INDEX_NPROBE)
@@ -0,0 +1,410 @@
+"""
+Append-only, hash-chained DID ledger.
+
+Every record is one JSON line {"seq", "did", "prev_hash", "data", "hash"} where
+hash = sha256 of the canonical JSON of the other fields, so each record commits
+to the whole chain before it. Lookups by DID go through a memory-mapped
+open-addressing index (<ledger>.idx) mapping DID -> file offset; start-up
+maps the index and only replays records appended after it was last updated.
+
+Check a ledger file:
+    python -m app.dao.ledger verify [path]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+from app.config import settings
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows: in-process locking only
+    fcntl = None
+
+GENESIS_HASH = "0" * 64
+
+# Index file: header, then `capacity` (key, offset) slots; key 0 marks an empty slot
+_MAGIC = b"DIDIDX01"
+_HEADER = struct.Struct("<8sQQQQQ32s")  # magic, capacity, count, indexed_bytes, last_seq, last_offset, last_hash
+_HEADER_SIZE = 128
+_SLOT = struct.Struct("<QQ")
+_MIN_CAPACITY = 1024
+
+
+def _canonical(obj) -> bytes:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def chain_hash(seq: int, did: str, prev_hash: str, data: dict) -> str:
+    body = {"seq": seq, "did": did, "prev_hash": prev_hash, "data": data}
+    return hashlib.sha256(_canonical(body)).hexdigest()
+
+
+def _did_key(did: str) -> int:
+    key = int.from_bytes(hashlib.blake2b(did.encode("utf-8"), digest_size=8).digest(), "little")
+    return key or 1
+
+
+def iter_records(path: str, start: int = 0) -> Iterator[Tuple[int, bytes]]:
+    """(offset, line) of every complete record from `start`; a torn last line is skipped."""
+    with open(path, "rb") as fp:
+        fp.seek(start)
+        offset = start
+        for line in fp:
+            if not line.endswith(b"\n"):
+                return
+            yield offset, line
+            offset += len(line)
+
+
+def verify_chain(path: str) -> dict:
+    """Streaming integrity check: sequence numbers, prev-hash links and record hashes."""
+    prev_hash = GENESIS_HASH
+    seq = 0
+    end = 0
+    for offset, line in iter_records(path):
+        error = None
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            entry, error = None, "unparseable record"
+        if error is None and not isinstance(entry, dict):
+            error = "record is not a JSON object"
+        if error is None and entry.get("seq") != seq + 1:
+            error = f"expected seq {seq + 1}, found {entry.get('seq')}"
+        elif error is None and entry.get("prev_hash") != prev_hash:
+            error = "prev_hash does not match the previous record"
+        elif error is None and chain_hash(entry["seq"], entry.get("did"), prev_hash, entry.get("data")) != entry.get("hash"):
+            error = "record hash mismatch"
+        if error:
+            return {"ok": False, "records": seq, "offset": offset, "error": error}
+        prev_hash = entry["hash"]
+        seq += 1
+        end = offset + len(line)
+    return {"ok": True, "records": seq, "head": prev_hash, "torn_tail_bytes": os.path.getsize(path) - end}
+
+
+class Ledger:
+    """
+    The DID ledger file plus its offset index.
+
+    Appends are written (and indexed) immediately but acknowledged only after
+    an fsync; appends arriving within `group_commit_ms` share one fsync (group
+    commit). With file_locking, appends hold an exclusive flock and lookups a
+    shared one, so several worker processes can use the same ledger: the chain
+    head lives in the shared index header, not in process memory.
+    """
+
+    def __init__(self, path: str, index_path: str = "", group_commit_ms: float = 5.0, file_locking: bool = True):
+        self.path = path
+        self.index_path = index_path or path + ".idx"
+        self.group_commit_ms = group_commit_ms
+        self.file_locking = file_locking and fcntl is not None
+
+        self._fd: Optional[int] = None
+        self._index_fd: Optional[int] = None
+        self._index: Optional[mmap.mmap] = None
+        self._index_ino: Optional[int] = None
+        self._lock = threading.RLock()
+        self._pending_sync: Optional[asyncio.Future] = None
+
+        self.appends = 0
+        self.fsyncs = 0
+        self.replayed = 0
+
+    # --- lifecycle ---
+
+    def open(self):
+        with self._lock:
+            if self._fd is not None:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+            with self._file_lock(exclusive=True):
+                self._map_index()
+                self._recover()
+
+    def close(self):
+        with self._lock:
+            if self._index is not None:
+                self._index.close()
+                os.close(self._index_fd)
+                self._index = self._index_fd = None
+            if self._fd is not None:
+                os.fsync(self._fd)
+                os.close(self._fd)
+                self._fd = None
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        with self._lock:
+            if not self.file_locking:
+                yield
+                return
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    # --- index file ---
+
+    def _header(self) -> tuple:
+        return _HEADER.unpack_from(self._index, 0)
+
+    def _map_index(self):
+        """Maps the index file, creating an empty one if it is missing or unusable."""
+        if self._index is not None:
+            self._index.close()
+            os.close(self._index_fd)
+            self._index = None
+        try:
+            fd = os.open(self.index_path, os.O_RDWR)
+        except FileNotFoundError:
+            self._create_index(_MIN_CAPACITY)
+            return
+        size = os.fstat(fd).st_size
+        index = mmap.mmap(fd, size) if size >= _HEADER_SIZE else None
+        if index is None or _HEADER.unpack_from(index, 0)[0] != _MAGIC or size != _HEADER_SIZE + _SLOT.size * _HEADER.unpack_from(index, 0)[1]:
+            if index is not None:
+                index.close()
+            os.close(fd)
+            self._create_index(_MIN_CAPACITY)
+            return
+        self._index_fd, self._index, self._index_ino = fd, index, os.fstat(fd).st_ino
+
+    def _create_index(self, capacity: int, slots: Optional[Iterator[Tuple[int, int]]] = None, header: Optional[tuple] = None):
+        """Writes a new index (optionally re-inserting `slots`) and atomically swaps it in."""
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.ftruncate(fd, _HEADER_SIZE + _SLOT.size * capacity)
+        index = mmap.mmap(fd, _HEADER_SIZE + _SLOT.size * capacity)
+        count, indexed_bytes, last_seq, last_offset, last_hash = header or (0, 0, 0, 0, bytes(32))
+        _HEADER.pack_into(index, 0, _MAGIC, capacity, count, indexed_bytes, last_seq, last_offset, last_hash)
+        for key, offset in slots or ():
+            self._insert_slot(index, capacity, key, offset)
+        index.flush()
+        os.replace(tmp_path, self.index_path)
+
+        if self._index is not None:
+            self._index.close()
+            os.close(self._index_fd)
+        self._index_fd, self._index, self._index_ino = fd, index, os.fstat(fd).st_ino
+
+    @staticmethod
+    def _insert_slot(index: mmap.mmap, capacity: int, key: int, offset: int):
+        mask = capacity - 1
+        i = key & mask
+        while _SLOT.unpack_from(index, _HEADER_SIZE + i * _SLOT.size)[0] != 0:
+            i = (i + 1) & mask
+        _SLOT.pack_into(index, _HEADER_SIZE + i * _SLOT.size, key, offset)
+
+    def _refresh(self):
+        """Re-maps the index if another process replaced it (growth / rebuild)."""
+        try:
+            ino = os.stat(self.index_path).st_ino
+        except FileNotFoundError:
+            ino = None
+        if ino != self._index_ino:
+            self._map_index()
+
+    def _index_record(self, entry: dict, offset: int, length: int):
+        _, capacity, count, _, _, _, _ = self._header()
+        if (count + 1) * 2 > capacity:
+            # Grow 2x: re-insert the live slots, no ledger scan needed
+            slots = [
+                (key, off)
+                for key, off in _SLOT.iter_unpack(self._index[_HEADER_SIZE:])
+                if key != 0
+            ]
+            self._create_index(capacity * 2, slots, self._header()[2:])
+            capacity *= 2
+        self._insert_slot(self._index, capacity, _did_key(entry["did"]), offset)
+        _HEADER.pack_into(
+            self._index, 0, _MAGIC, capacity, count + 1, offset + length,
+            entry["seq"], offset, bytes.fromhex(entry["hash"]),
+        )
+
+    # --- recovery ---
+
+    def _read_at(self, offset: int) -> Optional[dict]:
+        chunk = b""
+        while True:
+            data = os.pread(self._fd, 4096, offset + len(chunk))
+            if not data:
+                return None
+            chunk += data
+            end = chunk.find(b"\n")
+            if end >= 0:
+                try:
+                    return json.loads(chunk[:end])
+                except ValueError:
+                    return None
+
+    def _recover(self):
+        """
+        Brings the index in line with the ledger (caller holds the exclusive lock):
+        truncates a torn last record, replays records past the indexed prefix, and
+        rebuilds from scratch if the index does not match the ledger at all.
+        """
+        size = os.fstat(self._fd).st_size
+        if size and os.pread(self._fd, 1, size - 1) != b"\n":
+            end = size
+            while end > 0:
+                start = max(end - 65536, 0)
+                last = os.pread(self._fd, end - start, start).rfind(b"\n")
+                if last >= 0:
+                    end = start + last + 1
+                    break
+                end = start
+            size = end
+            os.ftruncate(self._fd, size)
+
+        _, _, count, indexed_bytes, last_seq, last_offset, last_hash = self._header()
+        consistent = indexed_bytes <= size
+        if consistent and indexed_bytes:
+            head = self._read_at(last_offset)
+            consistent = bool(head) and head.get("seq") == last_seq and head.get("hash") == last_hash.hex()
+        if not consistent:
+            self._create_index(_MIN_CAPACITY)
+            indexed_bytes = 0
+
+        for offset, line in iter_records(self.path, indexed_bytes):
+            self._index_record(json.loads(line), offset, len(line))
+            self.replayed += 1
+
+    # --- public API ---
+
+    def _write(self, did: str, data: dict) -> dict:
+        if self._fd is None:
+            self.open()
+        with self._file_lock(exclusive=True):
+            self._refresh()
+            if self._header()[3] != os.fstat(self._fd).st_size:
+                self._recover()  # another writer died mid-append
+            _, _, count, offset, last_seq, _, last_hash = self._header()
+            prev_hash = last_hash.hex() if count else GENESIS_HASH
+            entry = {"seq": last_seq + 1, "did": did, "prev_hash": prev_hash, "data": data}
+            entry["hash"] = chain_hash(entry["seq"], did, prev_hash, data)
+            line = _canonical(entry) + b"\n"
+            os.write(self._fd, line)
+            self._index_record(entry, offset, len(line))
+            self.appends += 1
+        return entry
+
+    async def append(self, did: str, data: dict) -> dict:
+        """Appends a record and returns it once it is durable (group-committed fsync)."""
+        # flock, the write and index growth block, so they run on a thread like the fsync
+        entry = await asyncio.to_thread(self._write, did, data)
+        await self._sync()
+        return entry
+
+    async def _sync(self):
+        loop = asyncio.get_running_loop()
+        if self._pending_sync is None:
+            future = self._pending_sync = loop.create_future()
+            loop.call_later(self.group_commit_ms / 1000.0, lambda: asyncio.ensure_future(self._fsync(future)))
+        await asyncio.shield(self._pending_sync)
+
+    async def _fsync(self, future: asyncio.Future):
+        # Appends written from here on wait for the next group
+        self._pending_sync = None
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, os.fsync, self._fd)
+            self.fsyncs += 1
+            future.set_result(None)
+        except Exception as exc:
+            future.set_exception(exc)
+
+    def get(self, did: str) -> Optional[dict]:
+        """O(1) lookup of the record for a DID (None if unknown). Blocks on the file lock: use lookup() from async code."""
+        if self._fd is None:
+            self.open()
+        key = _did_key(did)
+        with self._file_lock(exclusive=False):
+            self._refresh()
+            capacity = self._header()[1]
+            mask = capacity - 1
+            i = key & mask
+            while True:
+                slot_key, offset = _SLOT.unpack_from(self._index, _HEADER_SIZE + i * _SLOT.size)
+                if slot_key == 0:
+                    return None
+                if slot_key == key:
+                    entry = self._read_at(offset)
+                    if entry is not None and entry.get("did") == did:
+                        return entry
+                i = (i + 1) & mask
+
+    async def lookup(self, did: str) -> Optional[dict]:
+        """get() on a thread, off the event loop."""
+        return await asyncio.to_thread(self.get, did)
+
+    def stats(self) -> dict:
+        with self._lock:
+            if self._fd is None:
+                return {"path": self.path, "open": False}
+            _, capacity, count, indexed_bytes, last_seq, _, last_hash = self._header()
+            return {
+                "path": self.path,
+                "open": True,
+                "records": count,
+                "bytes": indexed_bytes,
+                "head": last_hash.hex() if count else GENESIS_HASH,
+                "index_capacity": capacity,
+                "appends": self.appends,
+                "fsyncs": self.fsyncs,
+                "replayed_on_open": self.replayed,
+            }
+
+
+ledger = Ledger(
+    settings.LEDGER_PATH,
+    index_path=settings.LEDGER_INDEX_PATH,
+    group_commit_ms=settings.LEDGER_GROUP_COMMIT_MS,
+    file_locking=settings.LEDGER_FILE_LOCKING,
+)
+
+
+def open_ledger():
+    ledger.open()
+
+
+def close_ledger():
+    ledger.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.dao.ledger", description="DID ledger maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    verify = sub.add_parser("verify", help="check chain integrity in one streaming pass")
+    verify.add_argument("path", nargs="?", default=settings.LEDGER_PATH)
+    reindex = sub.add_parser("reindex", help="rebuild the offset index from the ledger")
+    reindex.add_argument("path", nargs="?", default=settings.LEDGER_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "verify":
+        result = verify_chain(args.path)
+        print(json.dumps(result, indent=2))
+        return 0 if result["ok"] else 1
+
+    target = Ledger(args.path, file_locking=settings.LEDGER_FILE_LOCKING)
+    target.open()
+    with target._file_lock(exclusive=True):
+        target._create_index(_MIN_CAPACITY)
+        target._recover()
+    print(json.dumps(target.stats(), indent=2))
+    target.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,22 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
-from app.dao.face_detect import detect_and_compare_faces
+from app.dao.verifier import VerifierBusy, face_verifier
+from app.dao.face_index import face_index
 from app.dao.blockchain import generate_blockchain_id, verify_blockchain_id
 from app.auth.jwt_handler import get_current_user
+from app.config import settings
+from app.store import create_store
 
 from datetime import datetime
 import uuid
 
 router = APIRouter()
 
-dao_verification_logs = []
+# DAO verification attempts, newest first (shared with app.logs.routes)
+dao_verification_logs = create_store("dao_logs", settings.DAO_LOG_STORE_CAPACITY)
 
-@router.post("/verify")
-async def verify_identity(
-    id_image: UploadFile = File(...),
-    camera_image: UploadFile = File(...),
-    fullname: str = Form(...),
-    dob: str = Form(...)
-):
-    """
-    1) Receives an uploaded ID + a live Camera photo
-    2) Extracts faces and compares them
-    3) If match, issues a Blockchain ID Hash
-    """
-    
-    id_bytes = await id_image.read()
-    camera_bytes = await camera_image.read()
-    
-    result = detect_and_compare_faces(camera_bytes, id_bytes)
+async def _verify_and_enroll(camera_bytes: bytes, id_bytes: bytes, fullname: str, dob: str):
+    """Compares the photos, checks the face index and enrolls a match (inside an admission slot)."""
+    result = await face_verifier.compare(camera_bytes, id_bytes, describe=True)
     
     if result.get("error"):
         raise HTTPException(status_code=400, detail=result["error"])
@@ -37,6 +27,15 @@ async def verify_identity(
         "message": "Faces match!" if result["match"] else "Faces do not match.",
         "blockchain_did": None
     }
+
+    descriptor = result.pop("descriptor")
+    similar = await face_verifier.run(face_index.search, descriptor, settings.FACE_INDEX_TOP_K)
+    response["similar_identities"] = similar
+    # Same face already enrolled under another name
+    response["duplicate_suspected"] = any(
+        match["similarity"] >= settings.FACE_DUPLICATE_SIMILARITY and match["name"] != fullname
+        for match in similar
+    )
     
     # If successful match, register to demo blockchain
     if result["match"]:
@@ -45,8 +44,47 @@ async def verify_identity(
             "dob": dob,
             "face_match_score": result["score"]
         }
-        did_hash = generate_blockchain_id(user_info)
+        did_hash = await generate_blockchain_id(user_info)
         response["blockchain_did"] = did_hash
+        await face_verifier.run(face_index.add, descriptor, {
+            "name": fullname,
+            "blockchain_did": did_hash,
+            "enrolled_at": datetime.utcnow().isoformat() + "Z",
+        })
+    return result, response
+
+@router.post("/verify")
+async def verify_identity(
+    id_image: UploadFile = File(...),
+    camera_image: UploadFile = File(...),
+    fullname: str = Form(...),
+    dob: str = Form(...)
+):
+    """
+    1) Receives an uploaded ID + a live Camera photo
+    2) Extracts faces and compares them
+    3) If match, issues a Blockchain ID Hash and enrolls the face
+    4) Returns the nearest previously enrolled identities (duplicate enrollment check)
+    Returns 503 with the queue position when too many verifications are pending.
+    """
+    
+    id_bytes = await id_image.read()
+    camera_bytes = await camera_image.read()
+    
+    try:
+        # One admission slot covers the comparison and the index search / enrollment
+        async with face_verifier.admitted():
+            result, response = await _verify_and_enroll(camera_bytes, id_bytes, fullname, dob)
+    except VerifierBusy as busy:
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "message": "Verification queue is full, retry shortly",
+                "queue_position": busy.queue_position,
+                "max_pending": busy.max_pending,
+            },
+            headers={"Retry-After": "1"},
+        )
         
     # Append to logs for Unified Audit
     log_entry = {
@@ -62,15 +100,18 @@ async def verify_identity(
         "risk_score": 1.0 - result["score"] # Inverse of confidence
     }
     
-    dao_verification_logs.insert(0, log_entry)
-    
-    if len(dao_verification_logs) > 100:
-        dao_verification_logs.pop()
+    await dao_verification_logs.add(log_entry)
 
     return response
+
+@router.get("/verify/stats")
+async def get_verify_stats(current_user: dict = Depends(get_current_user)):
+    """Face verification pool (admitted / rejected, latency) and enrolled-face index."""
+    return {**face_verifier.stats(), "index": face_index.stats()}
+
 @router.get("/blockchain/{did}")
 async def check_blockchain_id(did: str):
-    record = verify_blockchain_id(did)
+    record = await verify_blockchain_id(did)
     if not record:
         raise HTTPException(status_code=404, detail="Blockchain Identity not found")
         
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from app.config import settings
+from app.dao.face_index import face_descriptor
+from app.metrics import Histogram, observe_span, registry, state as metrics_state
+
+# Face verification takes 10s of ms to seconds
+VERIFY_MS_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _load_pipeline():
+    """Imports OpenCV (via face_detect) and parses this thread's Haar cascade."""
+    from app.dao.face_detect import get_face_cascade
+    get_face_cascade()
+
+
+class VerifierBusy(Exception):
+    """Raised when the verification queue is full."""
+
+    def __init__(self, queue_position: int, max_pending: int):
+        super().__init__(f"verification queue full ({max_pending} pending)")
+        self.queue_position = queue_position
+        self.max_pending = max_pending
+
+
+class FaceVerifier:
+    """
+    Runs the OpenCV face pipeline on a bounded thread pool, off the event loop.
+    Both photos of a verification are decoded and detected in parallel (OpenCV
+    releases the GIL). At most `max_pending` verifications are admitted at once;
+    the rest are refused with VerifierBusy so a burst of uploads cannot starve
+    transaction scoring.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.latency_ms = Histogram(VERIFY_MS_BUCKETS)
+
+    def start(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="face")
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def queue_position(self) -> int:
+        """Verifications ahead of a new one that are waiting for a worker."""
+        running = max(self.workers // 2, 1)  # each verification occupies two workers
+        return max(self.in_flight - running, 0) + 1
+
+    async def run(self, fn, *args):
+        """
+        Runs fn on the face pool and awaits the result. No admission check of its
+        own: request paths call it inside admitted(); only warm_up calls it bare.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.start(), fn, *args)
+
+    async def warm_up(self):
+        """Loads OpenCV and the Haar cascade on the pool ahead of the first upload."""
+        await self.run(_load_pipeline)
+
+    @asynccontextmanager
+    async def admitted(self):
+        """
+        Holds one of the max_pending admission slots for the body (every pool
+        call of a request: compare, index search, enrollment), raising
+        VerifierBusy if none is free.
+        """
+        if self.in_flight >= self.max_pending:
+            self.rejected += 1
+            raise VerifierBusy(self.queue_position(), self.max_pending)
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self.latency_ms.observe((time.perf_counter() - started) * 1000.0)
+
+    async def compare(self, image1_bytes: bytes, image2_bytes: bytes, describe: bool = False) -> dict:
+        """
+        Same contract as detect_and_compare_faces, run on the pool (call inside
+        admitted()). With describe, a successful result also carries
+        "descriptor", the face_descriptor of image 1.
+        """
+        # OpenCV is imported on first use (or by warm_up), not with the app
+        from app.dao.face_detect import compare_faces, extract_face
+
+        executor = self.start()
+        loop = asyncio.get_running_loop()
+        # Per-stage timings (seconds) from face_detect, exported as face.<stage> spans
+        timings = [{}, {}, {}] if metrics_state.enabled else [None, None, None]
+        try:
+            (face1, err1, _), (face2, err2, _) = await asyncio.gather(
+                loop.run_in_executor(executor, extract_face, image1_bytes, timings[0]),
+                loop.run_in_executor(executor, extract_face, image2_bytes, timings[1]),
+            )
+            if err1: return {"match": False, "score": 0.0, "error": f"Image 1: {err1}"}
+            if err2: return {"match": False, "score": 0.0, "error": f"Image 2: {err2}"}
+            result = await loop.run_in_executor(executor, compare_faces, face1, face2, timings[2])
+            if describe:
+                result["descriptor"] = await loop.run_in_executor(executor, face_descriptor, face1)
+            return result
+        finally:
+            for stage_timings in timings:
+                for stage, seconds in (stage_timings or {}).items():
+                    observe_span(f"face.{stage}", seconds)
+
+    def collect_metrics(self):
+        yield "face_verifications_in_flight", "gauge", "Face verifications admitted and not finished.", [({}, self.in_flight)]
+        yield "face_verifications_rejected_total", "counter", "Face verifications refused with a full queue.", [({}, self.rejected)]
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "latency_ms": self.latency_ms.snapshot(),
+        }
+
+
+face_verifier = FaceVerifier(
+    workers=settings.FACE_WORKERS or min(4, os.cpu_count() or 1),
+    max_pending=settings.FACE_MAX_PENDING,
+)
+registry.add_collector(face_verifier.collect_metrics)
+
+
+def start_face_verifier():
+    face_verifier.start()
+
+
+def shutdown_face_verifier():
+    face_verifier.shutdown()
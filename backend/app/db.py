@@ -6,9 +6,15 @@ redis_client = None
 
 async def init_redis():
     global redis_client
-    redis_client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+    pool = aioredis.ConnectionPool.from_url(
+        settings.REDIS_URL,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        decode_responses=True,
+    )
+    redis_client = aioredis.Redis(connection_pool=pool)
 
 async def close_redis():
     global redis_client
     if redis_client:
         await redis_client.close()
+        await redis_client.connection_pool.disconnect()
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Optional
+
+import numpy as np
+
+from app.fraud.executor import run_scoring
+from app.fraud.model import FEATURE_NAMES, predict_fraud_batch, predict_fraud_matrix
+from app.analytics import format_us, to_us
+from app.fraud.schemas import BulkTransactionMeta, TransactionInput
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json")
+ARROW_TYPES = ("application/vnd.apache.arrow.stream",)
+
+_DONE = object()
+
+
+class PayloadTooLarge(Exception):
+    """Raised when a bulk request body is larger than the configured limit."""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"request body exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+async def spool_request(request, max_memory: int, max_bytes: int):
+    """
+    Copies the request body into a SpooledTemporaryFile: kept in memory up to
+    max_memory bytes, then rolled over to disk. The body has to be fully received
+    before a StreamingResponse starts (it listens on the same ASGI receive channel).
+    Raises PayloadTooLarge once the body (or its Content-Length) passes max_bytes,
+    before the disk fills up.
+    """
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > max_bytes:
+        raise PayloadTooLarge(max_bytes)
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_bytes:
+                raise PayloadTooLarge(max_bytes)
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def new_record(user_id: str, features: dict, meta: Optional[BulkTransactionMeta] = None) -> dict:
+    """
+    A transaction to score, always under a server-assigned id (16 hex digits, so
+    a large back-fill cannot collide with a live transaction). "timestamp" is
+    when the server received it (the store restamps it on insert and orders by
+    it); the caller's id and time are kept as "external_id" and "occurred_at".
+    """
+    record = {
+        "id": f"TXN-{uuid.uuid4().hex[:16]}",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "user_id": user_id,
+        "features": features,
+    }
+    if meta is not None:
+        if meta.id is not None:
+            record["external_id"] = meta.id
+        if meta.timestamp is not None:
+            occurred = meta.timestamp
+            if occurred.tzinfo is None:
+                occurred = occurred.replace(tzinfo=timezone.utc)
+            record["occurred_at"] = format_us(to_us(occurred.timestamp()))
+    return record
+
+
+def iter_ndjson_chunks(fp, chunk_size: int):
+    """
+    Yields (records, errors) per chunk of up to chunk_size valid lines.
+    Each line is a TransactionInput object, optionally with "id" and "timestamp"
+    (see BulkTransactionMeta); a line failing either schema becomes an error.
+    """
+    records, errors = [], []
+    for lineno, line in enumerate(fp, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+            tx_input = TransactionInput(**obj)
+            meta = BulkTransactionMeta(**obj)
+        except (ValueError, TypeError) as e:
+            errors.append({"type": "error", "line": lineno, "error": str(e)})
+            continue
+        records.append(new_record(tx_input.user_id, tx_input.features.dict(), meta))
+        if len(records) >= chunk_size:
+            yield records, errors
+            records, errors = [], []
+    if records or errors:
+        yield records, errors
+
+
+def iter_arrow_chunks(fp, chunk_size: int):
+    """
+    Yields (records, X, errors) per chunk of an Arrow IPC stream with a user_id column
+    and one column per model feature. Each row is validated like an NDJSON line
+    (TransactionInput, plus optional id / timestamp columns as BulkTransactionMeta):
+    a null or non-numeric feature makes that row an error (row numbers count from 1),
+    left out of records and X.
+    """
+    import pyarrow as pa
+
+    reader = pa.ipc.open_stream(fp)
+    names = set(reader.schema.names)
+    missing = [name for name in ["user_id"] + FEATURE_NAMES if name not in names]
+    if missing:
+        raise ValueError(f"Arrow stream is missing columns: {', '.join(missing)}")
+
+    row = 0
+    for record_batch in reader:
+        for offset in range(0, record_batch.num_rows, chunk_size):
+            part = record_batch.slice(offset, chunk_size)
+            values = {name: part.column(name).to_pylist() for name in FEATURE_NAMES}
+            user_ids = part.column("user_id").to_pylist()
+            ids = part.column("id").to_pylist() if "id" in names else [None] * part.num_rows
+            timestamps = part.column("timestamp").to_pylist() if "timestamp" in names else [None] * part.num_rows
+
+            records, errors = [], []
+            for i in range(part.num_rows):
+                try:
+                    tx_input = TransactionInput(
+                        user_id=user_ids[i], features={name: values[name][i] for name in FEATURE_NAMES}
+                    )
+                    meta = BulkTransactionMeta(id=ids[i], timestamp=timestamps[i])
+                except (ValueError, TypeError) as e:
+                    errors.append({"type": "error", "row": row + i + 1, "error": str(e)})
+                    continue
+                records.append(new_record(tx_input.user_id, tx_input.features.dict(), meta))
+            row += part.num_rows
+            X = np.array(
+                [[record["features"][name] for name in FEATURE_NAMES] for record in records], dtype=np.float64
+            ).reshape(len(records), len(FEATURE_NAMES))
+            yield records, X, errors
+
+
+def _dump(obj) -> bytes:
+    return (json.dumps(obj) + "\n").encode()
+
+
+async def score_bulk(
+    fp,
+    content_kind: str,
+    chunk_size: int,
+    explain: bool = False,
+    on_chunk: Optional[Callable] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Scores a spooled NDJSON or Arrow body chunk by chunk and yields NDJSON lines:
+    one scored transaction per input row, error lines for rejected rows, and a
+    final {"type": "summary"} line. on_chunk(records) is awaited after each chunk.
+    Reading, parsing and validating a chunk runs on a worker thread, so a large
+    body never blocks the event loop.
+    """
+    summary = {"type": "summary", "scored": 0, "flagged": 0, "errors": 0}
+    try:
+        if content_kind == "arrow":
+            chunks = iter_arrow_chunks(fp, chunk_size)
+        else:
+            chunks = ((records, None, errors) for records, errors in iter_ndjson_chunks(fp, chunk_size))
+
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, _DONE)
+            if chunk is _DONE:
+                break
+            records, X, errors = chunk
+            out = [_dump(err) for err in errors]
+            summary["errors"] += len(errors)
+
+            if records:
+                flags = [explain] * len(records)
+                if X is not None:
+                    results = await run_scoring(predict_fraud_matrix, X, flags)
+                else:
+                    results = await run_scoring(predict_fraud_batch, [r["features"] for r in records], flags)
+
+                for record, (risk_score, is_fraud, explanations) in zip(records, results):
+                    record["risk_score"] = risk_score
+                    record["is_fraud"] = is_fraud
+                    record["explanations"] = explanations
+                    summary["flagged"] += is_fraud
+                summary["scored"] += len(records)
+
+                # Stored first: the store stamps the timestamp the lines report
+                if on_chunk is not None:
+                    await on_chunk(records)
+                out.extend(_dump(record) for record in records)
+
+            yield b"".join(out)
+    except Exception as e:
+        # Headers are already sent; report the failure in-band
+        summary["errors"] += 1
+        yield _dump({"type": "error", "error": str(e)})
+    finally:
+        fp.close()
+
+    yield _dump(summary)
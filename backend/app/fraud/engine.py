@@ -0,0 +1,121 @@
+import asyncio
+import time
+from typing import List, Optional, Set
+
+from app.config import settings
+from app.fraud.executor import run_scoring
+from app.fraud.model import predict_fraud_batch, explain_fraud
+from app.fraud.registry import model_registry
+from app.metrics import Histogram, BATCH_SIZE_BUCKETS, LATENCY_MS_BUCKETS, registry
+
+
+class ScoringEngine:
+    """
+    Micro-batching front end for the fraud model.
+
+    Callers await score(features). Requests are queued and flushed as one
+    model call when either max_batch_size requests are waiting or the oldest
+    one has waited max_wait_ms. Each caller's future is resolved with its own
+    (fraud_score, is_fraud, shap_explanations) tuple.
+
+    Batches run on the executor selected by SCORING_EXECUTOR, so several
+    batches can be in flight while the event loop keeps serving requests.
+    Delivered batches are also handed to the shadow model, if one is loaded.
+    """
+
+    def __init__(self, max_batch_size: int = 64, max_wait_ms: float = 2.0):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._pending: List[tuple] = []  # (features, explain, future, enqueued_at)
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight: Set[asyncio.Task] = set()
+
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(LATENCY_MS_BUCKETS)
+        self.batch_latency_ms = Histogram(LATENCY_MS_BUCKETS)
+
+    async def score(self, features: dict, explain: bool = False):
+        """
+        Queues one feature dict for the next batch. SHAP explanations are computed for
+        flagged transactions, or for any transaction when explain=True; otherwise None.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((features, explain, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+        if self._pending:
+            # Leftovers start their own deadline
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+
+        task = asyncio.ensure_future(self._run_batch(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _run_batch(self, batch: List[tuple]):
+        started = time.perf_counter()
+        self.batch_sizes.observe(len(batch))
+        for *_, enqueued_at in batch:
+            self.queue_wait_ms.observe((started - enqueued_at) * 1000.0)
+
+        features = [features for features, _, _, _ in batch]
+        try:
+            results = await run_scoring(
+                predict_fraud_batch,
+                features,
+                [explain for _, explain, _, _ in batch],
+            )
+        except Exception as e:
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batch_latency_ms.observe((time.perf_counter() - started) * 1000.0)
+        for (_, _, future, _), result in zip(batch, results):
+            # The caller may have gone away (client disconnect cancels the handler)
+            if not future.done():
+                future.set_result(result)
+        # After delivery, so the shadow model never adds to request latency
+        model_registry.observe(features, results)
+
+    async def explain(self, features: dict):
+        """SHAP explanations for one feature dict, computed off the event loop."""
+        return await run_scoring(explain_fraud, features)
+
+    def collect_metrics(self):
+        yield "scoring_pending", "gauge", "Transactions waiting for the next batch.", [({}, len(self._pending))]
+        yield "scoring_batches_in_flight", "gauge", "Scoring batches running.", [({}, len(self._in_flight))]
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "pending": len(self._pending),
+            "batches_in_flight": len(self._in_flight),
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+            "batch_latency_ms": self.batch_latency_ms.snapshot(),
+        }
+
+
+scoring_engine = ScoringEngine(
+    max_batch_size=settings.SCORING_MAX_BATCH_SIZE,
+    max_wait_ms=settings.SCORING_MAX_WAIT_MS,
+)
+registry.add_collector(scoring_engine.collect_metrics)
@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from app import metrics
+from app.config import settings
+from app.fraud import model
+
+EXECUTOR_MODES = ("inline", "thread", "process")
+
+_executor: Optional[Executor] = None
+
+
+def _init_worker(path: str = model.MODEL_PATH, sha256: Optional[str] = None):
+    """
+    Runs once in every scoring process: loads the model file and builds the
+    worker's own TreeExplainer, pinned to one thread so N workers use N cores.
+    With `sha256`, the file must still hash to it (the worker refuses to start
+    on a file that was replaced after it was validated).
+    """
+    if not os.path.exists(path):
+        raise RuntimeError("Fraud model not initialized or found.")
+    version = model.load_version(path)
+    if sha256 is not None and version.sha256 != sha256:
+        raise RuntimeError(f"model file {path} has sha256 {version.sha256}, expected {sha256}")
+    model.activate(version)
+    if model.booster is not None:
+        model.booster.set_param({"nthread": 1})
+
+
+def _worker_count() -> int:
+    return settings.SCORING_WORKERS or os.cpu_count() or 1
+
+
+def start_executor():
+    """
+    Creates the scoring executor selected by SCORING_EXECUTOR:
+      inline  - score on the event loop (no executor)
+      thread  - ThreadPoolExecutor sharing the process' model
+      process - ProcessPoolExecutor, one model + explainer per worker
+    """
+    global _executor
+    mode = settings.SCORING_EXECUTOR
+    if mode not in EXECUTOR_MODES:
+        raise ValueError(f"SCORING_EXECUTOR must be one of {EXECUTOR_MODES}, got {mode!r}")
+    if _executor is not None or mode == "inline":
+        return _executor
+
+    workers = _worker_count()
+    if mode == "thread":
+        # The model is loaded by warm_up_scoring (or the first request), under model._load_lock
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scoring")
+    else:
+        _executor = _process_pool(model.MODEL_PATH)
+    return _executor
+
+
+def _process_pool(path: str, sha256: Optional[str] = None) -> ProcessPoolExecutor:
+    # spawn, not fork: forking after xgboost's OpenMP pool exists can deadlock
+    return ProcessPoolExecutor(
+        max_workers=_worker_count(),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(path, sha256),
+    )
+
+
+def _file_sha256(path: str) -> str:
+    with open(path, "rb") as fp:
+        return hashlib.sha256(fp.read()).hexdigest()
+
+
+async def _warm_up_pool(executor: ProcessPoolExecutor):
+    loop = asyncio.get_running_loop()
+    # Submitting one call per worker while none is idle makes the pool spawn all of them
+    await asyncio.gather(*(loop.run_in_executor(executor, model.warm_up) for _ in range(_worker_count())))
+
+
+async def replace_process_pool(path: str, sha256: Optional[str] = None):
+    """
+    Starts a new process pool on the model at `path`, warms up every worker,
+    then routes new calls to it. Calls already submitted to the old pool
+    finish there before its workers exit. With `sha256` every worker verifies
+    the file it loaded; on a mismatch the new pool is discarded, the old one
+    keeps serving and RuntimeError (or BrokenProcessPool) is raised.
+    """
+    global _executor
+    if sha256 is not None:
+        # Fails fast with a readable error; the workers check again after spawning
+        actual = await asyncio.to_thread(_file_sha256, path)
+        if actual != sha256:
+            raise RuntimeError(f"model file {path} has sha256 {actual}, expected {sha256}")
+    pool = _process_pool(path, sha256)
+    try:
+        await _warm_up_pool(pool)
+    except BaseException:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    old, _executor = _executor, pool
+    if old is not None:
+        old.shutdown(wait=False)
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+async def warm_up_scoring():
+    """
+    Runs model.warm_up wherever scoring runs: in every worker of the process
+    pool, otherwise once on a helper thread (the model is shared in-process),
+    so the event loop keeps serving meanwhile.
+    """
+    if settings.SCORING_EXECUTOR != "process":
+        await asyncio.to_thread(model.warm_up)
+        return
+    await _warm_up_pool(start_executor())
+
+
+def _call_with_spans(spans_enabled: bool, fn, *args):
+    """Runs in a scoring process: fn(*args) plus the spans it recorded (predict.*)."""
+    metrics.state.enabled = spans_enabled
+    result = fn(*args)
+    return result, metrics.drain_spans() if spans_enabled else None
+
+
+async def run_scoring(fn, *args):
+    """
+    Runs a scoring function on the configured executor and awaits the result.
+    In process mode the worker's span timings come back with the result and
+    are merged into this process' app_span_seconds.
+    """
+    if settings.SCORING_EXECUTOR == "inline":
+        return fn(*args)
+    executor = _executor or start_executor()
+    loop = asyncio.get_running_loop()
+    if settings.SCORING_EXECUTOR != "process":
+        return await loop.run_in_executor(executor, fn, *args)
+    result, spans = await loop.run_in_executor(executor, _call_with_spans, metrics.state.enabled, fn, *args)
+    if spans:
+        metrics.merge_spans(spans)
+    return result
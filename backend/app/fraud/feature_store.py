@@ -0,0 +1,289 @@
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from app import db
+from app.config import settings
+from app.metrics import timed
+
+# Sliding windows: name -> (bucket width in seconds, number of buckets)
+FEATURE_WINDOWS = {"1h": (300, 12), "24h": (3600, 24)}
+# Distinct devices are tracked in this many most-recent slots per user
+DEVICE_SLOTS = 8
+
+VELOCITY_SOURCES = ("client", "server", "max")
+
+
+def enrich_features(features: dict, behavior: dict, velocity_source: str) -> dict:
+    """Model features with velocity_1h taken from the client, the feature store, or the max of both."""
+    if velocity_source == "client":
+        return features
+    server = behavior["tx_count_1h"]
+    velocity = server if velocity_source == "server" else max(features["velocity_1h"], server)
+    return {**features, "velocity_1h": velocity}
+
+
+class MemoryFeatureStore:
+    """
+    Per-user sliding-window counters for the process.
+
+    Every user owns a fixed row of ring buckets (per window: transaction count
+    and amount sum per bucket) with running window totals and the newest bucket
+    number; when time moves on, the buckets that fall out of the window are
+    subtracted from the totals, so reads are O(1). Plus DEVICE_SLOTS (device
+    hash, last seen) pairs. Rows live in flat typed arrays and are recycled:
+    users idle for `ttl` seconds are evicted, and past `max_users` the least
+    recently seen user is. About 0.75 KB per user (tracemalloc over 200k users:
+    ~0.6 KB of arrays plus the LRU entry, not counting the user_id string).
+    """
+
+    def __init__(self, max_users: int, ttl: float):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._layout = []
+        offset = 0
+        for name, (width, buckets) in FEATURE_WINDOWS.items():
+            keys = (f"tx_count_{name}", f"amount_sum_{name}", f"distinct_devices_{name}")
+            self._layout.append((len(self._layout), keys, offset, width, buckets, width * buckets))
+            offset += buckets
+        self._row = offset
+        self._windows = len(self._layout)
+        self._empty_devices = array("I", [0] * DEVICE_SLOTS)
+
+        self._slots: "OrderedDict[str, int]" = OrderedDict()  # user -> row, least recently seen first
+        self._free: List[int] = []
+        self._last_seen = array("d")
+        self._count = array("I")  # per bucket
+        self._amount = array("d")
+        self._head = array("q")  # per window: newest bucket number
+        self._total_count = array("q")
+        self._total_amount = array("d")
+        self._device = array("I")
+        self._device_seen = array("d")
+
+        self.observed = 0
+        self.evicted_ttl = 0
+        self.evicted_lru = 0
+
+    def _allocate(self, user_id: str, now: float) -> int:
+        if len(self._slots) >= self.max_users:
+            _, slot = self._slots.popitem(last=False)
+            self._free.append(slot)
+            self.evicted_lru += 1
+        if self._free:
+            slot = self._free.pop()
+            # A head of -1 makes the first observation reset every window
+            for t in range(slot * self._windows, (slot + 1) * self._windows):
+                self._head[t] = -1
+            self._device[slot * DEVICE_SLOTS:(slot + 1) * DEVICE_SLOTS] = self._empty_devices
+        else:
+            slot = len(self._last_seen)
+            self._last_seen.append(now)
+            self._count.extend([0] * self._row)
+            self._amount.extend([0.0] * self._row)
+            self._head.extend([-1] * self._windows)
+            self._total_count.extend([0] * self._windows)
+            self._total_amount.extend([0.0] * self._windows)
+            self._device.extend([0] * DEVICE_SLOTS)
+            self._device_seen.extend([0.0] * DEVICE_SLOTS)
+        self._slots[user_id] = slot
+        return slot
+
+    def _evict_expired(self, now: float):
+        while self._slots:
+            user_id, slot = next(iter(self._slots.items()))
+            if self._last_seen[slot] >= now - self.ttl:
+                return
+            del self._slots[user_id]
+            self._free.append(slot)
+            self.evicted_ttl += 1
+
+    def observe_sync(self, user_id: str, amount: float, device_id: Optional[str] = None, ts: Optional[float] = None) -> Dict[str, float]:
+        """Features of the user's activity before this transaction, then records it."""
+        now = time.time() if ts is None else ts
+        self._evict_expired(now)
+        slot = self._slots.get(user_id)
+        if slot is None:
+            slot = self._allocate(user_id, now)
+        else:
+            self._slots.move_to_end(user_id)
+        self._last_seen[slot] = now
+        self.observed += 1
+
+        counts, amounts = self._count, self._amount
+        heads, total_counts, total_amounts = self._head, self._total_count, self._total_amount
+        first_device = slot * DEVICE_SLOTS
+        device_hashes = self._device[first_device:first_device + DEVICE_SLOTS]
+        device_seen = self._device_seen[first_device:first_device + DEVICE_SLOTS]
+        features = {}
+        row_start = slot * self._row
+        window_start = slot * self._windows
+        for w, (count_key, amount_key, devices_key), offset, width, buckets, span in self._layout:
+            current = int(now // width)
+            row = row_start + offset
+            t = window_start + w
+            head = heads[t]
+            if current > head:
+                if current - head >= buckets:
+                    counts[row:row + buckets] = array("I", bytes(4 * buckets))
+                    amounts[row:row + buckets] = array("d", bytes(8 * buckets))
+                    total_counts[t] = 0
+                    total_amounts[t] = 0.0
+                else:
+                    # Buckets head+1 .. current rotate out of the window
+                    for bucket in range(head + 1, current + 1):
+                        j = row + bucket % buckets
+                        total_counts[t] -= counts[j]
+                        total_amounts[t] -= amounts[j]
+                        counts[j] = 0
+                        amounts[j] = 0.0
+                heads[t] = head = current
+
+            since = now - span
+            features[count_key] = total_counts[t]
+            features[amount_key] = round(total_amounts[t], 2)
+            distinct = 0
+            for h, seen in zip(device_hashes, device_seen):
+                if h and seen >= since:
+                    distinct += 1
+            features[devices_key] = distinct
+
+            j = row + head % buckets
+            counts[j] += 1
+            amounts[j] += amount
+            total_counts[t] += 1
+            total_amounts[t] += amount
+
+        if device_id:
+            device_hash = zlib.crc32(device_id.encode("utf-8")) or 1
+            if device_hash in device_hashes:
+                target = device_hashes.index(device_hash)
+            else:
+                # an empty slot (seen 0.0) or the least recently seen device
+                target = device_seen.index(min(device_seen))
+            self._device[first_device + target] = device_hash
+            self._device_seen[first_device + target] = now
+        return features
+
+    async def observe(self, user_id: str, amount: float, device_id: Optional[str] = None, ts: Optional[float] = None) -> Dict[str, float]:
+        return self.observe_sync(user_id, amount, device_id, ts)
+
+    async def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "users": len(self._slots),
+            "max_users": self.max_users,
+            "ttl_s": self.ttl,
+            "allocated_rows": len(self._last_seen),
+            "observed": self.observed,
+            "evicted_ttl": self.evicted_ttl,
+            "evicted_lru": self.evicted_lru,
+        }
+
+
+# KEYS: counters hash, device zset. ARGV: now, amount, device ("" = none), ttl,
+# then (window name, bucket width, bucket count) per window.
+# Hash fields are c:<window>:<bucket> (count) and a:<window>:<bucket> (amount).
+# Returns count, amount sum (string) and distinct devices per window.
+_OBSERVE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local amount = tonumber(ARGV[2])
+local device = ARGV[3]
+local ttl = tonumber(ARGV[4])
+local fields = redis.call('HGETALL', KEYS[1])
+local out = {}
+local stale = {}
+for i = 5, #ARGV, 3 do
+  local name = ARGV[i]
+  local width = tonumber(ARGV[i + 1])
+  local buckets = tonumber(ARGV[i + 2])
+  local current = math.floor(now / width)
+  local count, total = 0, 0
+  for j = 1, #fields, 2 do
+    local kind, window, bucket = string.match(fields[j], '^(%a):([^:]+):(%d+)$')
+    if window == name then
+      if tonumber(bucket) > current - buckets then
+        if kind == 'c' then count = count + tonumber(fields[j + 1]) else total = total + tonumber(fields[j + 1]) end
+      else
+        stale[#stale + 1] = fields[j]
+      end
+    end
+  end
+  out[#out + 1] = count
+  out[#out + 1] = tostring(total)
+  out[#out + 1] = redis.call('ZCOUNT', KEYS[2], now - width * buckets, '+inf')
+  redis.call('HINCRBY', KEYS[1], 'c:' .. name .. ':' .. current, 1)
+  redis.call('HINCRBYFLOAT', KEYS[1], 'a:' .. name .. ':' .. current, amount)
+end
+if #stale > 0 then redis.call('HDEL', KEYS[1], unpack(stale)) end
+redis.call('EXPIRE', KEYS[1], ttl)
+if device ~= '' then
+  redis.call('ZADD', KEYS[2], now, device)
+  redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now - ttl)
+  redis.call('EXPIRE', KEYS[2], ttl)
+end
+return out
+"""
+
+
+class RedisFeatureStore:
+    """
+    The same features shared by all workers: one counters hash and one device
+    sorted set per user, updated by a single Lua script per transaction and
+    expiring after `ttl` seconds of inactivity. Uses the pooled client from app.db.
+    """
+
+    def __init__(self, max_users: int, ttl: float):
+        self.ttl = int(ttl)
+        self.prefix = f"{settings.REDIS_KEY_PREFIX}:features"
+        self._script = None
+        self._windows = [str(v) for name, (width, buckets) in FEATURE_WINDOWS.items() for v in (name, width, buckets)]
+        self.observed = 0
+
+    @property
+    def redis(self):
+        if db.redis_client is None:
+            raise RuntimeError("Redis is not initialized (FEATURE_STORE_BACKEND=redis needs init_redis at startup)")
+        return db.redis_client
+
+    async def observe(self, user_id: str, amount: float, device_id: Optional[str] = None, ts: Optional[float] = None) -> Dict[str, float]:
+        if self._script is None:
+            self._script = self.redis.register_script(_OBSERVE_SCRIPT)
+        now = time.time() if ts is None else ts
+        values = await self._script(
+            keys=[f"{self.prefix}:{user_id}", f"{self.prefix}:{user_id}:devices"],
+            args=[now, amount, device_id or "", self.ttl, *self._windows],
+        )
+        self.observed += 1
+        features = {}
+        for i, name in enumerate(FEATURE_WINDOWS):
+            count, total, devices = values[3 * i:3 * i + 3]
+            features[f"tx_count_{name}"] = int(count)
+            features[f"amount_sum_{name}"] = round(float(total), 2)
+            features[f"distinct_devices_{name}"] = int(devices)
+        return features
+
+    async def stats(self) -> dict:
+        return {"backend": "redis", "ttl_s": self.ttl, "observed": self.observed}
+
+
+FEATURE_STORE_BACKENDS = {"memory": MemoryFeatureStore, "redis": RedisFeatureStore}
+
+
+def create_feature_store():
+    if settings.FEATURE_STORE_VELOCITY not in VELOCITY_SOURCES:
+        raise ValueError(f"FEATURE_STORE_VELOCITY must be one of {VELOCITY_SOURCES}, got {settings.FEATURE_STORE_VELOCITY!r}")
+    try:
+        backend = FEATURE_STORE_BACKENDS[settings.FEATURE_STORE_BACKEND]
+    except KeyError:
+        raise ValueError(
+            f"FEATURE_STORE_BACKEND must be one of {tuple(FEATURE_STORE_BACKENDS)}, got {settings.FEATURE_STORE_BACKEND!r}"
+        )
+    store = backend(settings.FEATURE_STORE_MAX_USERS, settings.FEATURE_STORE_TTL_S)
+    store.observe = timed("store.features.observe", store.observe)
+    return store
+
+
+feature_store = create_feature_store()
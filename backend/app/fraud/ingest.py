@@ -0,0 +1,586 @@
+"""
+Background transaction ingestion.
+
+Sources (the simulator, a Redis Stream, a tailed NDJSON file) feed a chain of
+stages connected by bounded asyncio queues:
+
+    parse -> enrich -> score -> [resequence] -> store -> broadcast
+
+Every stage runs its own number of workers and takes items in batches of up
+to its batch size. A full queue blocks the stage in front of it, and a full
+parse queue blocks the source readers, so a source that outpaces the model
+is read more slowly instead of buffering without limit: memory is bounded by
+INGEST_QUEUE_SIZE items per stage, and the score stage runs full batches
+back to back whenever there is a backlog.
+
+Items are numbered as they are read. The parallel stages may finish them
+out of order, so they are put back in read order before the store, which
+(like broadcast) runs a single worker: transactions are stored and
+broadcast in the order each source delivered them. A batch whose handler
+raises is retried up to INGEST_MAX_ATTEMPTS times with exponential backoff,
+then given up on: its items are nacked (a Redis entry goes to the
+"<stream>:dead" stream) and counted as failed. Items are acknowledged to
+their source once stored, so a batch that fails in broadcast is only
+counted: it is stored already and is neither nacked nor delivered again.
+"""
+import asyncio
+import heapq
+import json
+import os
+import socket
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from redis.exceptions import ResponseError
+
+from app import db
+from app.config import settings
+from app.fraud.bulk import new_record
+from app.fraud.executor import run_scoring
+from app.fraud.feature_store import enrich_features, feature_store
+from app.fraud.model import predict_fraud_batch
+from app.fraud.registry import model_registry
+from app.fraud.schemas import BulkTransactionMeta, TransactionInput
+from app.fraud.simulator import TransactionGenerator, generate_transactions
+from app.metrics import registry
+from app.websocket.manager import manager
+
+QUEUE_WAIT_SECONDS = registry.histogram("ingest_queue_wait_seconds", "Time items wait in a stage's input queue.", ("stage",))
+STAGE_SECONDS = registry.histogram("ingest_stage_seconds", "Time a stage spends on one batch.", ("stage",))
+END_TO_END_SECONDS = registry.histogram("ingest_end_to_end_seconds", "Time from reading an item to broadcasting it.")
+
+# Seconds before a failed source is read again
+SOURCE_RETRY_S = 1.0
+
+
+# --- sources ---
+# A source is an async iterator of (payload, ack token) pairs. The payload is a
+# TransactionInput dict or its JSON text; tokens of items that are stored (or
+# rejected) are passed to ack(), and (token, payload) pairs of items that failed
+# every attempt before the store to nack().
+
+class SimulatorSource:
+    """app.fraud.simulator.generate_transactions, at `rate` per second (None = demo pace)."""
+
+    name = "simulator"
+
+    def __init__(self, rate: Optional[float] = None, seed: Optional[int] = None):
+        self.rate = rate
+        self.seed = seed
+
+    async def items(self) -> AsyncIterator[Tuple[object, Optional[str]]]:
+        async for tx in generate_transactions(self.rate, TransactionGenerator(seed=self.seed)):
+            yield tx, None
+
+    async def ack(self, tokens: List[str]):
+        pass
+
+    async def nack(self, entries: List[Tuple[str, object]], error: str):
+        pass
+
+
+class RedisStreamSource:
+    """
+    Reads a Redis Stream as a member of a consumer group; each entry holds one
+    transaction as JSON in its "data" field. Entries are acknowledged (XACK)
+    once stored, so entries still inside the pipeline when the process stops
+    are delivered again: on start, this consumer's pending entries are read
+    first. The read position is kept across items() calls, so after a read
+    error the pipeline resumes where it stopped rather than receiving the
+    entries it already holds a second time. Entries that failed every attempt
+    are copied to the `<stream>:dead` stream (with the error) and acknowledged.
+    """
+
+    name = "redis"
+
+    def __init__(self, stream: str, group: str, consumer: Optional[str] = None, count: int = 256, block_ms: int = 1000):
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.dead_stream = f"{stream}:dead"
+        self.count = count
+        self.block_ms = block_ms
+        self._cursor = "0"  # our pending entries first, then ">" for new ones
+
+    async def _ensure_group(self):
+        try:
+            await db.redis_client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def items(self) -> AsyncIterator[Tuple[object, Optional[str]]]:
+        await self._ensure_group()
+        while True:
+            response = await db.redis_client.xreadgroup(
+                self.group, self.consumer, {self.stream: self._cursor}, count=self.count, block=self.block_ms
+            )
+            entries = response[0][1] if response else []
+            if self._cursor != ">" and not entries:
+                self._cursor = ">"
+            for entry_id, fields in entries:
+                if self._cursor != ">":
+                    self._cursor = entry_id
+                yield fields.get("data", fields), entry_id
+
+    async def ack(self, tokens: List[str]):
+        if tokens:
+            await db.redis_client.xack(self.stream, self.group, *tokens)
+
+    async def nack(self, entries: List[Tuple[str, object]], error: str):
+        async with db.redis_client.pipeline(transaction=False) as pipe:
+            for entry_id, payload in entries:
+                data = payload if isinstance(payload, (str, bytes)) else json.dumps(payload)
+                pipe.xadd(self.dead_stream, {"id": entry_id, "data": data, "error": error})
+            pipe.xack(self.stream, self.group, *(entry_id for entry_id, _ in entries))
+            await pipe.execute()
+
+
+class FileTailSource:
+    """
+    Follows an NDJSON file like `tail -F`: new complete lines are read as they
+    are appended, polling every `poll_interval` seconds at the end of the file.
+    A truncated or replaced (rotated) file is read again from its start.
+    """
+
+    name = "file"
+
+    def __init__(self, path: str, from_start: bool = False, poll_interval: float = 0.25, read_size: int = 1 << 20):
+        self.path = path
+        self.from_start = from_start
+        self.poll_interval = poll_interval
+        self.read_size = read_size
+        self.position: Optional[int] = None
+        self._inode: Optional[int] = None
+
+    def _read_lines(self) -> List[bytes]:
+        """Complete lines appended since the last call, up to about read_size bytes."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+        if self.position is None:
+            self.position = 0 if self.from_start else st.st_size
+        elif st.st_ino != self._inode or st.st_size < self.position:
+            self.position = 0
+        self._inode = st.st_ino
+        if st.st_size == self.position:
+            return []
+        with open(self.path, "rb") as fp:
+            fp.seek(self.position)
+            lines = fp.readlines(self.read_size)
+        if lines and not lines[-1].endswith(b"\n"):
+            lines.pop()  # still being written
+        self.position += sum(len(line) for line in lines)
+        return lines
+
+    async def items(self) -> AsyncIterator[Tuple[object, Optional[str]]]:
+        while True:
+            lines = await asyncio.to_thread(self._read_lines)
+            if not lines:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            for line in lines:
+                if line.strip():
+                    yield line, None
+
+    async def ack(self, tokens: List[str]):
+        pass
+
+    async def nack(self, entries: List[Tuple[str, object]], error: str):
+        pass
+
+
+# --- pipeline ---
+
+class _Item:
+    __slots__ = ("seq", "payload", "source", "token", "received", "enqueued", "record", "device_id")
+
+    def __init__(self, seq: int, payload, source, token: Optional[str]):
+        self.seq = seq  # read order across all sources
+        self.payload = payload
+        self.source = source
+        self.token = token
+        self.received = time.perf_counter()
+        self.enqueued = self.received
+        self.record: Optional[dict] = None
+        self.device_id: Optional[str] = None
+
+
+class _Resequencer:
+    """
+    Passes items on to `inbox` in read order (item.seq). Stages in front of it
+    may finish items out of order; the numbers of items that will never come
+    (rejected or failed upstream) are skipped. Holds at most the items in
+    flight upstream, which the stage queues bound.
+    """
+
+    def __init__(self, inbox: asyncio.Queue):
+        self.inbox = inbox
+        self.next_seq = 0
+        self._waiting: List[Tuple[int, _Item]] = []  # heap by seq
+        self._skipped = set()
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._waiting)
+
+    async def put(self, item: _Item):
+        heapq.heappush(self._waiting, (item.seq, item))
+        await self._release()
+
+    async def skip(self, seqs: List[int]):
+        # Items already released (failing in or after the ordered stage) need nothing,
+        # and must not wait for the lock a releaser holds while that stage is full
+        pending = [seq for seq in seqs if seq >= self.next_seq]
+        if pending:
+            self._skipped.update(pending)
+            await self._release()
+
+    async def _release(self):
+        # One releaser at a time, so items enter the inbox in order
+        async with self._lock:
+            while True:
+                if self.next_seq in self._skipped:
+                    self._skipped.discard(self.next_seq)
+                elif self._waiting and self._waiting[0][0] == self.next_seq:
+                    _, item = heapq.heappop(self._waiting)
+                    item.enqueued = time.perf_counter()
+                    await self.inbox.put(item)  # blocks while the stage is full
+                else:
+                    return
+                self.next_seq += 1
+
+    def reset(self):
+        self.next_seq = 0
+        self._waiting.clear()
+        self._skipped.clear()
+
+
+class Stage:
+    """
+    `workers` tasks that take up to `batch_size` items from `inbox`, run
+    `handler(items)` and put the items it returns on the next stage's inbox
+    (through its resequencer, for an `ordered` stage). Items the handler leaves
+    out are rejected and acknowledged. If the handler raises, the batch is
+    retried with exponential backoff; after max_attempts its items are counted
+    as failed, and nacked unless the stage is `acknowledged` (its items were
+    acknowledged to their source by an earlier stage).
+    """
+
+    def __init__(
+        self, pipeline: "IngestionPipeline", name: str, handler, workers: int, batch_size: int, queue_size: int,
+        ordered: bool = False, acknowledged: bool = False,
+    ):
+        self.pipeline = pipeline
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.batch_size = batch_size
+        self.inbox: asyncio.Queue = asyncio.Queue(queue_size)
+        self.resequencer = _Resequencer(self.inbox) if ordered else None
+        self.acknowledged = acknowledged
+        self.next: Optional[Stage] = None
+        self.busy = 0
+        self.processed = 0
+        self.rejected = 0
+        self.retries = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+        self.queue_wait = QUEUE_WAIT_SECONDS.labels(name)
+        self.seconds = STAGE_SECONDS.labels(name)
+
+    async def put(self, item: _Item):
+        if self.resequencer is not None:
+            await self.resequencer.put(item)
+        else:
+            item.enqueued = time.perf_counter()
+            await self.inbox.put(item)  # blocks while the stage is full
+
+    async def _take(self) -> List[_Item]:
+        items = [await self.inbox.get()]
+        while len(items) < self.batch_size and not self.inbox.empty():
+            items.append(self.inbox.get_nowait())
+        return items
+
+    async def _attempt(self, items: List[_Item]) -> Optional[List[_Item]]:
+        """The items the handler passed, or None once every attempt has raised."""
+        attempt = 1
+        while True:
+            started = time.perf_counter()
+            self.busy += 1
+            try:
+                return await self.handler(items)
+            except Exception as exc:
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                if attempt >= self.pipeline.max_attempts:
+                    return None
+            finally:
+                self.busy -= 1
+                self.seconds.observe(time.perf_counter() - started)
+            self.retries += len(items)
+            await asyncio.sleep(self.pipeline.retry_backoff * 2 ** (attempt - 1))
+            attempt += 1
+
+    async def run(self):
+        while True:
+            items = await self._take()
+            started = time.perf_counter()
+            for item in items:
+                self.queue_wait.observe(started - item.enqueued)
+            passed = await self._attempt(items)
+            if passed is None:
+                self.failed += len(items)
+                if not self.acknowledged:
+                    await self.pipeline.nack(items, self.last_error)
+                await self.pipeline.skip(items)
+                continue
+            self.processed += len(passed)
+
+            if len(passed) < len(items):
+                kept = {id(item) for item in passed}
+                dropped = [item for item in items if id(item) not in kept]
+                self.rejected += len(dropped)
+                if not self.acknowledged:
+                    await self.pipeline.ack(dropped)
+                await self.pipeline.skip(dropped)
+            if self.next is not None:
+                for item in passed:
+                    await self.next.put(item)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "queue_depth": self.inbox.qsize(),
+            "queue_size": self.inbox.maxsize,
+            "busy_workers": self.busy,
+            "processed": self.processed,
+            "rejected": self.rejected,
+            "retries": self.retries,
+            "failed": self.failed,
+            "reorder_waiting": len(self.resequencer) if self.resequencer is not None else None,
+            "last_error": self.last_error,
+            "queue_wait_s": self.queue_wait.snapshot(),
+            "batch_s": self.seconds.snapshot(),
+        }
+
+
+class IngestionPipeline:
+    """
+    Source readers plus the parse -> enrich -> score -> store -> broadcast stages.
+    `workers` sets parse, enrich and score; store and broadcast keep read order
+    with one worker each.
+    """
+
+    def __init__(
+        self, store, queue_size: int, batch_size: int, workers: Dict[str, int],
+        max_attempts: int = 3, retry_backoff: float = 0.5,
+    ):
+        self.store = store
+        self.max_attempts = max(max_attempts, 1)
+        self.retry_backoff = retry_backoff
+        self.stages = [
+            Stage(self, "parse", self._parse, workers["parse"], batch_size, queue_size),
+            Stage(self, "enrich", self._enrich, workers["enrich"], 32, queue_size),
+            Stage(self, "score", self._score, workers["score"], batch_size, queue_size),
+            Stage(self, "store", self._store, 1, batch_size, queue_size, ordered=True),
+            Stage(self, "broadcast", self._broadcast, 1, batch_size, queue_size, acknowledged=True),
+        ]
+        for stage, following in zip(self.stages, self.stages[1:]):
+            stage.next = following
+        self.sources: list = []
+        self.source_counts: Dict[str, int] = {}
+        self.source_errors: Dict[str, Optional[str]] = {}
+        self._next_seq = 0
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self, sources: list):
+        if self._tasks:
+            return
+        self.sources = sources
+        for stage in self.stages:
+            self._tasks.extend(asyncio.create_task(stage.run()) for _ in range(stage.workers))
+        for source in sources:
+            self.source_counts[source.name] = 0
+            self.source_errors[source.name] = None
+            self._tasks.append(asyncio.create_task(self._read(source)))
+
+    async def stop(self):
+        """Stops reading and drops queued items (unacknowledged Redis entries are redelivered later)."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        for stage in self.stages:
+            while not stage.inbox.empty():
+                stage.inbox.get_nowait()
+            if stage.resequencer is not None:
+                stage.resequencer.reset()
+        self._next_seq = 0
+
+    async def _read(self, source):
+        inbox = self.stages[0].inbox
+        while True:
+            try:
+                async for payload, token in source.items():
+                    item = _Item(self._next_seq, payload, source, token)
+                    self._next_seq += 1
+                    await inbox.put(item)  # blocks while parse is full
+                    self.source_counts[source.name] += 1
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.source_errors[source.name] = f"{type(exc).__name__}: {exc}"
+                await asyncio.sleep(SOURCE_RETRY_S)
+
+    async def ack(self, items: List[_Item]):
+        by_source: Dict[object, List[str]] = {}
+        for item in items:
+            if item.token is not None:
+                by_source.setdefault(item.source, []).append(item.token)
+        for source, tokens in by_source.items():
+            await source.ack(tokens)
+
+    async def nack(self, items: List[_Item], error: Optional[str]):
+        by_source: Dict[object, List[Tuple[str, object]]] = {}
+        for item in items:
+            if item.token is not None:
+                by_source.setdefault(item.source, []).append((item.token, item.payload))
+        for source, entries in by_source.items():
+            try:
+                await source.nack(entries, error or "")
+            except Exception as exc:
+                # Left pending: Redis delivers the entries again after a restart
+                self.source_errors[source.name] = f"{type(exc).__name__}: {exc}"
+
+    async def skip(self, items: List[_Item]):
+        """Items that will not reach the store (rejected or failed before it)."""
+        for stage in self.stages:
+            if stage.resequencer is not None:
+                await stage.resequencer.skip([item.seq for item in items])
+
+    # --- stage handlers ---
+
+    async def _parse(self, items: List[_Item]) -> List[_Item]:
+        passed = []
+        for item in items:
+            try:
+                obj = json.loads(item.payload) if isinstance(item.payload, (str, bytes)) else item.payload
+                tx_input = TransactionInput(**obj)
+                meta = BulkTransactionMeta(**obj)
+            except (ValueError, TypeError):
+                continue
+            item.record = new_record(tx_input.user_id, tx_input.features.dict(), meta)
+            item.device_id = tx_input.device_id
+            passed.append(item)
+        return passed
+
+    async def _enrich(self, items: List[_Item]) -> List[_Item]:
+        behaviors = await asyncio.gather(*(
+            feature_store.observe(item.record["user_id"], item.record["features"]["amount"], item.device_id)
+            for item in items
+        ))
+        for item, behavior in zip(items, behaviors):
+            item.record["features"] = enrich_features(item.record["features"], behavior, settings.FEATURE_STORE_VELOCITY)
+            item.record["behavior"] = behavior
+        return items
+
+    async def _score(self, items: List[_Item]) -> List[_Item]:
+        features = [item.record["features"] for item in items]
+        results = await run_scoring(predict_fraud_batch, features, [False] * len(items))
+        for item, (risk_score, is_fraud, explanations) in zip(items, results):
+            item.record.update(risk_score=float(risk_score), is_fraud=is_fraud, explanations=explanations)
+        model_registry.observe(features, results)
+        return items
+
+    async def _store(self, items: List[_Item]) -> List[_Item]:
+        await self.store.add_many([item.record for item in items])
+        await self.ack(items)
+        return items
+
+    async def _broadcast(self, items: List[_Item]) -> List[_Item]:
+        for item in items:
+            await manager.broadcast(item.record)
+        now = time.perf_counter()
+        for item in items:
+            END_TO_END_SECONDS.labels().observe(now - item.received)
+        return items
+
+    def collect_metrics(self):
+        yield "ingest_queue_depth", "gauge", "Items waiting in a stage's input queue.", [
+            ({"stage": stage.name}, stage.inbox.qsize()) for stage in self.stages
+        ]
+        yield "ingest_items_total", "counter", "Items a stage has passed on.", [
+            ({"stage": stage.name}, stage.processed) for stage in self.stages
+        ]
+        yield "ingest_rejected_total", "counter", "Items a stage dropped as invalid.", [
+            ({"stage": stage.name}, stage.rejected) for stage in self.stages
+        ]
+        yield "ingest_retries_total", "counter", "Items in batches a stage retried after an error.", [
+            ({"stage": stage.name}, stage.retries) for stage in self.stages
+        ]
+        yield "ingest_failed_total", "counter", "Items a stage gave up on after INGEST_MAX_ATTEMPTS (nacked).", [
+            ({"stage": stage.name}, stage.failed) for stage in self.stages
+        ]
+        yield "ingest_source_items_total", "counter", "Items read per source.", [
+            ({"source": name}, count) for name, count in self.source_counts.items()
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "running": bool(self._tasks),
+            "sources": {
+                name: {"read": count, "last_error": self.source_errors[name]}
+                for name, count in self.source_counts.items()
+            },
+            "stages": {stage.name: stage.stats() for stage in self.stages},
+            "end_to_end_s": END_TO_END_SECONDS.labels().snapshot(),
+        }
+
+
+def build_sources(names: str) -> list:
+    sources = []
+    for name in filter(None, (n.strip() for n in names.split(","))):
+        if name == "simulator":
+            sources.append(SimulatorSource(settings.INGEST_SIMULATOR_RATE or None))
+        elif name == "redis":
+            sources.append(RedisStreamSource(settings.INGEST_REDIS_STREAM, settings.INGEST_REDIS_GROUP))
+        elif name == "file":
+            sources.append(FileTailSource(settings.INGEST_FILE_PATH, settings.INGEST_FILE_FROM_START))
+        else:
+            raise ValueError(f"INGEST_SOURCES entries must be simulator, redis or file, got {name!r}")
+    return sources
+
+
+ingestion: Optional[IngestionPipeline] = None
+
+
+async def start_ingestion():
+    global ingestion
+    sources = build_sources(settings.INGEST_SOURCES)
+    if not sources:
+        return
+    # Same store as POST /fraud/transactions (imported here: app.fraud.routes imports this module)
+    from app.fraud.routes import transaction_store
+
+    ingestion = IngestionPipeline(
+        transaction_store,
+        queue_size=settings.INGEST_QUEUE_SIZE,
+        batch_size=settings.INGEST_BATCH_SIZE,
+        workers={
+            "parse": settings.INGEST_PARSE_WORKERS,
+            "enrich": settings.INGEST_ENRICH_WORKERS,
+            "score": settings.INGEST_SCORE_WORKERS,
+        },
+        max_attempts=settings.INGEST_MAX_ATTEMPTS,
+        retry_backoff=settings.INGEST_RETRY_BACKOFF_S,
+    )
+    registry.add_collector(ingestion.collect_metrics)
+    ingestion.start(sources)
+
+
+async def stop_ingestion():
+    if ingestion is not None:
+        await ingestion.stop()
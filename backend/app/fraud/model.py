@@ -1,61 +1,290 @@
-import xgboost as xgb
-import shap
-import pandas as pd
 import numpy as np
 import os
 import json
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.config import settings
+from app.metrics import span
 
 MODEL_PATH = "app/models/fraud_model.json"
+SCORING_BACKENDS = ("xgboost", "numpy")
+
+# Column order the model was trained with (see train_model.py)
+FEATURE_NAMES = ["amount", "user_age_days", "device_trust_score", "velocity_1h", "distance_from_home"]
+
+# Per-thread preallocated input row for single-transaction scoring
+_row_buffer = threading.local()
+
+# Bounded LRU of SHAP contributions keyed by model version + the quantized feature vector
+_explanation_cache = OrderedDict()
+_explanation_cache_lock = threading.Lock()
+
+# Serializes the first load (startup warm-up vs early requests)
+_load_lock = threading.Lock()
+
+# A typical transaction scored and explained once at startup (see warm_up)
+WARMUP_TRANSACTION = {"amount": 120.0, "user_age_days": 400, "device_trust_score": 0.8, "velocity_1h": 1, "distance_from_home": 12.0}
+
+
+class ModelVersion:
+    """
+    One loaded fraud_model.json: predictor and explainer of the configured
+    backend, identified by the file's sha256. Immutable once built, so a
+    request that took a reference keeps scoring on it after a swap.
+    """
+
+    def __init__(self, path: str, backend: str):
+        if backend not in SCORING_BACKENDS:
+            raise ValueError(f"SCORING_BACKEND must be one of {SCORING_BACKENDS}, got {backend!r}")
+        with open(path, "rb") as fp:
+            self.sha256 = hashlib.sha256(fp.read()).hexdigest()
+        self.version = self.sha256[:12]
+        self.path = path
+        self.backend = backend
+        self.mtime = os.path.getmtime(path)
+        self.model = self.booster = self.explainer = self.ensemble = None
+        if backend == "numpy":
+            from app.fraud.trees import TreeEnsemble
+            self.ensemble = TreeEnsemble.from_json(path)
+        else:
+            # Heavy imports only for the xgboost backend
+            import xgboost as xgb
+            import shap
+            self.model = xgb.XGBClassifier()
+            self.model.load_model(path)
+            # Raw booster for inplace_predict (no DMatrix / DataFrame per call)
+            self.booster = self.model.get_booster()
+            # TreeExplainer is best for XGBoost
+            self.explainer = shap.TreeExplainer(self.model)
+        self.loaded_at = time.time()
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """P(fraud) per float32 row."""
+        if self.ensemble is not None:
+            return self.ensemble.predict_proba(X)
+        return self.booster.inplace_predict(X)
+
+    def shap_values(self, X: np.ndarray) -> np.ndarray:
+        if self.ensemble is not None:
+            return self.ensemble.shap_values(X)
+        shap_values = self.explainer.shap_values(X)
+        # Might be a list of arrays for multiclass, but binary classification
+        # gives one array if objective=binary:logistic
+        if isinstance(shap_values, list): # depending on shap version
+            shap_values = shap_values[1]
+        return shap_values
+
+    def warm_up(self):
+        """One prediction and one SHAP call, so the first transaction doesn't pay for first-call allocations."""
+        X = encode_features(WARMUP_TRANSACTION)
+        self.predict(X)
+        self.shap_values(X)
+
+    def info(self) -> dict:
+        return {
+            "version": self.version,
+            "sha256": self.sha256,
+            "path": self.path,
+            "backend": self.backend,
+            "mtime": self.mtime,
+            "loaded_at": self.loaded_at,
+        }
+
+
+# The version new requests score on; replaced (never mutated) by activate()
+active: Optional[ModelVersion] = None
+# Aliases of the active version's objects (benchmarks, worker setup)
 model = None
+booster = None
 explainer = None
+ensemble = None
+
+def activate(version: ModelVersion):
+    global active, model, booster, explainer, ensemble
+    model, booster, explainer, ensemble = version.model, version.booster, version.explainer, version.ensemble
+    active = version
+
+def load_version(path: str = MODEL_PATH) -> ModelVersion:
+    """Builds (but does not activate) a version from a model file."""
+    return ModelVersion(path, settings.SCORING_BACKEND)
 
-def load_model():
-    global model, explainer
-    if os.path.exists(MODEL_PATH):
-        model = xgb.XGBClassifier()
-        model.load_model(MODEL_PATH)
-        # TreeExplainer is best for XGBoost
-        explainer = shap.TreeExplainer(model)
-        return True
-    return False
+def load_model(path: str = MODEL_PATH):
+    if not os.path.exists(path):
+        return False
+    activate(load_version(path))
+    return True
 
-def predict_fraud(transaction_data: dict):
+def _ensure_model() -> ModelVersion:
+    version = active
+    if version is None:
+        with _load_lock:
+            if active is None:
+                success = load_model()
+                if not success:
+                    raise RuntimeError("Fraud model not initialized or found.")
+            version = active
+    return version
+
+def warm_up():
     """
-    Expects dict with: amount, user_age_days, device_trust_score, velocity_1h, distance_from_home
-    Returns: (fraud_score(float), is_fraud(bool), shap_explanations(list))
+    Loads the model and explainer and runs one prediction and one SHAP call
+    through them (bypassing the explanation cache), so the first transaction
+    doesn't pay for imports, model parsing or first-call allocations.
     """
-    if model is None:
-        success = load_model()
-        if not success:
-            raise RuntimeError("Fraud model not initialized or found.")
+    _ensure_model().warm_up()
 
-    df = pd.DataFrame([transaction_data])
-    
-    # Predict probability
-    prob = model.predict_proba(df)[0][1]
-    is_fraud = bool(prob > 0.5)
-    
-    # Generate explanation
-    shap_values = explainer.shap_values(df)
-    
-    # Format explanations
-    features = list(transaction_data.keys())
-    # shap_values[0] because we passed 1 row. Might be a list of arrays for multiclass, 
-    # but binary classification gives one array if objective=binary:logistic
-    if isinstance(shap_values, list): # depending on shap version
-        sv = shap_values[1][0] 
-    else:
-        sv = shap_values[0]
-        
+def version_info() -> Optional[dict]:
+    """The active version of this process (None before the first load)."""
+    return active.info() if active is not None else None
+
+def _format_explanations(features, shap_row, feature_row):
     explanations = []
-    for feature_name, shap_val, feature_val in zip(features, sv, df.iloc[0]):
+    for feature_name, shap_val, feature_val in zip(features, shap_row, feature_row):
         explanations.append({
             "feature": feature_name,
             "value": float(feature_val),
             "contribution": float(shap_val)
         })
-        
+
     # Sort by absolute contribution to see the most impactful features
     explanations.sort(key=lambda x: abs(x["contribution"]), reverse=True)
-        
-    return float(prob), is_fraud, explanations
+    return explanations
+
+def encode_features(transaction_data: dict, out: np.ndarray = None) -> np.ndarray:
+    """
+    Writes the features into a contiguous float32 (1, n_features) row in FEATURE_NAMES order.
+    Reuses this thread's preallocated row unless `out` is given.
+    """
+    if out is None:
+        out = getattr(_row_buffer, "row", None)
+        if out is None:
+            out = _row_buffer.row = np.empty((1, len(FEATURE_NAMES)), dtype=np.float32)
+    row = out[0]
+    for i, name in enumerate(FEATURE_NAMES):
+        row[i] = transaction_data[name]
+    return out
+
+def _cache_key(version: ModelVersion, values) -> tuple:
+    # Quantize so near-identical What-If inputs share one entry
+    decimals = settings.EXPLAIN_CACHE_DECIMALS
+    return (version.version, *(round(float(v), decimals) for v in values))
+
+def _explain_rows(version: ModelVersion, X: np.ndarray, values: list) -> list:
+    """
+    SHAP explanations for the rows of X (values holds the raw feature values per row).
+    Contributions come from the LRU cache where possible; misses are computed in one SHAP call.
+    """
+    keys = [_cache_key(version, v) for v in values]
+    contributions = [None] * len(keys)
+    with _explanation_cache_lock:
+        for i, key in enumerate(keys):
+            cached = _explanation_cache.get(key)
+            if cached is not None:
+                _explanation_cache.move_to_end(key)
+                contributions[i] = cached
+
+    misses = [i for i, c in enumerate(contributions) if c is None]
+    if misses:
+        with span("predict.shap"):
+            shap_values = version.shap_values(X[misses])
+        with _explanation_cache_lock:
+            for sv, i in zip(shap_values, misses):
+                # copy so a cached row doesn't pin the whole batch's SHAP matrix
+                contributions[i] = _explanation_cache[keys[i]] = sv.copy()
+            while len(_explanation_cache) > settings.EXPLAIN_CACHE_SIZE:
+                _explanation_cache.popitem(last=False)
+
+    with span("predict.format"):
+        return [_format_explanations(FEATURE_NAMES, c, v) for c, v in zip(contributions, values)]
+
+def predict_fraud(transaction_data: dict, explain: bool = True):
+    """
+    Expects dict with: amount, user_age_days, device_trust_score, velocity_1h, distance_from_home
+    Returns: (fraud_score(float), is_fraud(bool), shap_explanations(list))
+    With explain=False, explanations are only computed when the transaction is flagged
+    (otherwise shap_explanations is None).
+    """
+    version = _ensure_model()
+
+    # Fast path: one float32 row straight into the booster, no pandas
+    with span("predict.encode"):
+        X = encode_features(transaction_data)
+
+    # Predict probability
+    with span("predict.model"):
+        prob = float(version.predict(X)[0])
+    is_fraud = prob > 0.5
+
+    # Generate explanation
+    explanations = None
+    if explain or is_fraud:
+        values = [transaction_data[name] for name in FEATURE_NAMES]
+        explanations = _explain_rows(version, X, [values])[0]
+
+    return prob, is_fraud, explanations
+
+def predict_fraud_batch(batch: list, explain: list = None):
+    """
+    Scores many feature dicts in one model call.
+    Each dict has the same keys as for predict_fraud; explain optionally holds one
+    bool per dict requesting explanations (flagged transactions are always explained).
+    Returns a list of (fraud_score, is_fraud, shap_explanations) tuples, in input order.
+    """
+    version = _ensure_model()
+    if not batch:
+        return []
+    if explain is None:
+        explain = [False] * len(batch)
+    if len(batch) == 1:
+        return [predict_fraud(batch[0], explain=explain[0])]
+
+    # One dense float32 matrix for the whole batch, columns in training order
+    with span("predict.encode"):
+        X = np.empty((len(batch), len(FEATURE_NAMES)), dtype=np.float32)
+        for i, row in enumerate(batch):
+            encode_features(row, out=X[i:i + 1])
+
+    def values(i):
+        return [batch[i][name] for name in FEATURE_NAMES]
+
+    return _score_matrix(version, X, explain, values)
+
+def predict_fraud_matrix(X: np.ndarray, explain: list = None):
+    """
+    Scores an (n, n_features) matrix whose columns are in FEATURE_NAMES order.
+    Used by bulk scoring, where inputs already arrive column-wise.
+    Returns the same tuples as predict_fraud_batch.
+    """
+    version = _ensure_model()
+    if explain is None:
+        explain = [False] * len(X)
+    X32 = np.ascontiguousarray(X, dtype=np.float32)
+    return _score_matrix(version, X32, explain, lambda i: X[i].tolist())
+
+def _score_matrix(version: ModelVersion, X: np.ndarray, explain: list, values):
+    if len(X) == 0:
+        return []
+
+    with span("predict.model"):
+        probs = version.predict(X)
+    flagged = probs > 0.5
+
+    # SHAP only for the rows that need it
+    wanted = [i for i in range(len(X)) if explain[i] or flagged[i]]
+    explanations = [None] * len(X)
+    if wanted:
+        for i, exp in zip(wanted, _explain_rows(version, X[wanted], [values(i) for i in wanted])):
+            explanations[i] = exp
+
+    return [(float(p), bool(f), e) for p, f, e in zip(probs, flagged, explanations)]
+
+def explain_fraud(transaction_data: dict):
+    """On-demand SHAP explanations for one feature dict (served from the LRU cache when possible)."""
+    version = _ensure_model()
+    X = encode_features(transaction_data)
+    values = [transaction_data[name] for name in FEATURE_NAMES]
+    return _explain_rows(version, X, [values])[0]
@@ -0,0 +1,257 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.fraud import executor, model
+from app.metrics import Histogram, LATENCY_MS_BUCKETS
+
+# |candidate - primary| fraud score
+DELTA_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _file_stamp(path: str):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class ModelRegistry:
+    """
+    Rolls out new fraud_model.json versions without a restart.
+
+    reload() builds and warms the new version off the event loop, then swaps
+    it in atomically: model.activate() for inline / thread scoring, or a new
+    warmed process pool for SCORING_EXECUTOR=process. Requests that already
+    hold the old version (or were submitted to the old pool) finish on it.
+
+    A shadow candidate scores a copy of every engine batch on its own thread,
+    after the primary results have been delivered, and the score deltas
+    (candidate - primary) are aggregated. At most `max_pending_shadow` batches
+    are queued for it; further batches are skipped rather than left waiting,
+    so the primary path never waits for the shadow.
+    """
+
+    def __init__(self, max_pending_shadow: int):
+        self.max_pending_shadow = max_pending_shadow
+        self._lock = asyncio.Lock()  # one load / swap at a time
+        self._watch_task: Optional[asyncio.Task] = None
+        self._shadow_executor: Optional[ThreadPoolExecutor] = None
+
+        self.reloads = 0
+        self.last_reload_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+        self.shadow: Optional[model.ModelVersion] = None
+        self._shadow_pending = 0
+        self._reset_shadow_stats()
+
+    def _reset_shadow_stats(self):
+        self.shadow_batches = 0
+        self.shadow_rows = 0
+        self.shadow_skipped = 0
+        self.shadow_errors = 0
+        self._delta_sum = 0.0
+        self._abs_delta_sum = 0.0
+        self._max_abs_delta = 0.0
+        self.flagged_by_candidate_only = 0
+        self.flagged_by_primary_only = 0
+        self.abs_delta = Histogram(DELTA_BUCKETS)
+        self.shadow_latency_ms = Histogram(LATENCY_MS_BUCKETS)
+
+    def _resolve(self, path: Optional[str]) -> str:
+        """Model files are only loaded from the directory of MODEL_PATH."""
+        path = path or model.MODEL_PATH
+        models_dir = os.path.realpath(os.path.dirname(model.MODEL_PATH))
+        if os.path.dirname(os.path.realpath(path)) != models_dir:
+            raise ValueError(f"model files must live in {os.path.dirname(model.MODEL_PATH)}/")
+        if not os.path.isfile(path):
+            raise ValueError(f"model file not found: {path}")
+        return path
+
+    @staticmethod
+    def _build(path: str) -> model.ModelVersion:
+        version = model.load_version(path)
+        version.warm_up()
+        return version
+
+    async def primary_info(self) -> Optional[dict]:
+        """The version scoring runs on (asked of a worker in process mode)."""
+        return await executor.run_scoring(model.version_info)
+
+    async def reload(self, path: Optional[str] = None) -> dict:
+        path = self._resolve(path)
+        async with self._lock:
+            try:
+                if settings.SCORING_EXECUTOR == "process":
+                    await executor.replace_process_pool(path)
+                else:
+                    model.activate(await asyncio.to_thread(self._build, path))
+            except Exception as exc:
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                raise
+            self.reloads += 1
+            self.last_reload_at = time.time()
+            self.last_error = None
+        return await self.primary_info()
+
+    # --- shadow scoring ---
+
+    async def set_shadow(self, path: Optional[str] = None) -> dict:
+        path = self._resolve(path)
+        async with self._lock:
+            version = await asyncio.to_thread(self._build, path)
+            self.shadow = version
+            self._reset_shadow_stats()
+        return version.info()
+
+    def clear_shadow(self):
+        self.shadow = None
+
+    async def promote(self) -> dict:
+        """Makes the shadow candidate the primary model (and stops shadowing)."""
+        candidate = self.shadow
+        if candidate is None:
+            raise ValueError("no shadow model is loaded")
+        async with self._lock:
+            try:
+                if settings.SCORING_EXECUTOR == "process":
+                    # Workers reload the file: pin them to the bytes that were shadow-validated
+                    await executor.replace_process_pool(candidate.path, candidate.sha256)
+                else:
+                    model.activate(candidate)
+            except Exception as exc:
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                raise
+            self.last_error = None
+            self.shadow = None
+            self.reloads += 1
+            self.last_reload_at = time.time()
+        return await self.primary_info()
+
+    def observe(self, features: List[dict], results: List[tuple]):
+        """Called by the scoring engine with a delivered batch: queues it for the shadow candidate."""
+        candidate = self.shadow
+        if candidate is None:
+            return
+        if self._shadow_pending >= self.max_pending_shadow:
+            self.shadow_skipped += 1
+            return
+        if self._shadow_executor is None:
+            self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        primary = np.fromiter((r[0] for r in results), dtype=np.float64, count=len(results))
+        self._shadow_pending += 1
+        future = asyncio.get_running_loop().run_in_executor(
+            self._shadow_executor, _score_shadow, candidate, features
+        )
+        future.add_done_callback(lambda f: self._shadow_done(f, candidate, primary))
+
+    def _shadow_done(self, future: asyncio.Future, candidate: model.ModelVersion, primary: np.ndarray):
+        self._shadow_pending -= 1
+        if candidate is not self.shadow or future.cancelled():
+            return
+        if future.exception() is not None:
+            self.shadow_errors += 1
+            return
+        scores, elapsed_ms = future.result()
+        delta = scores - primary
+        abs_delta = np.abs(delta)
+        self.shadow_batches += 1
+        self.shadow_rows += len(delta)
+        self.shadow_latency_ms.observe(elapsed_ms)
+        self._delta_sum += float(delta.sum())
+        self._abs_delta_sum += float(abs_delta.sum())
+        self._max_abs_delta = max(self._max_abs_delta, float(abs_delta.max(initial=0.0)))
+        self.flagged_by_candidate_only += int(((scores > 0.5) & (primary <= 0.5)).sum())
+        self.flagged_by_primary_only += int(((primary > 0.5) & (scores <= 0.5)).sum())
+        for value in abs_delta:
+            self.abs_delta.observe(float(value))
+
+    def shadow_stats(self) -> Optional[dict]:
+        if self.shadow is None:
+            return None
+        rows = self.shadow_rows or 1
+        return {
+            **self.shadow.info(),
+            "batches": self.shadow_batches,
+            "rows": self.shadow_rows,
+            "skipped_batches": self.shadow_skipped,
+            "errors": self.shadow_errors,
+            "mean_delta": self._delta_sum / rows,
+            "mean_abs_delta": self._abs_delta_sum / rows,
+            "max_abs_delta": self._max_abs_delta,
+            "flagged_by_candidate_only": self.flagged_by_candidate_only,
+            "flagged_by_primary_only": self.flagged_by_primary_only,
+            "abs_delta": self.abs_delta.snapshot(),
+            "latency_ms": self.shadow_latency_ms.snapshot(),
+        }
+
+    # --- file watch ---
+
+    async def _watch(self, path: str, interval: float):
+        seen, pending = _file_stamp(path), None
+        while True:
+            await asyncio.sleep(interval)
+            stamp = _file_stamp(path)
+            if stamp is None or stamp == seen:
+                pending = None
+                continue
+            if stamp != pending:
+                # Reload once the file has stopped changing for one interval
+                pending = stamp
+                continue
+            try:
+                await self.reload(path)
+            except Exception:
+                pass  # recorded in last_error; the current version keeps serving
+            seen, pending = stamp, None
+
+    def start_watch(self, path: str, interval: float):
+        if self._watch_task is None and interval > 0:
+            self._watch_task = asyncio.create_task(self._watch(path, interval))
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+        if self._shadow_executor is not None:
+            self._shadow_executor.shutdown(wait=True, cancel_futures=True)
+            self._shadow_executor = None
+
+    async def stats(self) -> dict:
+        return {
+            "primary": await self.primary_info(),
+            "reloads": self.reloads,
+            "last_reload_at": self.last_reload_at,
+            "last_error": self.last_error,
+            "watch_interval_s": settings.MODEL_WATCH_INTERVAL_S if self._watch_task is not None else 0,
+            "shadow": self.shadow_stats(),
+        }
+
+
+def _score_shadow(candidate: model.ModelVersion, features: List[dict]):
+    """Runs on the shadow thread: (candidate scores, milliseconds)."""
+    started = time.perf_counter()
+    X = np.empty((len(features), len(model.FEATURE_NAMES)), dtype=np.float32)
+    for i, row in enumerate(features):
+        model.encode_features(row, out=X[i:i + 1])
+    scores = np.asarray(candidate.predict(X), dtype=np.float64)
+    return scores, (time.perf_counter() - started) * 1000.0
+
+
+model_registry = ModelRegistry(max_pending_shadow=settings.SHADOW_MAX_PENDING)
+
+
+async def start_model_registry():
+    model_registry.start_watch(model.MODEL_PATH, settings.MODEL_WATCH_INTERVAL_S)
+
+
+async def stop_model_registry():
+    await model_registry.stop()
@@ -1,42 +1,53 @@
 import asyncio
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from typing import List
-from pydantic import BaseModel
+import json
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from datetime import datetime
 import uuid
 
 from app.websocket.manager import manager
-from app.fraud.model import predict_fraud
-from app.auth.jwt_handler import get_current_user
+from app.config import settings
+from app.fraud.bulk import ARROW_TYPES, NDJSON_TYPES, PayloadTooLarge, score_bulk, spool_request
+from app.fraud.engine import scoring_engine
+from app.fraud.feature_store import enrich_features, feature_store
+from app.fraud import ingest
+from app.fraud.registry import model_registry
+from app.fraud.schemas import ModelLoadRequest, StreamSubscription, TransactionFeatures, TransactionInput
+from app.archive import transaction_archive
+from app.logs.feed import make_cursor, merge_newest, not_before, parse_cursor, parse_time, range_cursor
+from app.store import create_store
+from app.auth.jwt_handler import get_current_admin, get_current_user, token_cache
 
 router = APIRouter()
 
-active_transactions = [] # Cache in memory for REST GET
-
-class TransactionFeatures(BaseModel):
-    amount: float
-    user_age_days: int
-    device_trust_score: float
-    velocity_1h: int
-    distance_from_home: float
-
-class TransactionInput(BaseModel):
-    user_id: str
-    features: TransactionFeatures
+# Recent transactions for REST GET, newest first (shared with app.logs.routes)
+transaction_store = create_store("transactions", settings.TRANSACTION_STORE_CAPACITY, on_evict=transaction_archive.append)
 
 @router.post("/transactions")
-async def submit_transaction(tx_input: TransactionInput, current_user: dict = Depends(get_current_user)):
-    global active_transactions
-    
+async def submit_transaction(
+    tx_input: TransactionInput,
+    explain: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Scores and stores a transaction. SHAP explanations are computed eagerly only when
+    the transaction is flagged or explain=true; otherwise use GET /transactions/{id}/explanations.
+    The user's recent activity from the online feature store is attached as "behavior";
+    FEATURE_STORE_VELOCITY=server / max also feeds its 1h count to the model as velocity_1h.
+    """
+    features = tx_input.features.dict()
+    behavior = await feature_store.observe(tx_input.user_id, features["amount"], tx_input.device_id)
     raw_tx = {
         "id": f"TXN-{uuid.uuid4().hex[:8]}",
         "timestamp": datetime.utcnow().isoformat() + "Z",
         "user_id": tx_input.user_id,
-        "features": tx_input.features.dict()
+        "features": enrich_features(features, behavior, settings.FEATURE_STORE_VELOCITY),
+        "behavior": behavior
     }
     
-    # Score transaction using XGBoost
-    risk_score, is_fraud, explanations = predict_fraud(raw_tx["features"])
+    # Score transaction using XGBoost (micro-batched with concurrent requests)
+    risk_score, is_fraud, explanations = await scoring_engine.score(raw_tx["features"], explain=explain)
     
     # Enrich transaction with results
     tx_result = {
@@ -46,43 +57,145 @@ async def submit_transaction(tx_input: TransactionInput, current_user: dict = De
         "explanations": explanations
     }
     
-    # Prepend to array
-    active_transactions.insert(0, tx_result)
-    
-    # Limit size to 100 for memory demo
-    if len(active_transactions) > 100:
-        active_transactions = active_transactions[:100]
+    # Store as newest (the oldest one is evicted once the buffer is full)
+    await transaction_store.add(tx_result)
         
     # Broadcast to UI
     await manager.broadcast(tx_result)
     
     return {"message": "Transaction processed", "transaction": tx_result}
 
+@router.post("/transactions/bulk")
+async def submit_transactions_bulk(
+    request: Request,
+    explain: bool = False,
+    store: bool = False,
+    broadcast: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Bulk scoring for back-fills. Accepts NDJSON (one TransactionInput per line) or an
+    Arrow IPC stream (user_id + one column per feature; needs pyarrow) and streams the
+    scored transactions back as NDJSON, scoring in vectorized chunks of BULK_CHUNK_SIZE.
+    Transaction ids are assigned by the server; an input "id" / "timestamp" comes back
+    as "external_id" / "occurred_at" (UTC), and rows with invalid values as error lines.
+    store=true also appends the results to the recent transactions; broadcast=true sends
+    a single summary event to dashboard clients when done. Bodies larger than
+    BULK_MAX_BYTES are refused with 413.
+    """
+    content_type = request.headers.get("content-type", "application/x-ndjson").split(";")[0].strip()
+    if content_type in ARROW_TYPES:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=415, detail="Arrow IPC input requires pyarrow to be installed")
+        content_kind = "arrow"
+    elif content_type in NDJSON_TYPES:
+        content_kind = "ndjson"
+    else:
+        raise HTTPException(status_code=415, detail=f"Unsupported content type: {content_type}")
+
+    try:
+        spool = await spool_request(request, settings.BULK_SPOOL_MAX_MEMORY, settings.BULK_MAX_BYTES)
+    except PayloadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    async def store_chunk(records):
+        await transaction_store.add_many(records)
+
+    async def body():
+        summary = None
+        async for lines in score_bulk(
+            spool, content_kind, settings.BULK_CHUNK_SIZE,
+            explain=explain, on_chunk=store_chunk if store else None
+        ):
+            summary = lines
+            yield lines
+        if broadcast and summary:
+            await manager.broadcast({"action": "bulk_summary", **json.loads(summary)})
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
 @router.delete("/transactions/{tx_id}")
 async def delete_transaction(tx_id: str, current_user: dict = Depends(get_current_user)):
-    global active_transactions
-    active_transactions = [tx for tx in active_transactions if tx["id"] != tx_id]
+    await transaction_store.delete(tx_id)
     
     # Broadcast delete event to UI
     await manager.broadcast({"action": "delete", "id": tx_id})
     
     return {"message": f"Transaction {tx_id} cleared"}
 
+@router.get("/transactions/{tx_id}/explanations")
+async def get_transaction_explanations(tx_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Computes (or returns the stored) SHAP explanations for a stored transaction.
+    """
+    tx = await transaction_store.get(tx_id)
+    if tx is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+
+    if tx.get("explanations") is None:
+        tx["explanations"] = await scoring_engine.explain(tx["features"])
+        await transaction_store.update(tx)
+
+    return {"id": tx_id, "explanations": tx["explanations"]}
+
+def transaction_history(since: Optional[float] = None, until: Optional[float] = None, before=None):
+    """Recent and archived transactions in [since, until] older than `before`, newest first."""
+    return merge_newest([
+        not_before(transaction_store.iter_newest(before=range_cursor(before, until)), since),
+        transaction_archive.aiter_newest(since, until, before),
+    ])
+
 @router.get("/transactions")
 async def get_recent_transactions(
     skip: int = 0, 
     limit: int = 50,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    before: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """
     Returns the latest transactions with pagination (requires Auth).
+
+    With since / until (ISO timestamps or epoch seconds, inclusive, matched
+    against the server-side "timestamp", not a caller's "occurred_at") or a `before`
+    cursor, pages by time over the recent transactions and the archive of
+    evicted ones; pass next_cursor as `before` for the next page. Archived
+    transactions carry "archived": true and no explanations.
     """
-    paginated_transactions = active_transactions[skip : skip + limit]
+    if since is None and until is None and before is None:
+        paginated_transactions = await transaction_store.page(skip, limit)
+        return {
+            "transactions": paginated_transactions,
+            "total": await transaction_store.count(),
+            "archived": transaction_archive.count(),
+            "skip": skip,
+            "limit": limit
+        }
+
+    try:
+        cursor = parse_cursor(before)
+        start, end = parse_time(since), parse_time(until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    transactions = []
+    position = 0
+    async for tx in transaction_history(start, end, cursor):
+        if position >= skip:
+            transactions.append(tx)
+            if len(transactions) >= limit:
+                break
+        position += 1
     return {
-        "transactions": paginated_transactions,
-        "total": len(active_transactions),
+        "transactions": transactions,
+        "since": since,
+        "until": until,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": make_cursor(transactions[-1]) if len(transactions) == limit and limit > 0 else None
     }
 
 @router.post("/simulate")
@@ -92,7 +205,7 @@ async def simulate_transaction(features: TransactionFeatures, current_user: dict
     Used for the interactive What-If Simulator.
     """
     # Score transaction using XGBoost
-    risk_score, is_fraud, explanations = predict_fraud(features.dict())
+    risk_score, is_fraud, explanations = await scoring_engine.score(features.dict(), explain=True)
     
     return {
         "risk_score": float(risk_score),
@@ -100,16 +213,118 @@ async def simulate_transaction(features: TransactionFeatures, current_user: dict
         "explanations": explanations
     }
 
+@router.get("/engine/stats")
+async def get_engine_stats(current_user: dict = Depends(get_current_user)):
+    """
+    Batch-size, queue-wait and batch-latency histograms of the scoring engine.
+    Used to tune SCORING_MAX_BATCH_SIZE / SCORING_MAX_WAIT_MS against p99 latency.
+    """
+    return scoring_engine.stats()
+
+@router.get("/stream/stats")
+async def get_stream_stats(current_user: dict = Depends(get_current_user)):
+    """
+    WebSocket broadcaster metrics: connections, per-client queue depth and drops.
+    """
+    return manager.stats()
+
+@router.get("/features/stats")
+async def get_feature_store_stats(current_user: dict = Depends(get_current_user)):
+    """
+    Online feature store: tracked users and evictions.
+    """
+    return await feature_store.stats()
+
+@router.get("/model")
+async def get_model_status(current_user: dict = Depends(get_current_user)):
+    """
+    Active model version, reload history and the shadow model's score deltas.
+    """
+    return await model_registry.stats()
+
+@router.post("/model/reload")
+async def reload_model(request: ModelLoadRequest, current_user: dict = Depends(get_current_admin)):
+    """
+    Loads, warms up and swaps in a model file (fraud_model.json by default).
+    In-flight requests finish on the previous version.
+    """
+    try:
+        return {"primary": await model_registry.reload(request.path)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Could not load model: {e}")
+
+@router.put("/model/shadow")
+async def set_shadow_model(request: ModelLoadRequest, current_user: dict = Depends(get_current_admin)):
+    """
+    Loads a candidate model that scores every batch alongside the primary one (results unused).
+    """
+    try:
+        return {"shadow": await model_registry.set_shadow(request.path)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Could not load model: {e}")
+
+@router.delete("/model/shadow")
+async def clear_shadow_model(current_user: dict = Depends(get_current_admin)):
+    model_registry.clear_shadow()
+    return {"message": "Shadow model removed"}
+
+@router.post("/model/promote")
+async def promote_shadow_model(current_user: dict = Depends(get_current_admin)):
+    """
+    Makes the shadow model the primary one. In process mode the workers must
+    load the exact file that was shadowed (same sha256), otherwise the current
+    primary keeps serving.
+    """
+    try:
+        return {"primary": await model_registry.promote()}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=409, detail=f"Could not promote model: {e}")
+
+@router.get("/ingest/stats")
+async def get_ingest_stats(current_user: dict = Depends(get_current_user)):
+    """
+    Background ingestion (INGEST_SOURCES): items read per source and, per stage,
+    queue depth, queue wait, batch time and processed / rejected / failed counts.
+    """
+    if ingest.ingestion is None:
+        return {"running": False, "sources": {}, "stages": {}}
+    return ingest.ingestion.stats()
+
 @router.websocket("/stream")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, token: Optional[str] = None):
     """
-    WebSocket endpoint. No auth required for the demo, 
-    but in prod we would check token in query string or subprotocols.
+    WebSocket endpoint. Browsers can't set headers on a WebSocket, so the access
+    token comes as ?token=...; it is checked once, at connect, against the same
+    token cache as the REST routes. Connections without a valid token are closed
+    with 1008 (policy violation) before being accepted.
+
+    By default every event is pushed as its own frame. A client can instead send
+    {"action": "subscribe", "flagged_only": true, "min_risk": 0.7, "user_ids": [...],
+     "summary_only": true, "batch_ms": 100}
+    to receive only matching events, coalesced into {"action": "batch", "events": [...]} frames.
     """
+    if token is None or await token_cache.verify(token) is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
     await manager.connect(websocket)
     try:
         while True:
-            # We don't expect messages from client, just keep connection alive
-            await websocket.receive_text()
+            text = await websocket.receive_text()
+            try:
+                message = json.loads(text)
+                if not isinstance(message, dict) or message.get("action") != "subscribe":
+                    continue
+                subscription = StreamSubscription(**{k: v for k, v in message.items() if k != "action"})
+            except (ValueError, TypeError) as e:
+                await manager.send_personal(websocket, {"action": "error", "detail": str(e)})
+                continue
+            manager.subscribe(websocket, subscription)
+            await manager.send_personal(websocket, {"action": "subscribed", **json.loads(subscription.json())})
     except WebSocketDisconnect:
         manager.disconnect(websocket)
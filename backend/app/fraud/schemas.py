@@ -0,0 +1,52 @@
+from datetime import datetime
+from typing import Optional, Set
+from pydantic import BaseModel, Field
+
+from app.config import settings
+
+class TransactionFeatures(BaseModel):
+    amount: float
+    user_age_days: int
+    device_trust_score: float
+    velocity_1h: int
+    distance_from_home: float
+
+class TransactionInput(BaseModel):
+    user_id: str
+    features: TransactionFeatures
+    device_id: Optional[str] = None  # feeds the distinct-device counts
+
+class BulkTransactionMeta(BaseModel):
+    """
+    Optional caller fields of a bulk / ingested transaction. The server always
+    assigns the transaction id: "id" is kept as external_id and "timestamp"
+    (ISO 8601, epoch seconds or a datetime; naive = UTC) as occurred_at.
+    """
+    id: Optional[str] = Field(default=None, min_length=1, max_length=128)
+    timestamp: Optional[datetime] = None
+
+class ModelLoadRequest(BaseModel):
+    path: Optional[str] = None  # a file next to fraud_model.json; defaults to fraud_model.json
+
+class StreamSubscription(BaseModel):
+    """
+    Filter a /fraud/stream client sends as {"action": "subscribe", ...}.
+    Filters apply to transaction events; control events (delete, bulk summary)
+    always go through.
+    """
+    flagged_only: bool = False
+    min_risk: Optional[float] = None
+    user_ids: Optional[Set[str]] = None
+    summary_only: bool = False  # drop the explanations list
+    batch_ms: int = Field(default_factory=lambda: settings.WS_BATCH_MS, ge=0, le=5000)
+
+    def matches(self, message: dict) -> bool:
+        if "risk_score" not in message:
+            return True
+        if self.flagged_only and not message.get("is_fraud"):
+            return False
+        if self.min_risk is not None and message["risk_score"] < self.min_risk:
+            return False
+        if self.user_ids is not None and message.get("user_id") not in self.user_ids:
+            return False
+        return True
@@ -1,46 +1,102 @@
 import asyncio
-import random
+import time
 import uuid
 import datetime
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Dict, List, Optional
 
-async def generate_transactions() -> AsyncGenerator[dict, None]:
+import numpy as np
+
+FEATURE_COLUMNS = ("amount", "user_age_days", "device_trust_score", "velocity_1h", "distance_from_home")
+
+
+class TransactionGenerator:
+    """
+    Vectorized synthetic transactions.
+
+    batch(n) draws n rows at once as column arrays: a `suspicious_fraction` of
+    fraud-like rows (large amounts, new accounts, untrusted devices, high
+    velocity, far from home) mixed with normal ones. User ids follow a Zipf law
+    with exponent `zipf_s` over `users` ids (0 = uniform), so a few users are
+    hot, as in real traffic; each user has `devices_per_user` devices.
+    """
+
+    def __init__(self, users: int = 9000, zipf_s: float = 0.0, suspicious_fraction: float = 0.2,
+                 devices_per_user: int = 3, first_user_id: int = 1000, seed: Optional[int] = None):
+        self.users = users
+        self.suspicious_fraction = suspicious_fraction
+        self.devices_per_user = devices_per_user
+        self.first_user_id = first_user_id
+        self.rng = np.random.default_rng(seed)
+        weights = np.arange(1, users + 1, dtype=np.float64) ** -zipf_s
+        self._user_cdf = np.cumsum(weights / weights.sum())
+
+    def batch(self, n: int) -> Dict[str, np.ndarray]:
+        rng = self.rng
+        suspicious = rng.random(n) < self.suspicious_fraction
+
+        def pick(fraud, normal):
+            return np.where(suspicious, fraud, normal)
+
+        return {
+            "user_id": np.minimum(np.searchsorted(self._user_cdf, rng.random(n)), self.users - 1) + self.first_user_id,
+            "device": rng.integers(0, self.devices_per_user, n),
+            "suspicious": suspicious,
+            "amount": np.round(pick(rng.uniform(500, 5000, n), rng.uniform(5, 300, n)), 2),
+            "user_age_days": pick(rng.integers(1, 101, n), rng.integers(100, 3651, n)),
+            "device_trust_score": np.round(pick(rng.uniform(0.01, 0.4, n), rng.uniform(0.6, 1.0, n)), 4),
+            "velocity_1h": pick(rng.integers(4, 16, n), rng.integers(0, 4, n)),
+            "distance_from_home": np.round(pick(rng.uniform(100, 2000, n), rng.uniform(0, 50, n)), 2),
+        }
+
+    def transactions(self, n: int) -> List[dict]:
+        """n request bodies for POST /fraud/transactions (TransactionInput)."""
+        columns = self.batch(n)
+        users = columns["user_id"].tolist()
+        devices = columns["device"].tolist()
+        features = zip(*(columns[name].tolist() for name in FEATURE_COLUMNS))
+        return [
+            {
+                "user_id": f"user_{user}",
+                "device_id": f"dev_{user}_{device}",
+                "features": dict(zip(FEATURE_COLUMNS, row)),
+            }
+            for user, device, row in zip(users, devices, features)
+        ]
+
+
+async def generate_transactions(rate: Optional[float] = None, generator: Optional[TransactionGenerator] = None,
+                                batch_size: int = 256) -> AsyncGenerator[dict, None]:
     """
     Simulates a never-ending stream of financial transactions.
-    Yields a transaction every 1 to 4 seconds.
+    Without a rate, yields a transaction every 1 to 4 seconds (demo pace);
+    with one, yields `rate` transactions per second on average, drawn
+    `batch_size` at a time.
     """
+    generator = generator or TransactionGenerator()
     txn_id_counter = 1000
-    
+    pending: List[dict] = []
+    started = time.monotonic()
+    emitted = 0
+
     while True:
-        await asyncio.sleep(random.uniform(1.0, 4.0))
-        
-        # Decide if we want to force a fraud-like transaction (20% chance)
-        is_suspicious = random.random() < 0.2
-        
-        if is_suspicious:
-            amount = random.uniform(500, 5000)
-            user_age_days = random.randint(1, 100)
-            device_trust = random.uniform(0.01, 0.4)
-            velocity_1h = random.randint(4, 15)
-            distance = random.uniform(100, 2000)
+        if rate is None:
+            await asyncio.sleep(float(generator.rng.uniform(1.0, 4.0)))
         else:
-            amount = random.uniform(5, 300)
-            user_age_days = random.randint(100, 3650)
-            device_trust = random.uniform(0.6, 1.0)
-            velocity_1h = random.randint(0, 3)
-            distance = random.uniform(0, 50)
-            
+            # Sleep only when ahead of schedule, so the average rate holds
+            ahead = started + emitted / rate - time.monotonic()
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+        if not pending:
+            pending = generator.transactions(batch_size if rate is not None else 1)
+            pending.reverse()
+
         txn_id_counter += 1
-        
+        emitted += 1
+        tx = pending.pop()
         yield {
             "id": f"TXN-{txn_id_counter}-{uuid.uuid4().hex[:6]}",
             "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
-            "user_id": f"user_{random.randint(1000, 9999)}",
-            "features": {
-                "amount": round(amount, 2),
-                "user_age_days": user_age_days,
-                "device_trust_score": round(device_trust, 4),
-                "velocity_1h": velocity_1h,
-                "distance_from_home": round(distance, 2)
-            }
+            "user_id": tx["user_id"],
+            "device_id": tx["device_id"],
+            "features": tx["features"],
         }
@@ -0,0 +1,189 @@
+"""
+Pure NumPy evaluator for the XGBoost model dump (fraud_model.json).
+
+Lets serving processes score and explain without importing xgboost or shap.
+"""
+import json
+from math import factorial
+
+import numpy as np
+
+# Rows per chunk when computing SHAP (bounds the (rows, leaves, features) gather)
+_SHAP_CHUNK = 1024
+
+
+class TreeEnsemble:
+    """
+    The gbtree model as flat arrays.
+
+    Every distinct split (feature, threshold, default direction) is evaluated
+    once per row: go left when x < split (both float32), or take the default
+    direction for missing values, as XGBoost does. Trees are padded to complete
+    binary trees of the ensemble's depth (a shallow leaf is repeated under a
+    split that always goes left), so traversal is `depth` steps of
+    node = 2 * node + 1 + went_right for all rows and trees at once. The margin
+    is the sum of the leaf values plus logit(base_score).
+
+    shap_values() gives exact path-dependent TreeSHAP (what shap's TreeExplainer
+    reports): the Shapley values of v(S) = E[f(x) | x_S], where features outside
+    S follow both children weighted by cover. For a leaf, whether a row can
+    reach it under S only depends on which features' splits on its path the row
+    disagrees with, so each leaf's contribution is tabulated for all 2^M such
+    masks and a row's SHAP values are a gather and a sum over leaves.
+    """
+
+    def __init__(self, trees: list, base_margin: float, num_features: int):
+        self.num_features = num_features
+        self.base_margin = base_margin
+        self.num_trees = len(trees)
+
+        # Distinct splits; index 0 always goes left (padding / shallow leaves)
+        splits = {(0, np.float32(np.inf), True): 0}
+
+        def split_of(tree, node):
+            key = (tree["split_indices"][node], np.float32(tree["split_conditions"][node]), bool(tree["default_left"][node]))
+            return splits.setdefault(key, len(splits))
+
+        leaves = []  # (tree, value, [(split, went_left, feature, cover ratio)])
+        depth = 0
+        for t, tree in enumerate(trees):
+            lc, rc, cover = tree["left_children"], tree["right_children"], tree["sum_hessian"]
+            stack = [(0, [])]
+            while stack:
+                node, path = stack.pop()
+                if lc[node] == -1:
+                    leaves.append((t, tree["split_conditions"][node], path))
+                    depth = max(depth, len(path))
+                    continue
+                split, feature = split_of(tree, node), tree["split_indices"][node]
+                stack.append((lc[node], path + [(split, True, feature, cover[lc[node]] / cover[node])]))
+                stack.append((rc[node], path + [(split, False, feature, cover[rc[node]] / cover[node])]))
+        self.depth = depth
+
+        self.split_feature = np.array([k[0] for k in splits], dtype=np.intp)
+        self.split_threshold = np.array([k[1] for k in splits], dtype=np.float32)
+        self.split_default_left = np.array([k[2] for k in splits], dtype=bool)
+
+        # Complete-tree layout: 2^depth - 1 split slots and 2^depth leaf slots per tree
+        internal = (1 << depth) - 1
+        self._slot_split = np.zeros((self.num_trees, max(internal, 1)), dtype=np.intp)
+        self._leaf_value = np.zeros((self.num_trees, 1 << depth), dtype=np.float32)
+        for t, value, path in leaves:
+            slot = 0
+            for split, went_left, _, _ in path:
+                self._slot_split[t, slot] = split
+                slot = 2 * slot + (1 if went_left else 2)
+            # a shallow leaf fills the whole subtree below it (reached via split 0)
+            level = depth - len(path)
+            first = ((slot + 1) << level) - 1 - internal
+            self._leaf_value[t, first:first + (1 << level)] = value
+        self._slot_base = (np.arange(self.num_trees) * self._slot_split.shape[1])[None, :]
+        self._leaf_base = (np.arange(self.num_trees) * self._leaf_value.shape[1])[None, :] - internal
+        self._slot_split = self._slot_split.ravel()
+        self._leaf_value = self._leaf_value.ravel()
+
+        self._init_shap(leaves)
+
+    @classmethod
+    def from_json(cls, path: str, base_score: float = None) -> "TreeEnsemble":
+        """
+        Loads a JSON model. base_score defaults to the file's; a vector-form
+        "[...]" value (written by XGBoost >= 3.0) is not understood by the pinned
+        xgboost 2.0.x, which then serves the model with its default 0.5, so that
+        is used here too and both backends give the same scores.
+        """
+        with open(path) as fp:
+            learner = json.load(fp)["learner"]
+        objective = learner["objective"]["name"]
+        if objective != "binary:logistic":
+            raise ValueError(f"only binary:logistic models are supported, got {objective}")
+        booster = learner["gradient_booster"]
+        if booster.get("name", "gbtree") != "gbtree":
+            raise ValueError(f"only gbtree models are supported, got {booster.get('name')}")
+        params = learner["learner_model_param"]
+        if base_score is None:
+            raw = params["base_score"]
+            base_score = 0.5 if raw.startswith("[") else float(raw)
+        base_margin = float(np.log(base_score / (1.0 - base_score)))
+        return cls(booster["model"]["trees"], base_margin, int(params["num_feature"]))
+
+    # --- prediction ---
+
+    def _goes_left(self, X: np.ndarray) -> np.ndarray:
+        """(n, splits) bool: the direction each row takes at every distinct split."""
+        x = X[:, self.split_feature]
+        left = x < self.split_threshold
+        missing = np.isnan(x)
+        if missing.any():
+            left |= missing & self.split_default_left
+        return left
+
+    def predict_margin(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        left = self._goes_left(X).ravel()
+        row_base = (np.arange(len(X)) * len(self.split_feature))[:, None]
+        node = np.zeros((len(X), self.num_trees), dtype=np.intp)
+        for _ in range(self.depth):
+            split = self._slot_split[self._slot_base + node]
+            node = 2 * node + 2 - left[row_base + split]
+        # XGBoost accumulates the margin in float32
+        return self._leaf_value[self._leaf_base + node].sum(axis=1, dtype=np.float32) + np.float32(self.base_margin)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """P(fraud) per row, like XGBClassifier.predict_proba(X)[:, 1]."""
+        margin = self.predict_margin(X).astype(np.float64)
+        return (1.0 / (1.0 + np.exp(-margin))).astype(np.float32)
+
+    # --- TreeSHAP ---
+
+    def _init_shap(self, leaves: list):
+        m = self.num_features
+        subsets = np.arange(1 << m)
+        depth = max(self.depth, 1)
+
+        n_leaves = len(leaves)
+        self._path_split = np.zeros((n_leaves, depth), dtype=np.intp)
+        self._path_left = np.ones((n_leaves, depth), dtype=bool)
+        self._path_bit = np.zeros((n_leaves, depth), dtype=np.intp)
+        ratio = np.ones((n_leaves, depth))
+        value = np.empty(n_leaves)
+        for i, (_, val, path) in enumerate(leaves):
+            value[i] = val
+            for d, (split, went_left, feature, r) in enumerate(path):
+                self._path_split[i, d] = split
+                self._path_left[i, d] = went_left
+                self._path_bit[i, d] = 1 << feature
+                ratio[i, d] = r
+
+        # v_leaf(S) when reachable = value * product of cover ratios of splits on features outside S
+        outside = (self._path_bit[None, :, :] & subsets[:, None, None]) == 0
+        subset_value = np.where(outside, ratio[None], 1.0).prod(axis=2) * value[None, :]  # (2^M, leaves)
+        self.expected_value = float(subset_value[0].sum()) + self.base_margin
+
+        # Shapley weights: phi_i = sum_S C[S, i] v(S), |S|!(M-|S|-1)!/M!
+        size = np.array([bin(s).count("1") for s in subsets])
+        weight = np.array([factorial(k) * factorial(m - k - 1) / factorial(m) for k in range(m)] + [0.0])
+        shapley = np.zeros((len(subsets), m))
+        for i in range(m):
+            has = (subsets >> i) & 1 == 1
+            shapley[has, i] = weight[size[has] - 1]
+            shapley[~has, i] = -weight[size[~has]]
+
+        # A row reaches the leaf under S iff S holds none of the features it disagrees on
+        reachable = (subsets[:, None] & subsets[None, :]) == 0  # (disagree mask, S)
+        table = np.einsum("sl,ds,si->ldi", subset_value, reachable, shapley, optimize=True)
+        self._leaf_shap = table.reshape(n_leaves * len(subsets), m)
+        self._leaf_shap_base = (np.arange(n_leaves) * len(subsets))[None, :]
+
+    def shap_values(self, X: np.ndarray) -> np.ndarray:
+        """(n, num_features) SHAP contributions in margin space."""
+        X = np.asarray(X, dtype=np.float32)
+        out = np.empty((len(X), self.num_features))
+        for start in range(0, len(X), _SHAP_CHUNK):
+            chunk = X[start:start + _SHAP_CHUNK]
+            agrees = self._goes_left(chunk)[:, self._path_split] == self._path_left  # (n, leaves, depth)
+            disagree = np.where(agrees[:, :, 0], 0, self._path_bit[:, 0])
+            for d in range(1, agrees.shape[2]):
+                disagree |= np.where(agrees[:, :, d], 0, self._path_bit[:, d])
+            out[start:start + len(chunk)] = self._leaf_shap[self._leaf_shap_base + disagree].sum(axis=1)
+        return out
@@ -0,0 +1,112 @@
+import heapq
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from app.analytics import event_time, format_us, to_us
+from app.store import event_key
+
+
+class _Newest:
+    """Heap entry ordering the newest event first (heapq is a min-heap)."""
+    __slots__ = ("key", "source", "event")
+
+    def __init__(self, key, source: int, event: dict):
+        self.key = key
+        self.source = source
+        self.event = event
+
+    def __lt__(self, other: "_Newest") -> bool:
+        return self.key > other.key
+
+
+async def merge_newest(sources: List[AsyncIterator[dict]], key: Callable = event_key) -> AsyncIterator[dict]:
+    """
+    Lazy k-way merge of async iterators that are each newest first.
+    Only one pending event per source is held, so reading `limit` items
+    costs O(limit log k) no matter how long the sources are.
+    """
+    heap = []
+    for i, source in enumerate(sources):
+        async for event in source:
+            heap.append(_Newest(key(event), i, event))
+            break
+    heapq.heapify(heap)
+
+    while heap:
+        top = heap[0]
+        yield top.event
+        async for event in sources[top.source]:
+            heapq.heapreplace(heap, _Newest(key(event), top.source, event))
+            break
+        else:
+            heapq.heappop(heap)
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[str, str]]:
+    """'<timestamp>,<id>' -> (timestamp, id). Raises ValueError if malformed."""
+    if not cursor:
+        return None
+    timestamp, sep, event_id = cursor.rpartition(",")
+    if not sep or not timestamp or not event_id:
+        raise ValueError("cursor must look like '<timestamp>,<id>'")
+    return timestamp, event_id
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """ISO 8601 timestamp (naive = UTC) or epoch seconds -> epoch seconds. Raises ValueError if malformed."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    ts = event_time({"timestamp": value})
+    if ts is None:
+        raise ValueError(f"not an ISO timestamp or epoch seconds: {value!r}")
+    return ts
+
+
+def range_cursor(before: Optional[Tuple[str, str]], until: Optional[float]) -> Optional[Tuple[str, str]]:
+    """The tighter of a `before` cursor and an inclusive `until` bound, as a store cursor."""
+    if until is None:
+        return before
+    bound = (format_us(to_us(until)), "\uffff")  # sorts after every id at that instant
+    return bound if before is None else min(before, bound)
+
+
+async def not_before(source: AsyncIterator[dict], start: Optional[float]) -> AsyncIterator[dict]:
+    """Events of a newest-first source down to `start` (epoch seconds, inclusive)."""
+    async for event in source:
+        if start is not None:
+            ts = event_time(event)
+            if ts is not None and ts < start:
+                return
+        yield event
+
+
+def make_cursor(event: dict) -> str:
+    timestamp, event_id = event_key(event)
+    return f"{timestamp},{event_id}"
+
+
+async def filtered(
+    source: AsyncIterator[dict],
+    event_type: str,
+    fraud_only: bool = False,
+    user_id: Optional[str] = None,
+    min_risk: Optional[float] = None,
+    max_risk: Optional[float] = None,
+) -> AsyncIterator[dict]:
+    """Applies the log filters to one source and tags each event with its type."""
+    async for event in source:
+        if fraud_only and not event.get("is_fraud"):
+            continue
+        if user_id is not None and event.get("user_id") != user_id:
+            continue
+        risk = event.get("risk_score") or 0.0
+        if min_risk is not None and risk < min_risk:
+            continue
+        if max_risk is not None and risk > max_risk:
+            continue
+        if event.get("type") != event_type:
+            event = {**event, "type": event_type}
+        yield event
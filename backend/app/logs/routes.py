@@ -1,66 +1,146 @@
-from fastapi import APIRouter, Depends
-from typing import List
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
 
 from app.auth.jwt_handler import get_current_user
-from app.fraud.routes import active_transactions
+from app.archive import transaction_archive
+from app.fraud.routes import transaction_history, transaction_store
 from app.dao.routes import dao_verification_logs
+from app.logs.feed import filtered, make_cursor, merge_newest, not_before, parse_cursor, parse_time, range_cursor
 
 router = APIRouter()
 
+LOG_TYPES = ("TRANSACTION", "DAO_VERIFICATION")
+
 @router.get("/")
 async def get_logs(
     skip: int = 0,
     limit: int = 50,
+    before: Optional[str] = None,
+    type: Optional[str] = None,
+    user_id: Optional[str] = None,
+    min_risk: Optional[float] = None,
+    max_risk: Optional[float] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """
     Returns unified recent events for the logs/analytics view with pagination.
     Includes BOTH Fraud Transactions and DAO Verification attempts.
+
+    Both stores are already newest first (they stamp "timestamp" on insert), so
+    they are merged lazily and reading stops after `limit` items. Pass the returned next_cursor as `before`
+    ("<timestamp>,<id>") for the next page; `skip` still works but costs O(skip).
+    Optional filters: type (TRANSACTION / DAO_VERIFICATION), user_id, min_risk, max_risk.
+    since / until (ISO timestamps or epoch seconds, inclusive) select a range of the
+    server-side "timestamp", which also reaches flagged transactions in the archive.
     """
-    # 1. Get Transaction Logs
-    tx_logs = []
-    for tx in active_transactions:
-        if tx.get("is_fraud"):
-            # Ensure it has a type for the frontend
-            tx_copy = dict(tx)
-            tx_copy["type"] = "TRANSACTION"
-            tx_logs.append(tx_copy)
-            
-    # 2. Get DAO Logs
-    # (We already appended 'type': 'DAO_VERIFICATION' to these in logic)
-    dao_logs = list(dao_verification_logs)
-    
-    # 3. Combine and Sort by timestamp descending (newest first)
-    combined_logs = tx_logs + dao_logs
-    combined_logs.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-    
-    # 4. Apply pagination
-    paginated_logs = combined_logs[skip : skip + limit]
-    
+    if type is not None and type not in LOG_TYPES:
+        raise HTTPException(status_code=400, detail=f"type must be one of {', '.join(LOG_TYPES)}")
+    try:
+        cursor = parse_cursor(before)
+        start, end = parse_time(since), parse_time(until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filters = {"user_id": user_id, "min_risk": min_risk, "max_risk": max_risk}
+
+    # 1. Transaction logs (only flagged transactions appear in the audit log)
+    # 2. DAO logs
+    sources = []
+    if type in (None, "TRANSACTION"):
+        if start is None and end is None:
+            transactions = transaction_store.iter_newest(before=cursor)
+        else:
+            transactions = transaction_history(start, end, cursor)
+        sources.append(filtered(transactions, "TRANSACTION", fraud_only=True, **filters))
+    if type in (None, "DAO_VERIFICATION"):
+        dao_logs = not_before(dao_verification_logs.iter_newest(before=range_cursor(cursor, end)), start)
+        sources.append(filtered(dao_logs, "DAO_VERIFICATION", **filters))
+
+    # 3. Merge newest first, 4. stop after skip + limit
+    paginated_logs = []
+    position = 0
+    async for log in merge_newest(sources):
+        if position >= skip:
+            paginated_logs.append(log)
+            if len(paginated_logs) >= limit:
+                break
+        position += 1
+
+    # Totals come from the running aggregates; unknown once filters apply
+    total = None
+    if cursor is None and start is None and end is None and not any(v is not None for v in filters.values()):
+        tx_stats = await transaction_store.stats()
+        dao_stats = await dao_verification_logs.stats()
+        total = 0
+        if type in (None, "TRANSACTION"):
+            total += tx_stats["fraud_count"]
+        if type in (None, "DAO_VERIFICATION"):
+            total += dao_stats["count"]
+
     return {
         "logs": paginated_logs,
-        "total": len(combined_logs),
+        "total": total,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": make_cursor(paginated_logs[-1]) if len(paginated_logs) == limit and limit > 0 else None
     }
 
 @router.get("/analytics")
 async def get_analytics(current_user: dict = Depends(get_current_user)):
     """
     Returns aggregated analytics for the dashboard across all sub-systems.
+    Served from running aggregates kept by the stores (no scan over events).
     """
-    total_tx = len(active_transactions)
-    fraud_tx = sum(1 for tx in active_transactions if tx.get("is_fraud"))
+    tx_stats = await transaction_store.stats()
+    dao_stats = await dao_verification_logs.stats()
     
-    total_dao = len(dao_verification_logs)
-    rejected_dao = sum(1 for log in dao_verification_logs if log.get("is_fraud"))
+    total_events = tx_stats["count"] + dao_stats["count"]
+    total_anomalies = tx_stats["fraud_count"] + dao_stats["fraud_count"]
     
-    total_events = total_tx + total_dao
-    total_anomalies = fraud_tx + rejected_dao
+    windows = {}
+    for name, tx_window in tx_stats["windows"].items():
+        dao_window = dao_stats["windows"][name]
+        events = tx_window["count"] + dao_window["count"]
+        anomalies = tx_window["fraud_count"] + dao_window["fraud_count"]
+        windows[name] = {
+            "events": events,
+            "anomalies": anomalies,
+            "fraud_rate": round(anomalies / events, 4) if events > 0 else 0
+        }
     
     return {
         "total_transactions": total_events,
         "total_fraud_detected": total_anomalies,
         "clean_transactions": total_events - total_anomalies,
-        "fraud_rate": round(total_anomalies / total_events, 4) if total_events > 0 else 0
+        "fraud_rate": round(total_anomalies / total_events, 4) if total_events > 0 else 0,
+        "windows": windows,
+        "transactions": tx_stats,
+        "dao_verifications": dao_stats
     }
+
+@router.get("/analytics/history")
+async def get_history_analytics(
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    bucket_s: int = 3600,
+    top_users: int = 10,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Analytics over archived transactions in [since, until]: counts, fraud rate,
+    risk histogram, feature means, per-bucket_s time series and the users with
+    most flagged transactions. Reduces the archive's memory-mapped columns with
+    NumPy on a worker thread; recent transactions are in GET /logs/analytics.
+    """
+    try:
+        start, end = parse_time(since), parse_time(until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if bucket_s < 1 or top_users < 0:
+        raise HTTPException(status_code=400, detail="bucket_s must be >= 1 and top_users >= 0")
+    result = await asyncio.to_thread(transaction_archive.analytics, start, end, bucket_s, top_users)
+    return {**result, "archive": transaction_archive.stats()}
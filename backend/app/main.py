@@ -1,17 +1,26 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.db import init_redis, close_redis
+from app.fraud.executor import start_executor, shutdown_executor
+from app.fraud.registry import start_model_registry, stop_model_registry
+from app.fraud.ingest import start_ingestion, stop_ingestion
+from app.dao.verifier import start_face_verifier, shutdown_face_verifier
+from app.dao.ledger import open_ledger, close_ledger
+from app.archive import open_archive, close_archive
+from app.warmup import start_warm_up, stop_warm_up, is_ready, status as warmup_status
 from app.auth.routes import router as auth_router
 from app.fraud.routes import router as fraud_router
 from app.dao.routes import router as dao_router
 from app.logs.routes import router as logs_router
+from app.metrics import MetricsMiddleware
+from app.monitoring.routes import router as monitoring_router, start_monitoring, stop_monitoring
 
 app = FastAPI(
     title="Fraud Detection & DAO Verification API",
     description="Backend API for the real-time fraud detection and DAO identity defense system.",
     version="1.0.0",
-    on_startup=[init_redis],
-    on_shutdown=[close_redis]
+    on_startup=[init_redis, start_executor, start_face_verifier, open_ledger, open_archive, start_warm_up, start_model_registry, start_monitoring, start_ingestion],
+    on_shutdown=[stop_ingestion, stop_monitoring, stop_warm_up, stop_model_registry, close_redis, shutdown_executor, shutdown_face_verifier, close_ledger, close_archive]
 )
 
 # Set up CORS
@@ -29,12 +38,22 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
 app.include_router(fraud_router, prefix="/fraud", tags=["Fraud Detection & WebSockets"])
 app.include_router(dao_router, prefix="/dao", tags=["DAO Identity Verification"])
 app.include_router(logs_router, prefix="/logs", tags=["Explainability & Analytics"])
+app.include_router(monitoring_router, tags=["Monitoring"])
 
 @app.get("/")
 def read_root():
     return {"status": "ok", "message": "Fraud Detection API is running"}
+
+@app.get("/ready")
+def readiness(response: Response):
+    """200 once the model, explainer and face pipeline are warmed up, 503 before (or if a warm-up failed)."""
+    ready = is_ready()
+    if not ready:
+        response.status_code = 503
+    return {"ready": ready, "components": warmup_status}
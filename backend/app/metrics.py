@@ -0,0 +1,382 @@
+import abc
+import asyncio
+import bisect
+import functools
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+
+# Default bucket layouts (upper bounds)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+LATENCY_MS_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. Cheap enough to observe on every request.
+    Counts are stored per bucket and made cumulative on snapshot.
+    """
+
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation (0 if empty)."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for upper, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return float(upper)
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        cumulative = {}
+        running = 0
+        for upper, n in zip(self.buckets, self.counts):
+            running += n
+            cumulative[str(upper)] = running
+        cumulative["+Inf"] = self.count
+        return {
+            "buckets": cumulative,
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": self.quantile(0.50),
+            "p99": self.quantile(0.99),
+        }
+
+
+# --- Prometheus exposition and spans ---
+
+# Span / request durations in seconds
+SPAN_SECONDS_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Family(abc.ABC):
+    """A metric name with one child per label-value tuple."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """A fresh child for a new label-value tuple."""
+
+    @abc.abstractmethod
+    def _expose_child(self, values: tuple, child) -> List[str]:
+        """Exposition lines of one child."""
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._expose_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class CounterFamily(_Family):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def _expose_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_number(child.value)}"]
+
+
+class GaugeFamily(CounterFamily):
+    kind = "gauge"
+
+
+class HistogramFamily(_Family):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=SPAN_SECONDS_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return Histogram(self.buckets)
+
+    def _expose_child(self, values, child: Histogram):
+        lines = []
+        running = 0
+        for upper, n in zip(child.buckets, child.counts):
+            running += n
+            le = 'le="%s"' % _number(upper)
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {running}")
+        le = 'le="+Inf"'
+        lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {child.count}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, values)} {_number(child.sum)}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, values)} {child.count}")
+        return lines
+
+
+class Registry:
+    """
+    Metric families plus collectors (callables returning (name, kind, help,
+    [(labels dict, value)]) tuples, read at scrape time for state that
+    already lives elsewhere, e.g. queue depths).
+    """
+
+    def __init__(self):
+        self._families: Dict[str, _Family] = {}
+        self._collectors: List[Callable[[], Iterable[tuple]]] = []
+
+    def _family(self, cls, name, documentation, labelnames, **kwargs):
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = cls(name, documentation, labelnames, **kwargs)
+        return family
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> CounterFamily:
+        return self._family(CounterFamily, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> GaugeFamily:
+        return self._family(GaugeFamily, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=SPAN_SECONDS_BUCKETS) -> HistogramFamily:
+        return self._family(HistogramFamily, name, documentation, labelnames, buckets=buckets)
+
+    def add_collector(self, collector: Callable[[], Iterable[tuple]]):
+        self._collectors.append(collector)
+
+    def exposition(self) -> str:
+        """Prometheus text format (version 0.0.4)."""
+        lines = []
+        for family in list(self._families.values()):
+            lines.extend(family.expose())
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+SPANS = registry.histogram("app_span_seconds", "Time spent in instrumented code paths.", ("span",))
+SPANS_IN_FLIGHT = registry.gauge("app_span_in_flight", "Instrumented operations currently running.", ("span",))
+
+
+class _State:
+    # Read on every span; flipped at runtime by PUT /metrics/spans
+    enabled = settings.METRICS_SPANS_ENABLED
+
+
+state = _State()
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("histogram", "in_flight", "started")
+
+    def __init__(self, histogram: Histogram, in_flight: _Value):
+        self.histogram = histogram
+        self.in_flight = in_flight
+
+    def __enter__(self):
+        self.in_flight.value += 1
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        self.in_flight.value -= 1
+        return False
+
+
+def span(name: str):
+    """
+    `with span("predict.shap"):` times the block into app_span_seconds{span=name}
+    and counts it in app_span_in_flight while it runs. When spans are disabled
+    this returns a shared no-op object (one attribute read and a call).
+    Observations from worker threads are not locked: a rare lost increment
+    under contention is accepted to keep the hot path free of locks.
+    """
+    if not state.enabled:
+        return _NO_SPAN
+    return _Span(SPANS.labels(name), SPANS_IN_FLIGHT.labels(name))
+
+
+def observe_span(name: str, seconds: float):
+    """Records a duration measured elsewhere (e.g. face pipeline stage timings)."""
+    if state.enabled:
+        SPANS.labels(name).observe(seconds)
+
+
+def drain_spans() -> Dict[str, tuple]:
+    """
+    Span histograms recorded since the last drain, as {span: (bucket counts,
+    sum, count)}, and resets them. Scoring processes send these back with each
+    result so predict.* spans reach the server's /metrics (see merge_spans).
+    """
+    drained = {}
+    for values, histogram in list(SPANS._children.items()):
+        if histogram.count:
+            drained[values[0]] = (histogram.counts, histogram.sum, histogram.count)
+            SPANS._children[values] = Histogram(SPANS.buckets)
+    return drained
+
+
+def merge_spans(drained: Dict[str, tuple]):
+    """Adds span histograms drained in another process to this one's."""
+    for name, (counts, total, count) in drained.items():
+        histogram = SPANS.labels(name)
+        for i, n in enumerate(counts):
+            histogram.counts[i] += n
+        histogram.sum += total
+        histogram.count += count
+
+
+def timed(name: str, fn: Callable[..., Awaitable]):
+    """Wraps a coroutine function in span(name)."""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        if not state.enabled:
+            return await fn(*args, **kwargs)
+        with span(name):
+            return await fn(*args, **kwargs)
+    return wrapper
+
+
+# --- HTTP requests and event-loop lag ---
+
+HTTP_SECONDS = registry.histogram("http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status"))
+HTTP_IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP requests being handled.")
+LOOP_LAG_SECONDS = registry.histogram(
+    "event_loop_lag_seconds", "Delay of a periodic event-loop timer past its deadline.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+LOOP_LAG_LAST = registry.gauge("event_loop_lag_last_seconds", "Most recent event-loop lag sample.")
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware: request count/latency per route template (not raw
+    path, so ids don't explode the label set) and requests in flight.
+    WebSocket connections are not timed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not state.enabled:
+            return await self.app(scope, receive, send)
+        status = 500
+        in_flight = HTTP_IN_FLIGHT.labels()
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight.value += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            in_flight.value -= 1
+            route = scope.get("route")
+            HTTP_SECONDS.labels(scope["method"], getattr(route, "path", "unmatched"), str(status)).observe(
+                time.perf_counter() - started
+            )
+
+
+class LoopLagMonitor:
+    """Wakes every `interval` seconds and records how late the wake-up was."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        histogram, last = LOOP_LAG_SECONDS.labels(), LOOP_LAG_LAST.labels()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - expected, 0.0)
+            histogram.observe(lag)
+            last.set(lag)
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
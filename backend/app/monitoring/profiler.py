@@ -0,0 +1,115 @@
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Optional
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for a live server: a daemon thread wakes every
+    `interval` seconds, snapshots the stack of every other thread
+    (sys._current_frames) and counts them as folded stacks
+    ("thread;outer;...;inner"), ready for flamegraph.pl / speedscope.
+
+    Nothing is hooked into the interpreter, so the cost is one stack walk per
+    thread per sample, and none at all while stopped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.interval = 0.0
+        self.max_depth = 0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, interval: float, max_depth: int):
+        """Clears previous samples and starts sampling (ValueError if already running)."""
+        with self._lock:
+            if self._thread is not None:
+                raise ValueError("profiler is already running")
+            self.stacks = Counter()
+            self.samples = 0
+            self.interval = interval
+            self.max_depth = max_depth
+            self.started_at, self.stopped_at = time.time(), None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join()
+        self.stopped_at = time.time()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            sample = [
+                self._fold(names.get(ident, str(ident)), frame)
+                for ident, frame in sys._current_frames().items()
+                if ident != own
+            ]
+            # Readers copy the counts under the same lock (see _snapshot)
+            with self._lock:
+                self.stacks.update(sample)
+                self.samples += 1
+
+    def _fold(self, thread_name: str, frame) -> str:
+        names: List[str] = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+            frame = frame.f_back
+        names.append(thread_name)
+        return ";".join(reversed(names))
+
+    def _snapshot(self):
+        """(stacks copy, samples), consistent even while the sampler thread runs."""
+        with self._lock:
+            return Counter(self.stacks), self.samples
+
+    def folded(self) -> str:
+        """Collapsed-stack text: one "stack count" line per distinct stack."""
+        stacks, _ = self._snapshot()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def report(self, limit: int = 50) -> dict:
+        stacks, samples = self._snapshot()
+        total = sum(stacks.values()) or 1
+        # Leaf function -> samples (self time)
+        leaves: Counter = Counter()
+        for stack, count in stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000.0,
+            "max_depth": self.max_depth,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "samples": samples,
+            "top_functions": [
+                {"function": name, "samples": count, "fraction": round(count / total, 4)}
+                for name, count in leaves.most_common(limit)
+            ],
+            "top_stacks": [
+                {"stack": stack, "samples": count, "fraction": round(count / total, 4)}
+                for stack, count in stacks.most_common(limit)
+            ],
+        }
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,68 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.auth.jwt_handler import get_current_admin
+from app.config import settings
+from app.metrics import LoopLagMonitor, registry, state
+from app.monitoring.profiler import profiler
+
+router = APIRouter()
+
+loop_lag_monitor = LoopLagMonitor(settings.METRICS_LOOP_LAG_INTERVAL_S)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Prometheus text exposition: per-route HTTP latency, app_span_seconds per
+    instrumented stage (predict.*, face.*, ws.broadcast, auth.jwt_decode, store.*;
+    predict.* includes the SCORING_EXECUTOR=process workers' timings), in-flight
+    gauges, queue depths and event-loop lag.
+    """
+    return PlainTextResponse(registry.exposition(), media_type="text/plain; version=0.0.4")
+
+@router.put("/metrics/spans")
+def set_span_timing(enabled: bool, current_user: dict = Depends(get_current_admin)):
+    """Turns span and HTTP timing on or off at runtime (gauges and queue depths are always exported)."""
+    state.enabled = enabled
+    return {"enabled": state.enabled}
+
+@router.post("/admin/profiler/start")
+def start_profiler(
+    interval_ms: float = settings.PROFILER_INTERVAL_MS,
+    max_depth: int = settings.PROFILER_MAX_DEPTH,
+    current_user: dict = Depends(get_current_admin)
+):
+    """Starts sampling all thread stacks every interval_ms (previous samples are discarded)."""
+    if interval_ms < 1 or max_depth < 1:
+        raise HTTPException(status_code=400, detail="interval_ms and max_depth must be at least 1")
+    try:
+        profiler.start(interval_ms / 1000.0, max_depth)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profiler.report(limit=0)
+
+@router.post("/admin/profiler/stop")
+def stop_profiler(limit: int = 50, current_user: dict = Depends(get_current_admin)):
+    profiler.stop()
+    return profiler.report(limit)
+
+@router.get("/admin/profiler")
+def get_profile(format: str = "json", limit: int = 50, current_user: dict = Depends(get_current_admin)):
+    """
+    Samples so far (the profiler may still be running). format=folded returns
+    collapsed stacks for flamegraph.pl / speedscope.
+    """
+    if format == "folded":
+        return PlainTextResponse(profiler.folded())
+    if format != "json":
+        raise HTTPException(status_code=400, detail="format must be json or folded")
+    return profiler.report(limit)
+
+
+def start_monitoring():
+    loop_lag_monitor.start()
+
+
+async def stop_monitoring():
+    await loop_lag_monitor.stop()
+    profiler.stop()
@@ -0,0 +1,498 @@
+import json
+import time
+from typing import AsyncIterator, Callable, Iterator, List, Optional, Tuple
+
+from app import db
+from app.analytics import (
+    RISK_BINS, WINDOWS, WINDOW_BUCKETS, RunningStats, event_time, format_us, summarize, to_us, window_bucket,
+)
+from app.config import settings
+from app.metrics import timed
+
+
+class RingBuffer:
+    """
+    Fixed-capacity store of recent events (dicts with an "id"), read newest first.
+
+    - append is O(1); once full, the oldest event is overwritten (and returned)
+    - get / delete by id are O(1) through an id -> slot index
+    - page(skip, limit) seeks to the skip-th live event in O(log n) with a
+      Fenwick tree over live slots, so deep pages stay cheap after deletes
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._slots: List[Optional[dict]] = [None] * capacity
+        self._index = {}  # id -> slot
+        self._next = 0  # slot the next append writes to
+        self._tree = [0] * (capacity + 1)  # Fenwick tree of live flags, 1-based
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __iter__(self) -> Iterator[dict]:
+        return self.iter_newest()
+
+    # Fenwick tree helpers
+    def _tree_add(self, slot: int, delta: int):
+        i = slot + 1
+        while i <= self.capacity:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _live_through(self, slot: int) -> int:
+        """Number of live events in slots [0, slot]."""
+        i, total = slot + 1, 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _find_kth(self, k: int) -> int:
+        """Slot of the k-th live event (1-based) in slot order."""
+        pos, step = 0, 1 << self.capacity.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self.capacity and self._tree[nxt] < k:
+                pos = nxt
+                k -= self._tree[nxt]
+            step >>= 1
+        return pos
+
+    def append(self, event: dict) -> Optional[dict]:
+        """Stores event as the newest entry. Returns the event it evicted, if any."""
+        if event["id"] in self._index:
+            self.delete(event["id"])
+
+        slot = self._next
+        evicted = self._slots[slot]
+        if evicted is not None:
+            del self._index[evicted["id"]]
+        else:
+            self._tree_add(slot, 1)
+
+        self._slots[slot] = event
+        self._index[event["id"]] = slot
+        self._next = (slot + 1) % self.capacity
+        return evicted
+
+    def get(self, event_id: str) -> Optional[dict]:
+        slot = self._index.get(event_id)
+        return None if slot is None else self._slots[slot]
+
+    def delete(self, event_id: str) -> Optional[dict]:
+        slot = self._index.pop(event_id, None)
+        if slot is None:
+            return None
+        event = self._slots[slot]
+        self._slots[slot] = None
+        self._tree_add(slot, -1)
+        return event
+
+    def clear(self):
+        self._slots = [None] * self.capacity
+        self._index.clear()
+        self._tree = [0] * (self.capacity + 1)
+        self._next = 0
+
+    def _seek(self, skip: int) -> Optional[int]:
+        """Slot of the live event that has `skip` newer live events before it."""
+        if skip >= len(self._index):
+            return None
+        newest = (self._next - 1) % self.capacity
+        before_wrap = self._live_through(newest)
+        if skip < before_wrap:
+            return self._find_kth(before_wrap - skip)
+        # Past the wrap point: count back from the end of the slot array
+        return self._find_kth(len(self._index) - (skip - before_wrap))
+
+    def at(self, rank: int) -> Optional[dict]:
+        """The live event with `rank` newer live events before it (0 = newest)."""
+        slot = self._seek(rank)
+        return None if slot is None else self._slots[slot]
+
+    def iter_newest(self, skip: int = 0) -> Iterator[dict]:
+        """Live events newest first, starting after the `skip` newest ones."""
+        slot = self._seek(skip)
+        if slot is None:
+            return
+        remaining = len(self._index) - skip
+        while remaining > 0:
+            event = self._slots[slot]
+            if event is not None:
+                yield event
+                remaining -= 1
+            slot = (slot - 1) % self.capacity
+
+    def page(self, skip: int = 0, limit: int = 50) -> List[dict]:
+        out = []
+        if limit <= 0:
+            return out
+        for event in self.iter_newest(skip):
+            out.append(event)
+            if len(out) >= limit:
+                break
+        return out
+
+
+def event_key(event: dict) -> Tuple[str, str]:
+    """Sort / cursor key of an event: (ISO timestamp, id), newest has the largest key."""
+    return (event.get("timestamp") or "", event["id"])
+
+
+_last_stamp_us = 0
+
+
+def stamp(event: dict) -> int:
+    """
+    Sets event["timestamp"] to the insert time and returns it in epoch
+    microseconds. Strictly increasing within the process, so a store's insert
+    order is also its timestamp order; a time supplied by the caller is kept in
+    "occurred_at" (see app.fraud.bulk), never in "timestamp".
+    """
+    global _last_stamp_us
+    now = time.time_ns() // 1000
+    _last_stamp_us = now if now > _last_stamp_us else _last_stamp_us + 1
+    event["timestamp"] = format_us(_last_stamp_us)
+    return _last_stamp_us
+
+
+class MemoryEventStore:
+    """
+    Event store backed by a RingBuffer in this process.
+    Every uvicorn worker has its own copy; use the Redis store to share events.
+    Events are stamped with the insert time, so the buffer is in timestamp order.
+    Keeps RunningStats in step with every insert, eviction and delete, and
+    hands evicted events to on_evict (e.g. the transaction archive).
+    """
+
+    def __init__(self, name: str, capacity: int, on_evict: Optional[Callable[[dict], None]] = None):
+        self.name = name
+        self.buffer = RingBuffer(capacity)
+        self.running = RunningStats()
+        self.on_evict = on_evict
+
+    def _append(self, event: dict):
+        previous = self.buffer.get(event["id"])
+        if previous is not None:
+            self.running.remove(previous)
+        stamp(event)
+        evicted = self.buffer.append(event)
+        self.running.add(event)
+        if evicted is not None:
+            self.running.remove(evicted, evicted=True)
+            if self.on_evict is not None:
+                self.on_evict(evicted)
+
+    async def add(self, event: dict):
+        self._append(event)
+
+    async def add_many(self, events: List[dict]):
+        """Adds events oldest to newest."""
+        for event in events:
+            self._append(event)
+
+    async def get(self, event_id: str) -> Optional[dict]:
+        return self.buffer.get(event_id)
+
+    async def update(self, event: dict) -> bool:
+        """
+        Replaces a stored event in place (keeps its position). False if it's gone.
+        Meant for filling in derived fields; risk_score / is_fraud must not change.
+        """
+        stored = self.buffer.get(event["id"])
+        if stored is None:
+            return False
+        if stored is not event:
+            stored.clear()
+            stored.update(event)
+        return True
+
+    async def delete(self, event_id: str) -> bool:
+        event = self.buffer.delete(event_id)
+        if event is None:
+            return False
+        self.running.remove(event)
+        return True
+
+    async def page(self, skip: int = 0, limit: int = 50) -> List[dict]:
+        return self.buffer.page(skip, limit)
+
+    async def count(self) -> int:
+        return len(self.buffer)
+
+    async def stats(self) -> dict:
+        return self.running.snapshot()
+
+    def _rank_before(self, before: Tuple[str, str]) -> int:
+        # Binary search over ranks; stamp() makes arrival order timestamp order
+        lo, hi = 0, len(self.buffer)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if event_key(self.buffer.at(mid)) < before:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    async def iter_newest(self, chunk_size: int = 500, before: Optional[Tuple[str, str]] = None) -> AsyncIterator[dict]:
+        """Events newest first; with before=(timestamp, id), only those older than that key."""
+        skip = self._rank_before(before) if before else 0
+        for event in self.buffer.iter_newest(skip):
+            yield event
+
+
+# Shared by the Redis scripts: applies one event's JSON to the running totals
+# in the stats hash KEYS[3] with sign +1 / -1. ARGV[1] is the number of risk bins.
+_LUA_APPLY = """
+local function apply(raw, sign)
+    local ev = cjson.decode(raw)
+    local risk = tonumber(ev['risk_score']) or 0
+    local fraud = 0
+    if ev['is_fraud'] == true then fraud = 1 end
+    local bins = tonumber(ARGV[1])
+    local bin = math.min(math.max(math.floor(risk * bins), 0), bins - 1)
+    redis.call('HINCRBY', KEYS[3], 'count', sign)
+    redis.call('HINCRBY', KEYS[3], 'fraud', sign * fraud)
+    redis.call('HINCRBYFLOAT', KEYS[3], 'risk_sum', sign * risk)
+    redis.call('HINCRBY', KEYS[3], 'h' .. bin, sign)
+    return {fraud, risk}
+end
+local function apply_windows(fraud, risk, sign, ttl)
+    for i = 4, #KEYS do
+        if sign > 0 or redis.call('EXISTS', KEYS[i]) == 1 then
+            redis.call('HINCRBY', KEYS[i], 'count', sign)
+            redis.call('HINCRBY', KEYS[i], 'fraud', sign * fraud)
+            redis.call('HINCRBYFLOAT', KEYS[i], 'risk_sum', sign * risk)
+            if ttl then redis.call('EXPIRE', KEYS[i], ttl) end
+        end
+    end
+end
+"""
+
+# Adds one event, updates the aggregates and trims the oldest beyond capacity, atomically.
+# The score is the event's timestamp in epoch microseconds (exact in a double), so the
+# order is by timestamp, then id, whichever worker wrote first.
+# KEYS: order zset, events hash, stats hash, window buckets...
+# ARGV: risk bins, id, json, capacity, window ttl, score.
+# Returns the JSON of the events trimmed (for on_evict).
+_ADD_SCRIPT = _LUA_APPLY + """
+local previous = redis.call('HGET', KEYS[2], ARGV[2])
+if previous then apply(previous, -1) end
+redis.call('ZADD', KEYS[1], ARGV[6], ARGV[2])
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+local added = apply(ARGV[3], 1)
+apply_windows(added[1], added[2], 1, tonumber(ARGV[5]))
+local excess = redis.call('ZCARD', KEYS[1]) - tonumber(ARGV[4])
+local evicted = {}
+if excess > 0 then
+    local old = redis.call('ZRANGE', KEYS[1], 0, excess - 1)
+    for _, old_id in ipairs(old) do
+        local raw = redis.call('HGET', KEYS[2], old_id)
+        if raw then
+            apply(raw, -1)
+            evicted[#evicted + 1] = raw
+        end
+    end
+    redis.call('ZREMRANGEBYRANK', KEYS[1], 0, excess - 1)
+    redis.call('HDEL', KEYS[2], unpack(old))
+end
+return evicted
+"""
+
+# Deletes one event and takes it out of the aggregates.
+# KEYS: order zset, events hash, stats hash, window buckets...
+# ARGV: risk bins, id.
+_DELETE_SCRIPT = _LUA_APPLY + """
+local raw = redis.call('HGET', KEYS[2], ARGV[2])
+if not raw then return 0 end
+redis.call('ZREM', KEYS[1], ARGV[2])
+redis.call('HDEL', KEYS[2], ARGV[2])
+local removed = apply(raw, -1)
+apply_windows(removed[1], removed[2], -1, nil)
+return 1
+"""
+
+
+class RedisEventStore:
+    """
+    Event store shared by all workers through Redis.
+
+    Events are JSON in a hash (id -> event) and ordered by their insert timestamp
+    (stamp()) in a sorted set, so pages are ZREVRANGE(BYSCORE) + HMGET on any worker. Writes
+    go through Lua scripts (add + aggregates + trim to capacity) and are pipelined
+    for batches.
+    Running aggregates live in a stats hash plus expiring per-bucket window hashes,
+    so analytics are the same from every worker. Uses the pooled client from app.db.
+    Events trimmed by capacity are returned by the script and handed to on_evict
+    on the worker whose insert trimmed them, so each is passed on exactly once.
+    """
+
+    def __init__(self, name: str, capacity: int, on_evict: Optional[Callable[[dict], None]] = None):
+        self.name = name
+        self.capacity = capacity
+        self.on_evict = on_evict
+        prefix = f"{settings.REDIS_KEY_PREFIX}:{name}"
+        self.order_key = f"{prefix}:order"
+        self.events_key = f"{prefix}:events"
+        self.stats_key = f"{prefix}:stats"
+        self.window_prefix = f"{prefix}:win"
+        self._scripts = {}
+
+    @property
+    def redis(self):
+        if db.redis_client is None:
+            raise RuntimeError("Redis is not initialized (STORE_BACKEND=redis needs init_redis at startup)")
+        return db.redis_client
+
+    def _script(self, name: str, source: str):
+        if name not in self._scripts:
+            self._scripts[name] = self.redis.register_script(source)
+        return self._scripts[name]
+
+    def _keys(self, event: dict) -> List[str]:
+        """Script keys for an event: the store keys plus its live window buckets."""
+        keys = [self.order_key, self.events_key, self.stats_key]
+        ts = event_time(event)
+        if ts is None:
+            return keys
+        now = time.time()
+        for name, span in WINDOWS.items():
+            bucket = window_bucket(span, min(ts, now))
+            if bucket > window_bucket(span, now) - WINDOW_BUCKETS:
+                keys.append(f"{self.window_prefix}:{name}:{bucket}")
+        return keys
+
+    async def add(self, event: dict):
+        await self.add_many([event])
+
+    async def add_many(self, events: List[dict]):
+        """Adds events oldest to newest in one round trip."""
+        if not events:
+            return
+        script = self._script("add", _ADD_SCRIPT)
+        ttl = 2 * max(WINDOWS.values())
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for event in events:
+                score = stamp(event)
+                await script(
+                    keys=self._keys(event),
+                    args=[RISK_BINS, event["id"], json.dumps(event), self.capacity, ttl, score],
+                    client=pipe,
+                )
+            trimmed = await pipe.execute()
+        if self.on_evict is not None:
+            for raws in trimmed:
+                for raw in raws:
+                    self.on_evict(json.loads(raw))
+
+    async def get(self, event_id: str) -> Optional[dict]:
+        raw = await self.redis.hget(self.events_key, event_id)
+        return json.loads(raw) if raw else None
+
+    async def update(self, event: dict) -> bool:
+        """Replaces a stored event; risk_score / is_fraud must not change."""
+        if await self.redis.zscore(self.order_key, event["id"]) is None:
+            return False
+        await self.redis.hset(self.events_key, event["id"], json.dumps(event))
+        return True
+
+    async def delete(self, event_id: str) -> bool:
+        event = await self.get(event_id)
+        if event is None:
+            return False
+        script = self._script("delete", _DELETE_SCRIPT)
+        removed = await script(keys=self._keys(event), args=[RISK_BINS, event_id])
+        return bool(removed)
+
+    async def _load(self, ids: List[str]) -> List[dict]:
+        if not ids:
+            return []
+        raws = await self.redis.hmget(self.events_key, ids)
+        # An id may have been trimmed between the two calls
+        return [json.loads(raw) for raw in raws if raw]
+
+    async def page(self, skip: int = 0, limit: int = 50) -> List[dict]:
+        if limit <= 0:
+            return []
+        ids = await self.redis.zrevrange(self.order_key, skip, skip + limit - 1)
+        return await self._load(ids)
+
+    async def count(self) -> int:
+        return await self.redis.zcard(self.order_key)
+
+    async def stats(self) -> dict:
+        now = time.time()
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self.stats_key)
+            for name, span in WINDOWS.items():
+                newest = window_bucket(span, now)
+                for bucket in range(newest - WINDOW_BUCKETS + 1, newest + 1):
+                    pipe.hmget(f"{self.window_prefix}:{name}:{bucket}", "count", "fraud", "risk_sum")
+            totals, *buckets = await pipe.execute()
+
+        windows = {}
+        for i, name in enumerate(WINDOWS):
+            rows = buckets[i * WINDOW_BUCKETS:(i + 1) * WINDOW_BUCKETS]
+            windows[name] = (
+                sum(int(c or 0) for c, _, _ in rows),
+                sum(int(f or 0) for _, f, _ in rows),
+                sum(float(r or 0) for _, _, r in rows),
+            )
+        histogram = [int(totals.get(f"h{i}", 0)) for i in range(RISK_BINS)]
+        return summarize(
+            int(totals.get("count", 0)),
+            int(totals.get("fraud", 0)),
+            float(totals.get("risk_sum", 0)),
+            histogram,
+            windows,
+        )
+
+    async def iter_newest(self, chunk_size: int = 500, before: Optional[Tuple[str, str]] = None) -> AsyncIterator[dict]:
+        """
+        Events newest first; with before=(timestamp, id), only those older than that key.
+        Pages by score (ZREVRANGEBYSCORE from the last event read), not by offset, so
+        events inserted or trimmed meanwhile never shift a page into repeats or gaps.
+        """
+        if before:
+            score, last_id = to_us(event_time({"timestamp": before[0]})), before[1]
+        else:
+            score, last_id = "+inf", None
+        while True:
+            if last_id is not None:
+                # Equal scores are ordered by id, like the cursor key: the rest of the tie comes first
+                tied = await self.redis.zrevrangebyscore(self.order_key, score, score)
+                for event in await self._load([event_id for event_id in tied if event_id < last_id]):
+                    yield event
+                score = f"({score}"
+            rows = await self.redis.zrevrangebyscore(
+                self.order_key, score, "-inf", start=0, num=chunk_size, withscores=True
+            )
+            if not rows:
+                return
+            for event in await self._load([event_id for event_id, _ in rows]):
+                yield event
+            last_id, score = rows[-1][0], int(rows[-1][1])
+
+
+STORE_BACKENDS = {"memory": MemoryEventStore, "redis": RedisEventStore}
+
+# Store methods timed as store.<name>.<op> spans
+TIMED_OPERATIONS = ("add", "add_many", "get", "update", "delete", "page", "count", "stats")
+
+
+def create_store(name: str, capacity: int, on_evict: Optional[Callable[[dict], None]] = None):
+    """
+    Builds the event store selected by STORE_BACKEND. on_evict is called with
+    each event pushed out by capacity.
+    """
+    try:
+        backend = STORE_BACKENDS[settings.STORE_BACKEND]
+    except KeyError:
+        raise ValueError(f"STORE_BACKEND must be one of {tuple(STORE_BACKENDS)}, got {settings.STORE_BACKEND!r}")
+    store = backend(name, capacity, on_evict)
+    for op in TIMED_OPERATIONS:
+        setattr(store, op, timed(f"store.{name}.{op}", getattr(store, op)))
+    return store
@@ -0,0 +1,47 @@
+"""
+Start-up warm-up of the scoring and face pipelines.
+
+Runs as background tasks so the server accepts connections (and answers
+GET /ready with 503) while the model, explainer and OpenCV are loaded.
+"""
+import asyncio
+import time
+from typing import Dict, List
+
+from app.dao.verifier import face_verifier
+from app.fraud.executor import warm_up_scoring
+
+WARMUPS = {
+    "scoring": warm_up_scoring,
+    "face": face_verifier.warm_up,
+}
+
+status: Dict[str, dict] = {name: {"ready": False, "error": None, "seconds": None} for name in WARMUPS}
+_tasks: List[asyncio.Task] = []
+
+
+async def _run(name: str, warm_up):
+    started = time.perf_counter()
+    try:
+        await warm_up()
+    except Exception as exc:
+        status[name]["error"] = f"{type(exc).__name__}: {exc}"
+    else:
+        status[name]["ready"] = True
+    status[name]["seconds"] = round(time.perf_counter() - started, 3)
+
+
+async def start_warm_up():
+    for name, warm_up in WARMUPS.items():
+        _tasks.append(asyncio.create_task(_run(name, warm_up)))
+
+
+async def stop_warm_up():
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+
+
+def is_ready() -> bool:
+    return all(component["ready"] for component in status.values())
@@ -1,24 +1,212 @@
-from typing import List
+import asyncio
+import json
+from typing import Dict, List, Optional
 from fastapi import WebSocket
 
+from app.config import settings
+from app.metrics import registry, span
+
+SLOW_CLIENT_POLICIES = ("drop_oldest", "disconnect")
+
+
+class _Client:
+    __slots__ = ("websocket", "queue", "sender", "sent", "dropped", "subscription", "batch", "flush_handle")
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.sender: asyncio.Task = None
+        self.sent = 0
+        self.dropped = 0
+        # Set once the client subscribes; None = every message, one frame each
+        self.subscription = None
+        self.batch: List[str] = []
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    """
+    Fan-out broadcaster. broadcast() serializes a message once and only enqueues
+    it: every client has a bounded queue drained by its own sender task, so a slow
+    dashboard never delays the caller or the other clients. When a client's queue
+    is full it either loses its oldest pending message (drop_oldest) or is
+    disconnected (disconnect). Sockets that fail to send are pruned.
+
+    Clients may subscribe with a filter object (anything with matches(message),
+    summary_only and batch_ms). Summary-only clients get messages without the
+    `summary_exclude` keys; with batch_ms > 0 their events are coalesced into one
+    {"action": "batch", "events": [...]} frame per tick.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = 256,
+        slow_client_policy: str = "drop_oldest",
+        summary_exclude: tuple = ("explanations",),
+        max_batch_events: int = 500,
+    ):
+        if slow_client_policy not in SLOW_CLIENT_POLICIES:
+            raise ValueError(f"slow_client_policy must be one of {SLOW_CLIENT_POLICIES}")
+        self.queue_size = queue_size
+        self.slow_client_policy = slow_client_policy
+        self.summary_exclude = summary_exclude
+        self.max_batch_events = max_batch_events
+        self.clients: Dict[WebSocket, _Client] = {}
+
+        self.messages_broadcast = 0
+        self.messages_dropped = 0
+        self.slow_disconnects = 0
+        self.send_failures = 0
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.clients)
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = _Client(websocket, self.queue_size)
+        client.sender = asyncio.create_task(self._send_loop(client))
+        self.clients[websocket] = client
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        if client.flush_handle is not None:
+            client.flush_handle.cancel()
+        if client.sender is not asyncio.current_task():
+            client.sender.cancel()
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
+    def subscribe(self, websocket: WebSocket, subscription):
+        """Replaces the client's filter; pending coalesced events are flushed first."""
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        self._flush(client)
+        client.subscription = subscription
+
+    async def send_personal(self, websocket: WebSocket, message: dict):
+        """Queues a message for one client (in order with its broadcasts)."""
+        client = self.clients.get(websocket)
+        if client is not None:
+            self._enqueue(client, self._dumps(message))
+
+    @staticmethod
+    def _dumps(message: dict) -> str:
+        # Same encoding as WebSocket.send_json
+        return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+    async def _send_loop(self, client: _Client):
+        try:
+            while True:
+                payload = await client.queue.get()
+                await client.websocket.send_text(payload)
+                client.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Dead socket: stop tracking it
+            self.send_failures += 1
+            self.disconnect(client.websocket)
+
+    def _drop_slow_client(self, client: _Client):
+        self.slow_disconnects += 1
+        self.disconnect(client.websocket)
+
+        async def close():
             try:
-                await connection.send_json(message)
+                await client.websocket.close(code=1013)  # try again later
             except Exception:
-                # Handle disconnected clients
                 pass
 
-manager = ConnectionManager()
+        asyncio.create_task(close())
+
+    def _enqueue(self, client: _Client, payload: str):
+        try:
+            client.queue.put_nowait(payload)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.slow_client_policy == "disconnect":
+            self._drop_slow_client(client)
+            return
+
+        client.queue.get_nowait()
+        client.queue.put_nowait(payload)
+        client.dropped += 1
+        self.messages_dropped += 1
+
+    def _flush(self, client: _Client):
+        if client.flush_handle is not None:
+            client.flush_handle.cancel()
+            client.flush_handle = None
+        if not client.batch or client.websocket not in self.clients:
+            client.batch = []
+            return
+        # Events are already serialized; the frame is just joined around them
+        frame = '{"action":"batch","events":[' + ",".join(client.batch) + "]}"
+        client.batch = []
+        self._enqueue(client, frame)
+
+    def _deliver(self, client: _Client, payload: str):
+        subscription = client.subscription
+        if subscription is None or not subscription.batch_ms:
+            self._enqueue(client, payload)
+            return
+        client.batch.append(payload)
+        if len(client.batch) >= self.max_batch_events:
+            self._flush(client)
+        elif client.flush_handle is None:
+            client.flush_handle = asyncio.get_running_loop().call_later(
+                subscription.batch_ms / 1000.0, self._flush, client
+            )
+
+    async def broadcast(self, message: dict):
+        with span("ws.broadcast"):
+            # Serialize once per variant (full / summary), not once per client
+            payload = self._dumps(message)
+            summary_payload = None
+            self.messages_broadcast += 1
+            for client in list(self.clients.values()):
+                subscription = client.subscription
+                if subscription is None:
+                    self._enqueue(client, payload)
+                    continue
+                if not subscription.matches(message):
+                    continue
+                if subscription.summary_only and any(key in message for key in self.summary_exclude):
+                    if summary_payload is None:
+                        summary_payload = self._dumps(
+                            {k: v for k, v in message.items() if k not in self.summary_exclude}
+                        )
+                    self._deliver(client, summary_payload)
+                else:
+                    self._deliver(client, payload)
+
+    def collect_metrics(self):
+        stats = self.stats()
+        yield "websocket_connections", "gauge", "Open /fraud/stream connections.", [({}, stats["connections"])]
+        yield "websocket_queue_depth", "gauge", "Messages queued across all clients.", [({}, stats["queue_depth_total"])]
+        yield "websocket_messages_dropped_total", "counter", "Messages dropped for slow clients.", [({}, stats["messages_dropped"])]
+
+    def stats(self) -> dict:
+        depths = [client.queue.qsize() for client in self.clients.values()]
+        return {
+            "connections": len(self.clients),
+            "subscribed": sum(client.subscription is not None for client in self.clients.values()),
+            "queue_size": self.queue_size,
+            "slow_client_policy": self.slow_client_policy,
+            "queue_depth_max": max(depths, default=0),
+            "queue_depth_total": sum(depths),
+            "messages_broadcast": self.messages_broadcast,
+            "messages_dropped": self.messages_dropped,
+            "slow_disconnects": self.slow_disconnects,
+            "send_failures": self.send_failures,
+        }
+
+manager = ConnectionManager(
+    queue_size=settings.WS_CLIENT_QUEUE_SIZE,
+    slow_client_policy=settings.WS_SLOW_CLIENT_POLICY,
+)
+registry.add_collector(manager.collect_metrics)
@@ -0,0 +1,129 @@
+"""
+Face verification pipeline benchmark: legacy detect_and_compare_faces (cascade
+loaded per call, full-resolution decode and detection) vs the bounded-cost
+pipeline, with per-stage timings (decode, detect, crop, histogram, compare).
+
+Every image is compared against the next one in the set. Without --images,
+synthetic 12MP JPEGs are generated; they contain no faces, so only decode and
+detect are exercised.
+
+Run from backend/:
+    python -m benchmarks.bench_face --images path/to/photos [--rounds 3]
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from app.dao import face_detect
+
+STAGES = ("load_cascade", "decode", "detect", "crop", "histogram", "compare")
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def _lap(timings: dict, stage: str, started: float) -> float:
+    now = time.perf_counter()
+    timings[stage] = timings.get(stage, 0.0) + (now - started)
+    return now
+
+
+def legacy_extract(img_bytes: bytes, timings: dict):
+    """The original get_face_roi, instrumented."""
+    started = time.perf_counter()
+    face_cascade = cv2.CascadeClassifier(face_detect.CASCADE_PATH)
+    started = _lap(timings, "load_cascade", started)
+
+    nparr = np.frombuffer(img_bytes, np.uint8)
+    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    started = _lap(timings, "decode", started)
+    if img is None:
+        return None, "Failed to decode image"
+
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+    started = _lap(timings, "detect", started)
+    if len(faces) == 0:
+        return None, "No face detected"
+
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    roi = cv2.resize(img[y:y+h, x:x+w], (200, 200))
+    _lap(timings, "crop", started)
+    return roi, None
+
+
+def legacy_compare(image1_bytes: bytes, image2_bytes: bytes, timings: dict) -> dict:
+    face1, err1 = legacy_extract(image1_bytes, timings)
+    if err1: return {"match": False, "score": 0.0, "error": f"Image 1: {err1}"}
+    face2, err2 = legacy_extract(image2_bytes, timings)
+    if err2: return {"match": False, "score": 0.0, "error": f"Image 2: {err2}"}
+    return face_detect.compare_faces(face1, face2, timings)
+
+
+def load_images(directory: str) -> list:
+    paths = sorted(p for p in Path(directory).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+    return [p.read_bytes() for p in paths]
+
+
+def synthetic_images(count: int, width: int = 4000, height: int = 3000) -> list:
+    rng = np.random.default_rng(7)
+    images = []
+    for _ in range(count):
+        small = rng.integers(0, 256, size=(height // 50, width // 50, 3), dtype=np.uint8)
+        img = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+        images.append(cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes())
+    return images
+
+
+def run(compare, images: list, rounds: int):
+    stage_totals = {}
+    latencies = []
+    results = []
+    for _ in range(rounds):
+        for i, img in enumerate(images):
+            other = images[(i + 1) % len(images)]
+            started = time.perf_counter()
+            results.append(compare(img, other, stage_totals))
+            latencies.append((time.perf_counter() - started) * 1e3)
+    latencies.sort()
+    calls = len(latencies)
+    return {
+        "mean_ms": statistics.fmean(latencies),
+        "p50_ms": latencies[calls // 2],
+        "p99_ms": latencies[max(int(calls * 0.99) - 1, 0)],
+        "stages_ms": {stage: stage_totals.get(stage, 0.0) * 1e3 / calls for stage in STAGES},
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="directory of sample photos (default: synthetic 12MP JPEGs)")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    images = load_images(args.images) if args.images else synthetic_images(4)
+    if len(images) < 2:
+        parser.error("need at least two images")
+
+    # Warm up both (cascade, codec and allocator caches)
+    legacy_compare(images[0], images[1], {})
+    face_detect.detect_and_compare_faces(images[0], images[1])
+
+    legacy = run(legacy_compare, images, args.rounds)
+    fast = run(face_detect.detect_and_compare_faces, images, args.rounds)
+
+    agree = sum(a["match"] == b["match"] for a, b in zip(legacy["results"], fast["results"]))
+    print(f"{len(images)} images x {args.rounds} rounds, max dim {face_detect.settings.FACE_DETECT_MAX_DIM}px")
+    print(f"{'stage (ms / call)':<20}{'legacy':>10}{'fast':>10}")
+    for stage in STAGES:
+        print(f"{stage:<20}{legacy['stages_ms'][stage]:>10.2f}{fast['stages_ms'][stage]:>10.2f}")
+    for key in ("mean_ms", "p50_ms", "p99_ms"):
+        print(f"{key:<20}{legacy[key]:>10.2f}{fast[key]:>10.2f}")
+    print(f"{legacy['mean_ms'] / fast['mean_ms']:.1f}x faster; match decisions agree on {agree}/{len(fast['results'])}")
+
+
+if __name__ == "__main__":
+    main()
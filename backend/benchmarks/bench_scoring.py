@@ -0,0 +1,103 @@
+"""
+Single-transaction scoring benchmark: legacy pandas path vs the float32 fast path.
+
+Run from backend/:
+    python -m benchmarks.bench_scoring [--iterations 2000]
+"""
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.fraud import model
+
+
+def legacy_predict(transaction_data: dict):
+    """The original predict_fraud: one-row DataFrame, predict_proba, SHAP, df.iloc."""
+    df = pd.DataFrame([transaction_data])
+    prob = model.model.predict_proba(df)[0][1]
+    shap_values = model.explainer.shap_values(df)
+    sv = shap_values[1][0] if isinstance(shap_values, list) else shap_values[0]
+    explanations = [
+        {"feature": name, "value": float(val), "contribution": float(contrib)}
+        for name, contrib, val in zip(transaction_data.keys(), sv, df.iloc[0])
+    ]
+    explanations.sort(key=lambda x: abs(x["contribution"]), reverse=True)
+    return float(prob), bool(prob > 0.5), explanations
+
+
+def legacy_predict_only(transaction_data: dict):
+    df = pd.DataFrame([transaction_data])
+    return float(model.model.predict_proba(df)[0][1])
+
+
+def fast_predict_only(transaction_data: dict):
+    return float(model.booster.inplace_predict(model.encode_features(transaction_data))[0])
+
+
+def random_transaction(rng: random.Random) -> dict:
+    return {
+        "amount": round(rng.uniform(5, 5000), 2),
+        "user_age_days": rng.randint(1, 3650),
+        "device_trust_score": round(rng.uniform(0.01, 1.0), 4),
+        "velocity_1h": rng.randint(0, 15),
+        "distance_from_home": round(rng.uniform(0, 2000), 2),
+    }
+
+
+def time_calls(fn, inputs):
+    timings = []
+    for tx in inputs:
+        start = time.perf_counter()
+        fn(tx)
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return {
+        "mean_us": statistics.fmean(timings),
+        "p50_us": timings[len(timings) // 2],
+        "p99_us": timings[int(len(timings) * 0.99) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    model._ensure_model()
+    rng = random.Random(args.seed)
+    inputs = [random_transaction(rng) for _ in range(args.iterations)]
+
+    # Both paths must agree before timing means anything
+    for tx in inputs[:50]:
+        old, new = legacy_predict(tx), model.predict_fraud(tx)
+        assert abs(old[0] - new[0]) < 1e-6, (old[0], new[0])
+        assert np.allclose([e["contribution"] for e in old[2]], [e["contribution"] for e in new[2]], atol=1e-5)
+
+    # Warm up
+    for tx in inputs[:100]:
+        legacy_predict(tx)
+        model.predict_fraud(tx)
+
+    cases = [
+        ("predict only / pandas", legacy_predict_only),
+        ("predict only / fast", fast_predict_only),
+        ("predict + SHAP / pandas", legacy_predict),
+        ("predict + SHAP / fast", model.predict_fraud),
+    ]
+    results = {name: time_calls(fn, inputs) for name, fn in cases}
+
+    print(f"{'case':<26}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}")
+    for name, r in results.items():
+        print(f"{name:<26}{r['mean_us']:>10.1f}{r['p50_us']:>10.1f}{r['p99_us']:>10.1f}")
+    for kind in ("predict only", "predict + SHAP"):
+        speedup = results[f"{kind} / pandas"]["mean_us"] / results[f"{kind} / fast"]["mean_us"]
+        print(f"{kind}: {speedup:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Import-time and cold-start benchmark. Every measurement runs in a fresh
+interpreter:
+  import   - `import app.main`, and which heavy modules it pulled in
+  cold     - first explained prediction with no warm-up (what the first
+             transaction paid before start-up warm-up)
+  warm     - app start-up until GET /ready is 200, then the first explained
+             prediction
+
+Run from backend/:
+    python -m benchmarks.bench_startup [--runs 3] [--backend xgboost]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ("xgboost", "shap", "pandas", "sklearn", "cv2", "pyarrow")
+
+_CHILD = r"""
+import json, sys, time
+started = time.perf_counter()
+import app.main
+out = {"import_s": time.perf_counter() - started,
+       "heavy_modules": [m for m in HEAVY if m in sys.modules]}
+from app.fraud import model
+if MODE == "cold":
+    started = time.perf_counter()
+    model.predict_fraud(dict(model.WARMUP_TRANSACTION), explain=True)
+    out["first_prediction_s"] = time.perf_counter() - started
+elif MODE == "warm":
+    from fastapi.testclient import TestClient
+    with TestClient(app.main.app) as client:
+        started = time.perf_counter()
+        while client.get("/ready").status_code != 200:
+            if time.perf_counter() - started > 120:
+                raise SystemExit(json.dumps(client.get("/ready").json()))
+            time.sleep(0.01)
+        out["time_to_ready_s"] = time.perf_counter() - started
+        started = time.perf_counter()
+        model.predict_fraud(dict(model.WARMUP_TRANSACTION), explain=True)
+        out["first_prediction_s"] = time.perf_counter() - started
+print(json.dumps(out))
+"""
+
+
+def run_child(mode: str, env: dict) -> dict:
+    code = f"HEAVY = {HEAVY_MODULES!r}\nMODE = {mode!r}\n{_CHILD}"
+    proc = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per mode (medians are reported)")
+    parser.add_argument("--backend", default=None, help="SCORING_BACKEND for the children")
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    if args.backend:
+        env["SCORING_BACKEND"] = args.backend
+
+    report = {}
+    for mode in ("import", "cold", "warm"):
+        runs = [run_child(mode, env) for _ in range(args.runs)]
+        summary = {"heavy_modules": runs[-1]["heavy_modules"]}
+        for key in runs[0]:
+            if key.endswith("_s"):
+                summary[key[:-2] + "_ms"] = round(statistics.median(r[key] for r in runs) * 1000.0, 1)
+        report[mode] = summary
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
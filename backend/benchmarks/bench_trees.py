@@ -0,0 +1,80 @@
+"""
+XGBoost booster + shap.TreeExplainer vs the NumPy tree evaluator (app.fraud.trees),
+for predict and predict + SHAP at several batch sizes.
+
+Run from backend/:
+    python -m benchmarks.bench_trees [--batch-sizes 1 64 4096] [--seconds 1.0]
+"""
+import argparse
+import time
+
+import numpy as np
+import shap
+import xgboost as xgb
+
+from app.fraud.model import MODEL_PATH
+from app.fraud.trees import TreeEnsemble
+
+
+def random_matrix(rng: np.random.Generator, n: int) -> np.ndarray:
+    return np.column_stack([
+        rng.uniform(5, 5000, n),
+        rng.integers(1, 3650, n),
+        rng.uniform(0.01, 1.0, n),
+        rng.integers(0, 15, n),
+        rng.uniform(0, 2000, n),
+    ]).astype(np.float32)
+
+
+def per_row_us(fn, X: np.ndarray, seconds: float) -> float:
+    fn(X)  # warm up
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        fn(X)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return elapsed / (calls * len(X)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 64, 4096])
+    parser.add_argument("--seconds", type=float, default=1.0, help="time budget per case")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    clf = xgb.XGBClassifier()
+    clf.load_model(MODEL_PATH)
+    booster = clf.get_booster()
+    explainer = shap.TreeExplainer(clf)
+    ensemble = TreeEnsemble.from_json(MODEL_PATH)
+    rng = np.random.default_rng(args.seed)
+
+    # Both must agree before timing means anything
+    X = random_matrix(rng, 20000)
+    X[:100, 2] = np.nan
+    prob_err = np.abs(clf.predict_proba(X)[:, 1] - ensemble.predict_proba(X)).max()
+    shap_err = np.abs(explainer.shap_values(X[:2000]) - ensemble.shap_values(X[:2000])).max()
+    assert prob_err < 1e-6, prob_err
+    assert shap_err < 1e-5, shap_err
+    print(f"max |prob diff| {prob_err:.2e}, max |SHAP diff| {shap_err:.2e}")
+
+    cases = [
+        ("predict", booster.inplace_predict, ensemble.predict_proba),
+        ("predict + SHAP",
+         lambda X: (booster.inplace_predict(X), explainer.shap_values(X)),
+         lambda X: (ensemble.predict_proba(X), ensemble.shap_values(X))),
+    ]
+    print(f"{'case':<16}{'batch':>7}{'xgboost us/row':>16}{'numpy us/row':>14}{'speedup':>9}")
+    for name, xgb_fn, np_fn in cases:
+        for batch in args.batch_sizes:
+            X = random_matrix(rng, batch)
+            slow = per_row_us(xgb_fn, X, args.seconds)
+            fast = per_row_us(np_fn, X, args.seconds)
+            print(f"{name:<16}{batch:>7}{slow:>16.2f}{fast:>14.2f}{slow / fast:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
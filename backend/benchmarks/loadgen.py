@@ -0,0 +1,262 @@
+"""
+Load generator / end-to-end benchmark.
+
+Submits transactions at a target rate (open loop: latency is measured from
+each request's scheduled send time, so a saturated server shows up as latency
+instead of a lower send rate), with Zipf-distributed user ids from
+app.fraud.simulator.TransactionGenerator. Alongside, WebSocket clients on
+/fraud/stream measure broadcast delivery and a reader pages GET /logs/ and
+polls GET /logs/analytics. Prints and saves a JSON report.
+
+Modes:
+  asgi - the app runs in this process (startup hooks included); HTTP goes
+         through httpx.ASGITransport and WebSockets through a minimal ASGI client
+  http - a running server at --url (e.g. uvicorn app.main:app)
+
+Run from backend/:
+    python -m benchmarks.loadgen [--mode asgi] [--rate 200] [--duration 10] [--out loadgen.json]
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import httpx
+import numpy as np
+
+from app.fraud.simulator import TransactionGenerator
+
+
+class ASGIWebSocket:
+    """In-process WebSocket client speaking the ASGI protocol straight to the app."""
+
+    def __init__(self, app, path: str, query_string: str = ""):
+        self._to_app: asyncio.Queue = asyncio.Queue()
+        self._from_app: asyncio.Queue = asyncio.Queue()
+        scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws",
+            "path": path, "raw_path": path.encode(), "query_string": query_string.encode(), "root_path": "",
+            "headers": [(b"host", b"loadgen")], "client": ("127.0.0.1", 0), "server": ("loadgen", 80),
+            "subprotocols": [],
+        }
+        self._task = asyncio.create_task(app(scope, self._to_app.get, self._from_app.put))
+
+    async def connect(self):
+        await self._to_app.put({"type": "websocket.connect"})
+        message = await self._from_app.get()
+        if message["type"] != "websocket.accept":
+            raise ConnectionError(f"WebSocket refused: {message}")
+        return self
+
+    async def recv(self) -> str:
+        message = await self._from_app.get()
+        if message["type"] == "websocket.close":
+            raise ConnectionError(f"WebSocket closed: {message.get('code')}")
+        return message.get("text") or message["bytes"].decode()
+
+    async def close(self):
+        await self._to_app.put({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.gather(self._task, return_exceptions=True)
+        await self._from_app.put({"type": "websocket.close", "code": 1000})  # wakes a pending recv()
+
+
+class Recorder:
+    """Latency samples (ms) and error count of one operation."""
+
+    def __init__(self):
+        self.samples: List[float] = []
+        self.errors = 0
+
+    def summary(self, seconds: float) -> dict:
+        out = {"count": len(self.samples), "errors": self.errors, "throughput_per_s": round(len(self.samples) / seconds, 1)}
+        if self.samples:
+            values = np.asarray(self.samples)
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            out["latency_ms"] = {
+                "p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3),
+                "mean": round(float(values.mean()), 3), "max": round(float(values.max()), 3),
+            }
+        return out
+
+
+def _server_time(timestamp: str) -> float:
+    """Epoch seconds of a server "...Z" timestamp."""
+    return datetime.fromisoformat(timestamp.rstrip("Z")).replace(tzinfo=timezone.utc).timestamp()
+
+
+async def submit_load(client: httpx.AsyncClient, headers: dict, generator: TransactionGenerator, rate: float,
+                      duration: float, concurrency: int, stats: Dict[str, Recorder]) -> dict:
+    recorder = stats["score"]
+    in_flight = set()
+    pending: List[dict] = []
+    skipped = 0
+
+    async def send(body: dict, scheduled: float):
+        try:
+            response = await client.post("/fraud/transactions", json=body, headers=headers)
+            if response.status_code != 200:
+                recorder.errors += 1
+                return
+        except httpx.HTTPError:
+            recorder.errors += 1
+            return
+        recorder.samples.append((time.perf_counter() - scheduled) * 1000.0)
+
+    started = time.perf_counter()
+    sent = 0
+    while True:
+        now = time.perf_counter()
+        if now - started >= duration:
+            break
+        due = int((now - started) * rate) - sent - skipped
+        for _ in range(due):
+            scheduled = started + (sent + skipped + 1) / rate
+            if len(in_flight) >= concurrency:
+                skipped += 1  # the client can't keep up; counted, not queued
+                continue
+            if not pending:
+                pending = generator.transactions(1024)
+            task = asyncio.create_task(send(pending.pop(), scheduled))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            sent += 1
+        await asyncio.sleep(0.002)
+    if in_flight:
+        await asyncio.wait(in_flight)
+    return {"sent": sent, "skipped_over_concurrency": skipped, "elapsed_s": round(time.perf_counter() - started, 3)}
+
+
+async def listen(ws, recorder: Recorder, stop: asyncio.Event):
+    """Broadcast delivery: receive time minus the server timestamp of each transaction event."""
+    while not stop.is_set():
+        try:
+            text = await ws.recv()
+        except Exception:
+            return
+        received = time.time()
+        message = json.loads(text)
+        events = message["events"] if message.get("action") == "batch" else [message]
+        for event in events:
+            if "risk_score" in event:
+                recorder.samples.append((received - _server_time(event["timestamp"])) * 1000.0)
+
+
+async def read_load(client: httpx.AsyncClient, headers: dict, rate: float, pages: int,
+                    stop: asyncio.Event, stats: Dict[str, Recorder]):
+    """Every 1/rate seconds: `pages` pages of GET /logs/ (following next_cursor) and one GET /logs/analytics."""
+    async def timed(name: str, url: str, params: dict = None):
+        started = time.perf_counter()
+        try:
+            response = await client.get(url, params=params, headers=headers)
+        except httpx.HTTPError:
+            stats[name].errors += 1
+            return None
+        if response.status_code != 200:
+            stats[name].errors += 1
+            return None
+        stats[name].samples.append((time.perf_counter() - started) * 1000.0)
+        return response.json()
+
+    while not stop.is_set():
+        cursor = None
+        for _ in range(pages):
+            params = {"limit": 50, **({"before": cursor} if cursor else {})}
+            page = await timed("logs_page", "/logs/", params)
+            cursor = page and page.get("next_cursor")
+            if not cursor:
+                break
+        await timed("analytics", "/logs/analytics")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=1.0 / rate)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run(args) -> dict:
+    if args.mode == "asgi":
+        from app.main import app
+        await app.router.startup()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadgen", timeout=60.0)
+        ws_connect = lambda token: ASGIWebSocket(app, "/fraud/stream", f"token={token}").connect()
+    else:
+        import websockets
+        app = None
+        client = httpx.AsyncClient(base_url=args.url, timeout=60.0, limits=httpx.Limits(max_connections=args.concurrency))
+        ws_url = args.url.replace("http", "ws", 1) + "/fraud/stream"
+        ws_connect = lambda token: websockets.connect(f"{ws_url}?token={token}", max_size=None)
+
+    try:
+        # Wait for start-up warm-up so it isn't measured
+        deadline = time.perf_counter() + 120
+        while True:
+            try:
+                if (await client.get("/ready")).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass  # server still starting
+            if time.perf_counter() > deadline:
+                raise RuntimeError("server never became ready")
+            await asyncio.sleep(0.1)
+        login = await client.post("/auth/login", data={"username": args.username, "password": args.password})
+        login.raise_for_status()
+        token = login.json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        stats = {name: Recorder() for name in ("score", "broadcast", "logs_page", "analytics")}
+        generator = TransactionGenerator(users=args.users, zipf_s=args.zipf, seed=args.seed)
+        stop = asyncio.Event()
+        sockets = [await ws_connect(token) for _ in range(args.ws_clients)]
+        background = [asyncio.create_task(listen(ws, stats["broadcast"], stop)) for ws in sockets]
+        if args.read_rate > 0:
+            background.append(asyncio.create_task(read_load(client, headers, args.read_rate, args.pages, stop, stats)))
+
+        load = await submit_load(client, headers, generator, args.rate, args.duration, args.concurrency, stats)
+        await asyncio.sleep(0.5)  # let the last broadcasts arrive
+        stop.set()
+        for ws in sockets:
+            await ws.close()
+        await asyncio.gather(*background, return_exceptions=True)
+
+        engine = (await client.get("/fraud/engine/stats", headers=headers)).json()
+        seconds = load["elapsed_s"]
+        return {
+            "config": {k: v for k, v in vars(args).items() if k not in ("password", "out")},
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "load": {**load, "target_rate": args.rate, "achieved_rate": round(len(stats["score"].samples) / seconds, 1)},
+            **{name: recorder.summary(seconds) for name, recorder in stats.items()},
+            "server_engine": {k: engine.get(k) for k in ("batch_size", "batch_latency_ms", "queue_wait_ms")},
+        }
+    finally:
+        await client.aclose()
+        if app is not None:
+            await app.router.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("asgi", "http"), default="asgi")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="server for --mode http")
+    parser.add_argument("--rate", type=float, default=200.0, help="target transactions per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    parser.add_argument("--concurrency", type=int, default=256, help="max requests in flight")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of user ids (0 = uniform)")
+    parser.add_argument("--ws-clients", type=int, default=1)
+    parser.add_argument("--read-rate", type=float, default=5.0, help="log-pagination + analytics rounds per second")
+    parser.add_argument("--pages", type=int, default=3, help="GET /logs/ pages per round")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--out", default="loadgen.json", help="JSON report path")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    with open(args.out, "w") as fp:
+        json.dump(report, fp, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
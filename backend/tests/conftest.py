@@ -0,0 +1,23 @@
+import pytest
+
+from app.auth.jwt_handler import create_access_token
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """The app with its start-up / shutdown hooks, writing its ledger and archive under tmp_path."""
+    from fastapi.testclient import TestClient
+
+    from app.archive import transaction_archive
+    from app.dao.ledger import ledger
+    from app.main import app
+
+    monkeypatch.setattr(ledger, "path", str(tmp_path / "did_ledger.jsonl"))
+    monkeypatch.setattr(ledger, "index_path", str(tmp_path / "did_ledger.jsonl.idx"))
+    monkeypatch.setattr(transaction_archive, "directory", str(tmp_path / "archive"))
+    with TestClient(app) as client:
+        yield client
+
+
+def auth_headers(username: str = "analyst", role: str = "analyst") -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': username, 'role': role})}"}
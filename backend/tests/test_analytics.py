@@ -0,0 +1,71 @@
+import asyncio
+import random
+import time
+
+import pytest
+
+from app.analytics import RISK_BINS, RunningStats, format_us, risk_bin, risk_percentiles, to_us
+from app.store import MemoryEventStore
+
+
+def reference(events: list) -> dict:
+    histogram = [0] * RISK_BINS
+    for e in events:
+        histogram[risk_bin(e["risk_score"])] += 1
+    return {
+        "count": len(events),
+        "fraud_count": sum(e["is_fraud"] for e in events),
+        "risk_mean": round(sum(e["risk_score"] for e in events) / len(events), 4) if events else 0,
+        "risk_histogram": histogram,
+    }
+
+
+def test_store_totals_follow_inserts_evictions_and_deletes():
+    rng = random.Random(8)
+
+    async def scenario():
+        store = MemoryEventStore("analytics", 50)
+        for i in range(300):
+            await store.add({"id": f"E{i}", "risk_score": rng.random(), "is_fraud": rng.random() < 0.3})
+            if rng.random() < 0.2:
+                victim = rng.choice([e["id"] async for e in store.iter_newest()])
+                await store.delete(victim)
+            if i % 25 == 0:
+                # Re-adding an id replaces its previous totals
+                await store.add({"id": f"E{i}", "risk_score": 0.99, "is_fraud": True})
+
+        stats = await store.stats()
+        retained = [e async for e in store.iter_newest()]
+        assert {key: stats[key] for key in reference(retained)} == reference(retained)
+
+    asyncio.run(scenario())
+
+
+def test_windows_count_events_by_timestamp():
+    now = time.time()
+    stats = RunningStats()
+    for age, fraud in ((10, True), (90, False), (200, True), (1800, False), (7200, True)):
+        stats.add({"timestamp": format_us(to_us(now - age)), "risk_score": 0.5, "is_fraud": fraud})
+    windows = stats.snapshot()["windows"]
+    # Buckets are span / WINDOW_BUCKETS wide, so a window may reach one bucket further back
+    assert windows["1m"]["count"] == 1 and windows["1m"]["fraud_count"] == 1
+    assert windows["5m"]["count"] == 3 and windows["5m"]["fraud_rate"] == pytest.approx(2 / 3, abs=1e-4)
+    assert windows["1h"]["count"] == 4
+    assert stats.snapshot()["count"] == 5
+
+    # An eviction keeps the event in the windows; a delete takes it out
+    event = {"timestamp": format_us(to_us(now - 10)), "risk_score": 0.5, "is_fraud": True}
+    stats.add(event)
+    stats.remove(event, evicted=True)
+    assert stats.snapshot()["windows"]["1m"]["count"] == 2
+    stats.remove({"timestamp": format_us(to_us(now - 10)), "risk_score": 0.5, "is_fraud": True})
+    assert stats.snapshot()["windows"]["1m"]["count"] == 1
+
+
+def test_percentiles_interpolate_inside_bins():
+    histogram = [0] * RISK_BINS
+    histogram[0] = histogram[RISK_BINS - 1] = 50
+    percentiles = risk_percentiles(histogram)
+    assert percentiles["p50"] == pytest.approx(1 / RISK_BINS)
+    assert percentiles["p99"] == pytest.approx((RISK_BINS - 1 + 49 / 50) / RISK_BINS)
+    assert risk_percentiles([0] * RISK_BINS) == {"p50": 0.0, "p90": 0.0, "p99": 0.0}
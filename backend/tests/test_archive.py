@@ -0,0 +1,136 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from app.analytics import event_time
+from app.archive import Segment, TransactionArchive, _writer_alive
+from app.fraud.model import FEATURE_NAMES
+from app.store import event_key, stamp
+
+
+def make_events(start: int, count: int) -> list:
+    events = []
+    for i in range(start, start + count):
+        event = {
+            "id": f"T{i:05d}",
+            "user_id": f"u{i % 5}",
+            "features": {name: float(i) for name in FEATURE_NAMES},
+            "risk_score": (i % 10) / 10,
+            "is_fraud": i % 10 == 9,
+        }
+        stamp(event)
+        events.append(event)
+    return events
+
+
+async def cursor_pages(archive: TransactionArchive, size: int, since=None, until=None) -> list:
+    seen, cursor = [], None
+    while True:
+        page = []
+        async for event in archive.aiter_newest(since, until, cursor):
+            page.append(event)
+            if len(page) == size:
+                break
+        if not page:
+            return seen
+        seen.extend(page)
+        cursor = event_key(page[-1])
+
+
+def test_pages_across_disk_sealed_and_pending_rows(tmp_path):
+    directory = str(tmp_path)
+    first = make_events(0, 250)
+    archive = TransactionArchive(directory, 100, FEATURE_NAMES)
+    archive.open()
+    for event in first:
+        archive.append(event)
+    asyncio.run(archive.close())
+
+    # Reopened: three segments on disk (100 + 100 + 50 rows)
+    archive = TransactionArchive(directory, 100, FEATURE_NAMES)
+    archive.open()
+    assert archive.stats()["segments"] == 3
+
+    # Two full segments held at the writer, 30 rows still pending
+    gate = threading.Event()
+    write = archive._write
+    archive._write = lambda buffer, path: (gate.wait(), write(buffer, path))
+    second = make_events(250, 230)
+    for event in second:
+        archive.append(event)
+    assert archive.stats()["segments_writing"] == 2
+    assert archive.stats()["pending_rows"] == 30
+
+    reference = [event["id"] for event in reversed(first + second)]
+    assert archive.count() == len(reference)
+    assert [e["id"] for e in archive.iter_newest()] == reference
+    assert [e["id"] for e in asyncio.run(cursor_pages(archive, 37))] == reference
+
+    # Inclusive time range straddling all three kinds of rows
+    ordered = first + second
+    since, until = event_time(ordered[180]), event_time(ordered[470])
+    in_range = [e["id"] for e in reversed(ordered[180:471])]
+    assert [e["id"] for e in asyncio.run(cursor_pages(archive, 50, since, until))] == in_range
+    assert archive.analytics(since, until)["count"] == len(in_range)
+
+    archived = next(archive.iter_newest())
+    assert archived["archived"] and archived["explanations"] is None
+    assert archived["timestamp"] == second[-1]["timestamp"]
+
+    gate.set()
+    asyncio.run(archive.close())
+    assert archive.stats()["segments"] == 6
+    assert [e["id"] for e in archive.iter_newest()] == reference
+    assert archive.count() == len(reference)
+
+
+def test_refresh_maps_segments_written_by_other_workers(tmp_path):
+    directory = str(tmp_path)
+    archive = TransactionArchive(directory, 100, FEATURE_NAMES, refresh_s=0.0)
+    archive.open()
+    for event in make_events(0, 100):
+        archive.append(event)
+    asyncio.run(archive.close())
+
+    # Another worker's segment, written after this one opened the directory
+    other = make_events(100, 40)
+    Segment.build(other, FEATURE_NAMES).save(os.path.join(directory, f"seg-{time.time_ns() // 1_000_000:013d}-{os.getpid() + 1}-0abc1234"))
+    assert archive.count() == 100
+
+    assert archive.analytics()["count"] == 140
+    assert archive.stats()["segments"] == 2 and archive.count() == 140
+    # Mapped once
+    archive.refresh()
+    assert [e["id"] for e in archive.iter_newest()] == [e["id"] for e in reversed(make_events(0, 140))]
+
+
+def test_refresh_is_throttled(tmp_path):
+    archive = TransactionArchive(str(tmp_path), 100, FEATURE_NAMES, refresh_s=3600)
+    archive.open()
+    Segment.build(make_events(0, 10), FEATURE_NAMES).save(str(tmp_path / f"seg-0000000000001-{os.getpid() + 1}-0abc1234"))
+    archive.refresh()
+    assert archive.count() == 0
+
+
+def test_leftovers_of_dead_writers_are_removed(tmp_path):
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        dead_pid = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead_pid.wait()
+        assert _writer_alive(f"seg-0000000000001-{child.pid}-0abc1234.tmp")
+        assert not _writer_alive(f"seg-0000000000001-{dead_pid.pid}-0abc1234.tmp")
+        assert not _writer_alive(f"seg-0000000000001-{os.getpid()}-0abc1234.tmp")
+        assert not _writer_alive("seg-garbage.tmp")
+
+        for pid in (child.pid, dead_pid.pid):
+            leftover = tmp_path / f"seg-0000000000001-{pid}-0abc1234.tmp"
+            leftover.mkdir()
+            (leftover / "ts_us.npy").write_bytes(b"")
+        TransactionArchive(str(tmp_path), 100, FEATURE_NAMES).open()
+        assert sorted(p.name for p in tmp_path.iterdir()) == [f"seg-0000000000001-{child.pid}-0abc1234.tmp"]
+    finally:
+        child.kill()
+        child.wait()
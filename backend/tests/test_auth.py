@@ -0,0 +1,92 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.auth.jwt_handler import TokenCache, create_access_token, token_cache
+from app.config import settings
+from tests.conftest import auth_headers
+
+
+def test_valid_tokens_are_verified_once():
+    cache = TokenCache(max_size=2)
+    token = create_access_token({"sub": "ana", "role": "analyst"})
+    assert cache.authenticate(token).username == "ana"
+    assert cache.authenticate(token).role == "analyst"
+    assert (cache.misses, cache.hits) == (1, 1)
+
+
+def test_invalid_tokens_are_never_cached():
+    cache = TokenCache(max_size=2)
+    forged = create_access_token({"sub": "ana", "role": "admin"})[:-2] + "xx"
+    no_role = create_access_token({"sub": "ana"})
+    for token in (forged, forged, no_role, "not-a-jwt"):
+        assert cache.authenticate(token) is None
+    assert cache.rejected == 4 and cache.stats()["entries"] == 0
+
+
+def test_expired_tokens_are_rejected():
+    cache = TokenCache(max_size=2)
+    assert cache.authenticate(create_access_token({"sub": "ana", "role": "analyst"}, timedelta(seconds=-1))) is None
+
+
+def test_least_recently_used_tokens_are_evicted():
+    cache = TokenCache(max_size=2)
+    tokens = [create_access_token({"sub": f"user{i}", "role": "analyst"}) for i in range(3)]
+    for token in tokens:
+        cache.authenticate(token)
+    assert cache.stats()["entries"] == 2
+    cache.authenticate(tokens[0])
+    assert cache.misses == 4
+
+
+def test_revoked_tokens_are_rejected():
+    cache = TokenCache(max_size=2)
+    token = create_access_token({"sub": "ana", "role": "analyst"})
+    cache.authenticate(token)
+    asyncio.run(cache.revoke(token))
+    assert cache.authenticate(token) is None
+    assert cache.stats()["revoked"] == 1 and cache.stats()["entries"] == 0
+
+
+def test_redis_revocations_reach_other_workers(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    from app import db
+
+    monkeypatch.setattr(settings, "STORE_BACKEND", "redis")
+    token = create_access_token({"sub": "ana", "role": "analyst"})
+    worker, other_worker = TokenCache(max_size=2), TokenCache(max_size=2)
+
+    async def scenario():
+        db.redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        try:
+            assert (await other_worker.verify(token)).username == "ana"
+            await worker.revoke(token)
+            assert await other_worker.verify(token) is None
+            # Expires in Redis together with the token
+            ttl = await db.redis_client.ttl(worker._redis_key(worker._digest(token)))
+            assert 0 < ttl <= settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60 + 1
+        finally:
+            await db.redis_client.aclose()
+            db.redis_client = None
+
+    asyncio.run(scenario())
+
+
+def test_logout_revokes_the_token(client):
+    headers = auth_headers("logout-user")
+    assert client.get("/auth/me", headers=headers).status_code == 200
+    assert client.post("/auth/logout", headers=headers).status_code == 200
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+
+def test_stream_refuses_connections_without_a_valid_token(client):
+    for query in ("", "?token=garbage"):
+        with pytest.raises(WebSocketDisconnect) as refused:
+            with client.websocket_connect(f"/fraud/stream{query}"):
+                pass
+        assert refused.value.code == 1008
+    token = auth_headers("streamer")["Authorization"].split()[1]
+    with client.websocket_connect(f"/fraud/stream?token={token}"):
+        pass
@@ -0,0 +1,91 @@
+import io
+import json
+
+import pytest
+
+from app.config import settings
+from app.fraud.model import FEATURE_NAMES
+from conftest import auth_headers
+
+FEATURES = {"amount": 80.0, "user_age_days": 200, "device_trust_score": 0.7, "velocity_1h": 2, "distance_from_home": 15.0}
+
+
+def lines(response) -> list:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def post_bulk(client, body: bytes, content_type: str, query: str = ""):
+    headers = {**auth_headers(), "Content-Type": content_type}
+    return client.post(f"/fraud/transactions/bulk{query}", content=body, headers=headers)
+
+
+def test_ndjson_scores_valid_lines_and_reports_bad_ones(client):
+    rows = [
+        {"user_id": "u1", "features": FEATURES, "id": "ext-1", "timestamp": "2024-05-01T12:00:00+02:00"},
+        {"user_id": "u2", "features": dict(FEATURES, amount=None)},
+        "not json",
+        {"user_id": "u3", "features": FEATURES, "id": ""},
+        {"user_id": "u4", "features": FEATURES},
+    ]
+    body = "\n".join(r if isinstance(r, str) else json.dumps(r) for r in rows).encode()
+    out = lines(post_bulk(client, body, "application/x-ndjson", "?store=true"))
+
+    scored = [line for line in out if "risk_score" in line]
+    assert [line["line"] for line in out if line.get("type") == "error"] == [2, 3, 4]
+    assert out[-1] == {"type": "summary", "scored": 2, "flagged": sum(t["is_fraud"] for t in scored), "errors": 3}
+    # Ids are the server's; the caller's id and time are kept alongside
+    assert all(t["id"].startswith("TXN-") and len(t["id"]) == 20 for t in scored)
+    assert scored[0]["external_id"] == "ext-1"
+    assert scored[0]["occurred_at"] == "2024-05-01T10:00:00.000000Z"
+
+    stored = client.get("/fraud/transactions?limit=5", headers=auth_headers()).json()["transactions"]
+    assert [t["id"] for t in stored[:2]] == [scored[1]["id"], scored[0]["id"]]
+
+
+def test_arrow_rows_are_validated_one_by_one(client):
+    pa = pytest.importorskip("pyarrow")
+    table = pa.table({
+        "user_id": ["u1", "u2", "u3"],
+        **{name: [FEATURES[name], None, FEATURES[name]] for name in FEATURE_NAMES},
+        "id": ["a", "b", "c" * 200],
+    })
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    out = lines(post_bulk(client, sink.getvalue(), "application/vnd.apache.arrow.stream"))
+
+    assert [line["row"] for line in out if line.get("type") == "error"] == [2, 3]
+    scored = [line for line in out if "risk_score" in line]
+    assert [t["external_id"] for t in scored] == ["a"]
+    assert scored[0]["features"] == FEATURES
+    assert out[-1]["scored"] == 1 and out[-1]["errors"] == 2
+
+
+def test_arrow_non_numeric_column_fails_rows_not_the_stream(client):
+    pa = pytest.importorskip("pyarrow")
+    columns = {"user_id": ["u1", "u2"], **{name: [FEATURES[name]] * 2 for name in FEATURE_NAMES}}
+    columns["amount"] = ["12.5", "lots"]
+    table = pa.table(columns)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    out = lines(post_bulk(client, sink.getvalue(), "application/vnd.apache.arrow.stream"))
+
+    assert [line["row"] for line in out if line.get("type") == "error"] == [2]
+    assert out[-1]["scored"] == 1 and out[-1]["errors"] == 1
+
+
+def test_rejects_bodies_over_the_size_limit(client, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_MAX_BYTES", 100)
+    body = "\n".join(json.dumps({"user_id": f"u{i}", "features": FEATURES}) for i in range(5)).encode()
+    assert post_bulk(client, body, "application/x-ndjson").status_code == 413
+
+    def chunked():
+        yield body  # no Content-Length: counted while it is received
+
+    headers = {**auth_headers(), "Content-Type": "application/x-ndjson"}
+    assert client.post("/fraud/transactions/bulk", content=chunked(), headers=headers).status_code == 413
+
+
+def test_rejects_unknown_content_type(client):
+    assert post_bulk(client, b"a,b\n", "text/csv").status_code == 415
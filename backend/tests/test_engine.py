@@ -0,0 +1,57 @@
+import asyncio
+
+from app.fraud import engine as engine_module
+from app.fraud.engine import ScoringEngine
+
+
+def fake_scoring(calls):
+    async def run_scoring(fn, features, explain):
+        calls.append(len(features))
+        if any(f.get("fail") for f in features):
+            raise ValueError("model failed")
+        return [(f["amount"] / 100, f["amount"] > 50, [] if e else None) for f, e in zip(features, explain)]
+    return run_scoring
+
+
+def test_flushes_full_batches_and_routes_results(monkeypatch):
+    calls = []
+    monkeypatch.setattr(engine_module, "run_scoring", fake_scoring(calls))
+
+    async def scenario():
+        engine = ScoringEngine(max_batch_size=4, max_wait_ms=1000)
+        results = await asyncio.gather(*(engine.score({"amount": i}, explain=i == 3) for i in range(10)))
+        return engine, results
+
+    engine, results = asyncio.run(scenario())
+    # Two full batches right away; the last two wait for the deadline
+    assert calls == [4, 4, 2]
+    assert [score for score, _, _ in results] == [i / 100 for i in range(10)]
+    assert [explanations for _, _, explanations in results].count([]) == 1
+    assert engine.stats()["batch_size"]["count"] == 3
+    assert engine.stats()["pending"] == 0
+
+
+def test_deadline_flushes_a_partial_batch(monkeypatch):
+    calls = []
+    monkeypatch.setattr(engine_module, "run_scoring", fake_scoring(calls))
+
+    async def scenario():
+        engine = ScoringEngine(max_batch_size=64, max_wait_ms=5)
+        return await asyncio.wait_for(engine.score({"amount": 70}), timeout=1)
+
+    assert asyncio.run(scenario()) == (0.7, True, None)
+    assert calls == [1]
+
+
+def test_model_errors_reach_every_caller_in_the_batch(monkeypatch):
+    monkeypatch.setattr(engine_module, "run_scoring", fake_scoring([]))
+
+    async def scenario():
+        engine = ScoringEngine(max_batch_size=3, max_wait_ms=1000)
+        return await asyncio.gather(
+            engine.score({"amount": 1}), engine.score({"amount": 2, "fail": True}), engine.score({"amount": 3}),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+import pytest
+
+from app import metrics
+from app.config import settings
+from app.fraud import executor, model
+
+
+@pytest.fixture
+def scoring_mode(monkeypatch):
+    def use(mode: str, workers: int = 1):
+        monkeypatch.setattr(settings, "SCORING_EXECUTOR", mode)
+        monkeypatch.setattr(settings, "SCORING_WORKERS", workers)
+    yield use
+    executor.shutdown_executor()
+
+
+def test_inline_runs_on_the_event_loop_thread(scoring_mode):
+    scoring_mode("inline")
+
+    async def scenario():
+        return await executor.run_scoring(threading.get_ident)
+
+    assert executor.start_executor() is None
+    assert asyncio.run(scenario()) == threading.get_ident()
+
+
+def test_thread_mode_runs_off_the_event_loop(scoring_mode):
+    scoring_mode("thread", workers=2)
+
+    async def scenario():
+        return await executor.run_scoring(lambda: threading.current_thread().name)
+
+    assert asyncio.run(scenario()).startswith("scoring")
+
+
+def test_rejects_unknown_mode(scoring_mode):
+    scoring_mode("gpu")
+    with pytest.raises(ValueError):
+        executor.start_executor()
+
+
+def test_worker_refuses_a_model_file_that_changed():
+    with pytest.raises(RuntimeError, match="sha256"):
+        executor._init_worker(model.MODEL_PATH, sha256="0" * 64)
+
+
+def test_process_pool_scores_like_the_parent(scoring_mode, monkeypatch):
+    pytest.importorskip("xgboost")
+    scoring_mode("process")
+    batch = [dict(model.WARMUP_TRANSACTION, amount=amount) for amount in (5.0, 120.0, 9000.0)]
+
+    async def scenario():
+        return await executor.run_scoring(model.predict_fraud_batch, batch, [True, False, False])
+
+    monkeypatch.setattr(metrics.state, "enabled", True)
+    timed = metrics.SPANS.labels("predict.model").count
+    remote = asyncio.run(scenario())
+    # The worker's spans are merged into this process' /metrics
+    assert metrics.SPANS.labels("predict.model").count > timed
+    local = model.predict_fraud_batch(batch, [True, False, False])
+    assert [score for score, _, _ in remote] == pytest.approx([score for score, _, _ in local], abs=1e-6)
+    assert remote[0][2] is not None
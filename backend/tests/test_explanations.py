@@ -0,0 +1,22 @@
+from conftest import auth_headers
+
+LOW_RISK = {"amount": 12.5, "user_age_days": 900, "device_trust_score": 0.95, "velocity_1h": 0, "distance_from_home": 2.0}
+
+
+def test_explanations_are_computed_on_demand(client):
+    headers = auth_headers()
+    body = {"user_id": "u-lazy", "features": LOW_RISK}
+    tx = client.post("/fraud/transactions", json=body, headers=headers).json()["transaction"]
+    assert not tx["is_fraud"] and tx["explanations"] is None
+
+    response = client.get(f"/fraud/transactions/{tx['id']}/explanations", headers=headers)
+    assert response.status_code == 200
+    explanations = response.json()["explanations"]
+    assert len(explanations) == len(LOW_RISK)
+    # Stored with the transaction for the next request
+    assert client.get(f"/fraud/transactions/{tx['id']}/explanations", headers=headers).json()["explanations"] == explanations
+
+    eager = client.post("/fraud/transactions?explain=true", json=body, headers=headers).json()["transaction"]
+    assert eager["explanations"] is not None
+
+    assert client.get("/fraud/transactions/TXN-missing/explanations", headers=headers).status_code == 404
@@ -0,0 +1,66 @@
+import threading
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from app.dao import face_detect  # noqa: E402
+from app.dao.face_detect import decode_image, extract_face, get_face_cascade, image_size  # noqa: E402
+
+
+def encode(width: int, height: int, ext: str = ".jpg") -> bytes:
+    img = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    return cv2.imencode(ext, img)[1].tobytes()
+
+
+def test_cascade_is_parsed_once_per_thread():
+    assert get_face_cascade() is get_face_cascade()
+    other = []
+    thread = threading.Thread(target=lambda: other.append(get_face_cascade()))
+    thread.start()
+    thread.join()
+    assert other[0] is not get_face_cascade()
+
+
+def test_image_size_reads_headers_without_decoding():
+    assert image_size(encode(321, 123)) == (321, 123)
+    assert image_size(encode(50, 70, ".png")) == (50, 70)
+    assert image_size(b"not an image") is None
+
+
+def test_large_jpegs_are_decoded_reduced():
+    img, reduction = decode_image(encode(3000, 2000), max_dim=640)
+    assert reduction == 4 and img.shape[:2] == (500, 750)
+    img, reduction = decode_image(encode(1400, 900), max_dim=640)
+    assert reduction == 2 and img.shape[:2] == (450, 700)
+    img, reduction = decode_image(encode(800, 600), max_dim=640)
+    assert reduction == 1 and img.shape[:2] == (600, 800)
+    assert decode_image(b"garbage", 640) == (None, 1)
+
+
+def test_detected_box_is_mapped_back_to_original_pixels(monkeypatch):
+    seen = {}
+
+    class Detector:
+        def detectMultiScale(self, gray, **kwargs):
+            seen["shape"] = gray.shape
+            return np.array([[10, 20, 40, 40], [100, 100, 80, 60]])  # the larger one wins
+
+    monkeypatch.setattr(face_detect, "get_face_cascade", lambda: Detector())
+    monkeypatch.setattr(face_detect.settings, "FACE_DETECT_MAX_DIM", 640)
+    timings = {}
+    roi, error, box = extract_face(encode(3200, 1600), timings)
+
+    # Decoded at 1/4 (800x400), detected at 640x320: 1.25x, then 4x back to the original
+    assert error is None and seen["shape"] == (320, 640)
+    assert box == (500, 500, 400, 300)
+    assert roi.shape == (200, 200, 3)
+    assert set(timings) == {"decode", "detect", "crop"}
+
+
+def test_images_without_faces_are_reported():
+    roi, error, box = extract_face(np.full((400, 400, 3), 255, np.uint8).tobytes())
+    assert (roi, error, box) == (None, "Failed to decode image", None)
+    blank = cv2.imencode(".png", np.full((400, 400, 3), 255, np.uint8))[1].tobytes()
+    assert extract_face(blank)[1] == "No face detected"
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from app.dao.face_index import FaceIndex, face_descriptor
+
+
+def unit_vectors(rng: np.random.Generator, n: int, dim: int = 32) -> np.ndarray:
+    vectors = rng.random((n, dim), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_exact_search_matches_brute_force():
+    rng = np.random.default_rng(11)
+    vectors = unit_vectors(rng, 3000)  # grows past the initial capacity
+    index = FaceIndex(dim=32, exact_max=10_000)
+    for i, vector in enumerate(vectors):
+        index.add(vector, {"name": f"n{i}"})
+
+    query = unit_vectors(rng, 1)[0]
+    expected = np.argsort(vectors @ query)[::-1][:5]
+    found = index.search(query, k=5)
+    assert [match["name"] for match in found] == [f"n{i}" for i in expected]
+    assert found[0]["similarity"] == pytest.approx(float(vectors[expected[0]] @ query), abs=1e-4)
+    assert index.stats()["mode"] == "exact"
+    assert FaceIndex(dim=32).search(query) == []
+
+
+def test_ivf_mode_still_finds_enrolled_faces():
+    rng = np.random.default_rng(12)
+    centers = unit_vectors(rng, 20)
+    # Clustered descriptors, like several photos of each face
+    vectors = centers[rng.integers(0, 20, 2000)] + rng.normal(0, 0.02, (2000, 32)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index = FaceIndex(dim=32, exact_max=500, nprobe=4)
+    for i, vector in enumerate(vectors):
+        index.add(vector, {"name": f"n{i}"})
+
+    stats = index.stats()
+    assert stats["mode"] == "ivf" and stats["entries"] == 2000 and stats["trained_at"] >= 1000
+    for i in rng.choice(2000, 50, replace=False):
+        best = index.search(vectors[i], k=1)[0]
+        assert best["similarity"] == pytest.approx(1.0, abs=1e-4)
+
+
+def test_descriptor_dot_product_is_the_bhattacharyya_coefficient():
+    cv2 = pytest.importorskip("cv2")
+    rng = np.random.default_rng(13)
+    a = rng.integers(0, 255, (200, 200, 3), dtype=np.uint8)
+    b = rng.integers(0, 128, (200, 200, 3), dtype=np.uint8)
+    da, db = face_descriptor(a), face_descriptor(b)
+    assert da.dtype == np.float32 and np.linalg.norm(da) == pytest.approx(1.0, abs=1e-5)
+    assert float(da @ da) == pytest.approx(1.0, abs=1e-5)
+
+    def hist(img):
+        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        h = cv2.calcHist([hsv], [0, 1], None, [16, 16], [0, 180, 0, 256]).ravel()
+        return h / h.sum()
+
+    assert float(da @ db) == pytest.approx(float(np.sum(np.sqrt(hist(a) * hist(b)))), abs=1e-4)
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.fraud.feature_store import MemoryFeatureStore, RedisFeatureStore, enrich_features
+
+T0 = 1_700_000_000.0
+
+
+def test_windows_report_activity_before_each_transaction():
+    store = MemoryFeatureStore(max_users=100, ttl=86400)
+    assert store.observe_sync("u", 10.0, "phone", ts=T0)["tx_count_1h"] == 0
+    store.observe_sync("u", 20.0, "laptop", ts=T0 + 60)
+    features = store.observe_sync("u", 5.0, "phone", ts=T0 + 120)
+    assert features == {
+        "tx_count_1h": 2, "amount_sum_1h": 30.0, "distinct_devices_1h": 2,
+        "tx_count_24h": 2, "amount_sum_24h": 30.0, "distinct_devices_24h": 2,
+    }
+
+    # Two hours on: the 1h window has rotated out, the 24h one has not
+    later = store.observe_sync("u", 1.0, ts=T0 + 7200)
+    assert later["tx_count_1h"] == 0 and later["distinct_devices_1h"] == 0
+    assert later["tx_count_24h"] == 3 and later["amount_sum_24h"] == 35.0
+    assert store.observe_sync("other", 1.0, ts=T0 + 7200)["tx_count_24h"] == 0
+
+
+def test_idle_and_least_recent_users_are_evicted():
+    store = MemoryFeatureStore(max_users=2, ttl=3600)
+    store.observe_sync("a", 1.0, ts=T0)
+    store.observe_sync("b", 1.0, ts=T0 + 10)
+    store.observe_sync("a", 1.0, ts=T0 + 20)
+    store.observe_sync("c", 1.0, ts=T0 + 30)  # full: b was seen least recently
+    assert store.observe_sync("a", 1.0, ts=T0 + 40)["tx_count_1h"] == 2
+    assert store.observe_sync("b", 1.0, ts=T0 + 50)["tx_count_1h"] == 0
+
+    store.observe_sync("d", 1.0, ts=T0 + 4000)  # everyone else idle past the ttl
+    stats = asyncio.run(store.stats())
+    assert stats["users"] == 1 and stats["evicted_lru"] == 2 and stats["evicted_ttl"] == 2
+    assert stats["allocated_rows"] == 2  # rows are recycled
+
+
+def test_velocity_source():
+    features = {"amount": 1.0, "velocity_1h": 3}
+    behavior = {"tx_count_1h": 5}
+    assert enrich_features(features, behavior, "client") is features
+    assert enrich_features(features, behavior, "server")["velocity_1h"] == 5
+    assert enrich_features(features, {"tx_count_1h": 1}, "max")["velocity_1h"] == 3
+    assert settings.FEATURE_STORE_VELOCITY == "client"  # opt-in only
+
+
+def test_redis_store_matches_memory_store():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    from app import db
+
+    async def scenario():
+        db.redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        try:
+            memory, redis = MemoryFeatureStore(100, 86400), RedisFeatureStore(100, 86400)
+            steps = [("u", 10.0, "phone", 0), ("u", 20.0, "laptop", 60), ("v", 3.0, None, 90),
+                     ("u", 5.0, "phone", 1800), ("u", 7.5, "tablet", 5400), ("u", 1.0, None, 5460)]
+            for user, amount, device, offset in steps:
+                expected = memory.observe_sync(user, amount, device, ts=T0 + offset)
+                assert await redis.observe(user, amount, device, ts=T0 + offset) == expected
+        finally:
+            await db.redis_client.aclose()
+            db.redis_client = None
+
+    asyncio.run(scenario())
+
+
+def test_client_velocity_reaches_the_model_by_default(client):
+    from conftest import auth_headers
+
+    features = {"amount": 50.0, "user_age_days": 300, "device_trust_score": 0.8, "velocity_1h": 7, "distance_from_home": 5.0}
+    for _ in range(2):
+        tx = client.post("/fraud/transactions", json={"user_id": "vel", "features": features}, headers=auth_headers()).json()
+    tx = tx["transaction"]
+    assert tx["features"]["velocity_1h"] == 7
+    assert tx["behavior"]["tx_count_1h"] == 1
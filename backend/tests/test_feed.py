@@ -0,0 +1,133 @@
+import asyncio
+import random
+
+import pytest
+
+from app.analytics import event_time
+from app.logs.feed import make_cursor, merge_newest, not_before, parse_cursor
+from app.store import MemoryEventStore, event_key
+from conftest import auth_headers
+
+
+def make_event(i: int, rng: random.Random) -> dict:
+    return {"id": f"E{i:05d}", "user_id": f"u{i % 7}", "risk_score": rng.random(), "is_fraud": rng.random() < 0.2}
+
+
+def test_merged_cursor_pages_match_reference():
+    rng = random.Random(4)
+
+    async def scenario():
+        transactions, dao_logs = MemoryEventStore("tx", 500), MemoryEventStore("dao", 500)
+        every = []
+        for i in range(300):
+            store = transactions if rng.random() < 0.7 else dao_logs
+            event = {"id": f"{store.name}-{i}", "risk_score": 0.5, "is_fraud": True}
+            await store.add(event)
+            every.append(event)
+        reference = sorted(every, key=event_key, reverse=True)
+
+        pages, cursor = [], None
+        while True:
+            page = []
+            sources = [transactions.iter_newest(before=cursor), dao_logs.iter_newest(before=cursor)]
+            async for event in merge_newest(sources):
+                page.append(event)
+                if len(page) == 25:
+                    break
+            if not page:
+                break
+            pages.extend(page)
+            cursor = parse_cursor(make_cursor(page[-1]))
+        assert pages == reference
+
+        # not_before stops at the first event older than the bound
+        start = event_time(reference[100])
+        recent = [e async for e in not_before(transactions.iter_newest(), start)]
+        assert recent == [e for e in reference[:101] if e["id"].startswith("tx-")]
+
+    asyncio.run(scenario())
+
+
+def test_memory_store_cursor_pages():
+    rng = random.Random(2)
+
+    async def scenario():
+        store = MemoryEventStore("test", 100)
+        for i in range(250):
+            await store.add(make_event(i, rng))
+        for event_id in rng.sample([f"E{i:05d}" for i in range(150, 250)], 20):
+            await store.delete(event_id)
+
+        newest = [event async for event in store.iter_newest()]
+        keys = [event_key(e) for e in newest]
+        assert keys == sorted(keys, reverse=True)
+        assert len(newest) == await store.count() == 80
+
+        # Walking cursor pages returns every event exactly once, in order
+        pages, cursor = [], None
+        while True:
+            page = []
+            async for event in store.iter_newest(before=cursor):
+                page.append(event)
+                if len(page) == 7:
+                    break
+            if not page:
+                break
+            pages.extend(page)
+            cursor = event_key(page[-1])
+        assert pages == newest
+
+        # A cursor whose event was deleted still seeks to the right place
+        gone = newest[30]
+        await store.delete(gone["id"])
+        rest = [event async for event in store.iter_newest(before=event_key(gone))]
+        assert rest == newest[31:]
+
+    asyncio.run(scenario())
+
+
+def test_store_stamps_increasing_timestamps():
+    async def scenario():
+        store = MemoryEventStore("test", 10)
+        events = [{"id": f"E{i}", "timestamp": "2001-01-01T00:00:00Z"} for i in range(5)]
+        await store.add_many(events)
+        stamps = [e["timestamp"] for e in events]
+        assert stamps == sorted(stamps) and len(set(stamps)) == 5
+        assert all(len(ts) == len("2001-01-01T00:00:00.000000Z") for ts in stamps)
+
+    asyncio.run(scenario())
+
+
+def test_cursor_round_trip_and_bad_cursors():
+    event = {"id": "TXN-1", "timestamp": "2024-01-01T00:00:00.000001Z"}
+    assert parse_cursor(make_cursor(event)) == event_key(event)
+    assert parse_cursor(None) is None
+    with pytest.raises(ValueError):
+        parse_cursor("no-comma")
+
+
+def test_logs_endpoint_filters_and_pages(client):
+    headers = auth_headers()
+    low = {"amount": 12.5, "user_age_days": 900, "device_trust_score": 0.95, "velocity_1h": 0, "distance_from_home": 2.0}
+    high = {"amount": 4800.0, "user_age_days": 3, "device_trust_score": 0.1, "velocity_1h": 9, "distance_from_home": 950.0}
+    flagged = []
+    for i in range(6):
+        body = {"user_id": f"feed-{i % 2}", "features": high if i % 3 else low}
+        tx = client.post("/fraud/transactions", json=body, headers=headers).json()["transaction"]
+        if tx["is_fraud"]:
+            flagged.append(tx["id"])
+    assert flagged
+
+    logs = client.get("/logs/?type=TRANSACTION&limit=100", headers=headers).json()["logs"]
+    # Only flagged transactions, newest first
+    ours = [log["id"] for log in logs if log["id"] in flagged]
+    assert ours == flagged[::-1]
+
+    first = client.get("/logs/?type=TRANSACTION&user_id=feed-1&limit=1", headers=headers).json()
+    assert [log["user_id"] for log in first["logs"]] == ["feed-1"]
+    rest = client.get(f"/logs/?type=TRANSACTION&user_id=feed-1&before={first['next_cursor']}", headers=headers).json()
+    assert first["logs"][0]["id"] not in [log["id"] for log in rest["logs"]]
+    assert all(log["user_id"] == "feed-1" for log in rest["logs"])
+
+    assert client.get("/logs/?type=OTHER", headers=headers).status_code == 400
+    assert client.get("/logs/?before=garbage", headers=headers).status_code == 400
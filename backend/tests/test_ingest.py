@@ -0,0 +1,158 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.fraud import ingest
+from app.fraud.ingest import IngestionPipeline, RedisStreamSource
+from app.fraud.simulator import TransactionGenerator
+
+pytest.importorskip("xgboost")
+
+
+class ListSource:
+    """Yields the given payloads with their index as ack token and records acks / nacks."""
+
+    name = "list"
+
+    def __init__(self, payloads):
+        self.payloads = payloads
+        self.acked = []
+        self.nacked = []
+
+    async def items(self):
+        for i, payload in enumerate(self.payloads):
+            yield payload, str(i)
+
+    async def ack(self, tokens):
+        self.acked.extend(tokens)
+
+    async def nack(self, entries, error):
+        self.nacked.extend(token for token, _ in entries)
+
+
+class ListStore:
+    def __init__(self, fail_batches: int = 0):
+        self.records = []
+        self.fail_batches = fail_batches
+
+    async def add_many(self, records):
+        if self.fail_batches:
+            self.fail_batches -= 1
+            raise ConnectionError("store unavailable")
+        self.records.extend(records)
+
+
+def make_pipeline(store, **kwargs) -> IngestionPipeline:
+    return IngestionPipeline(
+        store, queue_size=16, batch_size=8, workers={"parse": 2, "enrich": 3, "score": 2},
+        retry_backoff=0.001, **kwargs,
+    )
+
+
+async def run_until(pipeline, sources, done, timeout=10.0):
+    pipeline.start(sources)
+    deadline = time.monotonic() + timeout
+    try:
+        while not done() and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+    finally:
+        await pipeline.stop()
+    assert done()
+
+
+def payloads(n: int, seed: int = 1):
+    return [dict(tx, id=f"ext-{i}") for i, tx in enumerate(TransactionGenerator(users=20, seed=seed).transactions(n))]
+
+
+def test_transactions_are_stored_in_read_order():
+    store, source = ListStore(), ListSource(payloads(100))
+    pipeline = make_pipeline(store)
+    asyncio.run(run_until(pipeline, [source], lambda: len(store.records) == 100))
+    assert [r["external_id"] for r in store.records] == [f"ext-{i}" for i in range(100)]
+    assert all(0.0 <= r["risk_score"] <= 1.0 and "behavior" in r for r in store.records)
+    assert sorted(source.acked, key=int) == [str(i) for i in range(100)]
+
+
+def test_invalid_payloads_are_rejected_and_acknowledged():
+    items = payloads(5)
+    items[2] = "{not json"
+    items[3] = json.dumps({"user_id": "u1", "features": {"amount": "lots"}})
+    store, source = ListStore(), ListSource(items)
+    pipeline = make_pipeline(store)
+    asyncio.run(run_until(pipeline, [source], lambda: len(source.acked) == 5))
+    assert [r["external_id"] for r in store.records] == ["ext-0", "ext-1", "ext-4"]
+    assert pipeline.stats()["stages"]["parse"]["rejected"] == 2
+
+
+def test_failed_store_batches_are_retried_then_nacked():
+    store, source = ListStore(fail_batches=1), ListSource(payloads(20))
+    pipeline = make_pipeline(store, max_attempts=2)
+    asyncio.run(run_until(pipeline, [source], lambda: len(store.records) == 20))
+    assert pipeline.stats()["stages"]["store"]["retries"] > 0 and source.nacked == []
+
+    store, source = ListStore(fail_batches=2), ListSource(payloads(20, seed=2))
+    pipeline = make_pipeline(store, max_attempts=2)
+    stage = pipeline.stats
+    asyncio.run(run_until(pipeline, [source], lambda: len(source.acked) + len(source.nacked) == 20))
+    # The batch that failed both attempts is nacked; later items still reach the store in order
+    failed = stage()["stages"]["store"]["failed"]
+    assert failed == len(source.nacked) > 0 and len(store.records) == 20 - failed
+    ids = [int(r["external_id"].split("-")[1]) for r in store.records]
+    assert ids == sorted(ids)
+
+
+def test_broadcast_failures_are_not_nacked(monkeypatch):
+    async def broken_broadcast(message):
+        raise RuntimeError("socket gone")
+
+    monkeypatch.setattr(ingest.manager, "broadcast", broken_broadcast)
+    store, source = ListStore(), ListSource(payloads(10))
+    pipeline = make_pipeline(store, max_attempts=1)
+    asyncio.run(run_until(pipeline, [source], lambda: pipeline.stats()["stages"]["broadcast"]["failed"] == 10))
+    # Stored and acknowledged before the broadcast stage
+    assert len(store.records) == 10 and len(source.acked) == 10 and source.nacked == []
+
+
+def test_redis_source_does_not_redeliver_entries_in_flight():
+    fakeredis = pytest.importorskip("fakeredis")
+    from app import db
+
+    async def take(source, n):
+        items = []
+        generator = source.items()
+        async for payload, entry_id in generator:
+            items.append((payload, entry_id))
+            if len(items) == n:
+                break
+        await generator.aclose()
+        return items
+
+    async def scenario():
+        db.redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        try:
+            for i in range(3):
+                await db.redis_client.xadd("tx", {"data": json.dumps({"n": i})})
+            source = RedisStreamSource("tx", "ingest", consumer="w1", block_ms=10)
+            first = await take(source, 3)
+            # Read again after an error: the unacknowledged entries are still in the pipeline
+            await db.redis_client.xadd("tx", {"data": json.dumps({"n": 3})})
+            again = await take(source, 1)
+            assert [json.loads(p)["n"] for p, _ in again] == [3]
+
+            # A new process' consumer gets its pending entries back
+            restarted = RedisStreamSource("tx", "ingest", consumer="w1", block_ms=10)
+            assert [e for _, e in await take(restarted, 4)] == [e for _, e in first + again]
+
+            await source.ack([first[0][1]])
+            await source.nack([(first[1][1], first[1][0])], "ValueError: bad")
+            dead = await db.redis_client.xrange("tx:dead")
+            assert [(f["id"], f["error"]) for _, f in dead] == [(first[1][1], "ValueError: bad")]
+            pending = await db.redis_client.xpending("tx", "ingest")
+            assert pending["pending"] == 2
+        finally:
+            await db.redis_client.aclose()
+            db.redis_client = None
+
+    asyncio.run(scenario())
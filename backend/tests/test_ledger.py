@@ -0,0 +1,122 @@
+import asyncio
+import os
+import threading
+
+from app.dao.ledger import Ledger, verify_chain
+
+
+def append_all(ledger: Ledger, count: int, start: int = 0):
+    async def scenario():
+        return [await ledger.append(f"did:{i}", {"n": i}) for i in range(start, start + count)]
+    return asyncio.run(scenario())
+
+
+def test_recovers_after_torn_tail(tmp_path):
+    path = str(tmp_path / "ledger.jsonl")
+    ledger = Ledger(path, group_commit_ms=0)
+    ledger.open()
+    entries = append_all(ledger, 20)
+    ledger.close()
+
+    # A crash halfway through writing the last record
+    size = os.path.getsize(path)
+    with open(path, "r+b") as fp:
+        fp.truncate(size - 10)
+    assert verify_chain(path)["torn_tail_bytes"] > 0
+
+    ledger = Ledger(path, group_commit_ms=0)
+    ledger.open()
+    assert ledger.stats()["records"] == 19
+    assert ledger.get("did:19") is None
+    assert ledger.get("did:5") == entries[5]
+
+    # The chain continues from the last complete record
+    appended = append_all(ledger, 1, start=19)[0]
+    assert appended["seq"] == 20
+    assert appended["prev_hash"] == entries[18]["hash"]
+    ledger.close()
+    result = verify_chain(path)
+    assert result["ok"] and result["records"] == 20 and result["torn_tail_bytes"] == 0
+
+
+def test_rebuilds_index_that_does_not_match(tmp_path):
+    path = str(tmp_path / "ledger.jsonl")
+    ledger = Ledger(path, group_commit_ms=0)
+    ledger.open()
+    entries = append_all(ledger, 3000)  # grows the index past its initial capacity
+    ledger.close()
+
+    # Ledger cut back to a prefix the index no longer describes
+    with open(path, "rb") as fp:
+        lines = fp.readlines()
+    with open(path, "wb") as fp:
+        fp.writelines(lines[:1000])
+
+    ledger = Ledger(path, group_commit_ms=0)
+    ledger.open()
+    assert ledger.stats()["records"] == 1000
+    assert ledger.replayed == 1000
+    assert ledger.get("did:999") == entries[999]
+    assert ledger.get("did:1000") is None
+    ledger.close()
+
+
+def test_replays_only_records_after_the_index(tmp_path):
+    path = str(tmp_path / "ledger.jsonl")
+    ledger = Ledger(path, group_commit_ms=0)
+    ledger.open()
+    append_all(ledger, 50)
+    ledger.close()
+
+    ledger = Ledger(path, group_commit_ms=0)
+    ledger.open()
+    assert ledger.replayed == 0
+    assert ledger.get("did:49")["seq"] == 50
+    ledger.close()
+
+
+def test_concurrent_appends_write_off_the_event_loop(tmp_path):
+    path = str(tmp_path / "ledger.jsonl")
+    ledger = Ledger(path, group_commit_ms=2)
+    threads = set()
+    write = ledger._write
+
+    def recording_write(did, data):
+        threads.add(threading.get_ident())
+        return write(did, data)
+
+    ledger._write = recording_write
+
+    async def scenario():
+        entries = await asyncio.gather(*(ledger.append(f"did:{i}", {"n": i}) for i in range(50)))
+        return entries, threading.get_ident(), await ledger.lookup("did:7")
+
+    entries, loop_thread, found = asyncio.run(scenario())
+    assert loop_thread not in threads
+    assert sorted(e["seq"] for e in entries) == list(range(1, 51))
+    assert found == next(e for e in entries if e["did"] == "did:7")
+    assert ledger.stats()["fsyncs"] < 50  # group commit
+    ledger.close()
+    assert verify_chain(path)["ok"]
+
+
+def test_verify_reports_records_that_are_not_objects(tmp_path):
+    path = str(tmp_path / "ledger.jsonl")
+    ledger = Ledger(path, group_commit_ms=0)
+    ledger.open()
+    append_all(ledger, 3)
+    ledger.close()
+    with open(path, "ab") as fp:
+        fp.write(b"[1, 2]\n")
+    result = verify_chain(path)
+    assert not result["ok"] and result["records"] == 3
+    assert result["error"] == "record is not a JSON object"
+
+
+def test_blockchain_endpoint_reads_the_ledger(client):
+    from app.dao.blockchain import generate_blockchain_id
+
+    did = client.portal.call(generate_blockchain_id, {"name": "Ada"})
+    record = client.get(f"/dao/blockchain/{did}").json()["data"]
+    assert record["verified"] and record["block"] >= 1
+    assert client.get("/dao/blockchain/did:fraud:missing").status_code == 404
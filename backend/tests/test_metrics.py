@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+from app import metrics
+from app.metrics import Registry
+from app.monitoring.profiler import SamplingProfiler
+
+
+def test_exposition_text_format():
+    registry = Registry()
+    registry.counter("jobs_total", "Jobs run.", ("kind",)).labels("bulk").inc(3)
+    registry.gauge("queue_depth", "Queued items.").labels().set(2.5)
+    histogram = registry.histogram("job_seconds", "Job time.", buckets=(0.1, 1))
+    for seconds in (0.05, 0.5, 5):
+        histogram.labels().observe(seconds)
+    registry.add_collector(lambda: [("workers", "gauge", "Live workers.", [({"pool": 'a"b'}, 4)])])
+
+    lines = registry.exposition().splitlines()
+    assert "# TYPE jobs_total counter" in lines and 'jobs_total{kind="bulk"} 3' in lines
+    assert "queue_depth 2.5" in lines
+    assert 'job_seconds_bucket{le="0.1"} 1' in lines and 'job_seconds_bucket{le="1"} 2' in lines
+    assert 'job_seconds_bucket{le="+Inf"} 3' in lines and "job_seconds_count 3" in lines
+    assert 'workers{pool="a\\"b"} 4' in lines
+
+
+def test_families_must_define_their_children():
+    with pytest.raises(TypeError):
+        metrics._Family("incomplete", "No child factory.")
+
+
+def test_drained_spans_merge_into_another_process_histograms(monkeypatch):
+    monkeypatch.setattr(metrics.state, "enabled", True)
+    metrics.drain_spans()
+    metrics.observe_span("test.remote", 0.002)
+    metrics.observe_span("test.remote", 0.2)
+    drained = metrics.drain_spans()
+    assert set(drained) == {"test.remote"} and metrics.drain_spans() == {}
+
+    before = metrics.SPANS.labels("test.remote").count
+    metrics.merge_spans(drained)
+    merged = metrics.SPANS.labels("test.remote")
+    assert merged.count == before + 2 and merged.sum == pytest.approx(0.202)
+
+
+def test_profiler_samples_other_threads():
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_loop, name="busy")
+    worker.start()
+    profiler = SamplingProfiler()
+    profiler.start(interval=0.002, max_depth=16)
+    try:
+        with pytest.raises(ValueError):
+            profiler.start(interval=0.002, max_depth=16)
+        # Reading while the sampler thread is still counting
+        deadline = time.monotonic() + 5
+        while profiler.report()["samples"] < 20 and time.monotonic() < deadline:
+            profiler.folded()
+    finally:
+        profiler.stop()
+        stop.set()
+        worker.join()
+
+    report = profiler.report(limit=5)
+    assert not report["running"] and report["samples"] >= 20
+    assert any(s["stack"].startswith("busy;") for s in report["top_stacks"])
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in profiler.folded().splitlines())
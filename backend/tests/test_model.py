@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from app.fraud import model
+from app.fraud.model import FEATURE_NAMES, encode_features, predict_fraud, predict_fraud_batch
+
+pd = pytest.importorskip("pandas")
+xgb = pytest.importorskip("xgboost")
+
+TRANSACTIONS = [
+    {"amount": 12.5, "user_age_days": 900, "device_trust_score": 0.95, "velocity_1h": 0, "distance_from_home": 2.0},
+    {"amount": 4800.0, "user_age_days": 3, "device_trust_score": 0.1, "velocity_1h": 9, "distance_from_home": 950.0},
+    {"amount": 300.0, "user_age_days": 40, "device_trust_score": 0.5, "velocity_1h": 3, "distance_from_home": 60.0},
+]
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    clf = xgb.XGBClassifier()
+    clf.load_model(model.MODEL_PATH)
+    return clf
+
+
+def test_encode_features_uses_training_column_order():
+    row = encode_features(TRANSACTIONS[1])
+    assert row.dtype == np.float32 and row.shape == (1, len(FEATURE_NAMES)) and row.flags.c_contiguous
+    assert row[0].tolist() == pytest.approx([TRANSACTIONS[1][name] for name in FEATURE_NAMES])
+    # The thread's preallocated row is reused
+    assert encode_features(TRANSACTIONS[0]) is row
+
+
+def test_fast_path_matches_the_dataframe_path(classifier):
+    expected = classifier.predict_proba(pd.DataFrame(TRANSACTIONS)[FEATURE_NAMES])[:, 1]
+    single = [predict_fraud(t, explain=False)[0] for t in TRANSACTIONS]
+    batch = [score for score, _, _ in predict_fraud_batch(TRANSACTIONS)]
+    np.testing.assert_allclose(single, expected, atol=1e-6)
+    np.testing.assert_allclose(batch, expected, atol=1e-6)
+
+
+def test_explanations_list_every_feature_by_contribution():
+    _, _, explanations = predict_fraud(TRANSACTIONS[2], explain=True)
+    assert sorted(e["feature"] for e in explanations) == sorted(FEATURE_NAMES)
+    contributions = [abs(e["contribution"]) for e in explanations]
+    assert contributions == sorted(contributions, reverse=True)
+    assert {e["feature"]: e["value"] for e in explanations} == pytest.approx(TRANSACTIONS[2])
+
+
+def test_near_identical_inputs_share_a_cached_explanation(monkeypatch):
+    monkeypatch.setattr(model.settings, "EXPLAIN_CACHE_DECIMALS", 2)
+    model._explanation_cache.clear()
+    first = model.explain_fraud(TRANSACTIONS[2])
+    again = model.explain_fraud(dict(TRANSACTIONS[2], amount=300.001))
+    assert len(model._explanation_cache) == 1
+    assert [e["contribution"] for e in again] == [e["contribution"] for e in first]
+
+    # Bounded: the least recently used entries go first
+    monkeypatch.setattr(model.settings, "EXPLAIN_CACHE_SIZE", 2)
+    for amount in (1.0, 2.0, 3.0):
+        model.explain_fraud(dict(TRANSACTIONS[2], amount=amount))
+    assert len(model._explanation_cache) == 2
+    assert model._cache_key(model.active, [3.0] + [TRANSACTIONS[2][n] for n in FEATURE_NAMES[1:]]) in model._explanation_cache
+
+
+def test_explanations_only_for_flagged_or_requested_rows():
+    results = predict_fraud_batch(TRANSACTIONS, explain=[False, False, True])
+    for (_, flagged, explanations), requested in zip(results, (False, False, True)):
+        assert (explanations is not None) == (flagged or requested)
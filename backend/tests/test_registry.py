@@ -0,0 +1,128 @@
+import asyncio
+import shutil
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.fraud import model
+from app.fraud.registry import ModelRegistry
+
+xgb = pytest.importorskip("xgboost")
+
+FEATURES = [
+    {"amount": 12.5, "user_age_days": 900, "device_trust_score": 0.95, "velocity_1h": 0, "distance_from_home": 2.0},
+    {"amount": 4800.0, "user_age_days": 3, "device_trust_score": 0.1, "velocity_1h": 9, "distance_from_home": 950.0},
+    {"amount": 300.0, "user_age_days": 40, "device_trust_score": 0.5, "velocity_1h": 3, "distance_from_home": 60.0},
+]
+
+
+@pytest.fixture
+def models_dir(tmp_path, monkeypatch):
+    """A models directory holding a copy of the shipped model and a different candidate."""
+    primary = tmp_path / "fraud_model.json"
+    shutil.copy(model.MODEL_PATH, primary)
+    rng = np.random.default_rng(0)
+    X = rng.random((200, len(model.FEATURE_NAMES)), dtype=np.float32)
+    y = (X[:, 0] > 0.5).astype(int)
+    xgb.XGBClassifier(n_estimators=3, max_depth=2).fit(X, y).save_model(str(tmp_path / "candidate.json"))
+
+    previous = model.active
+    monkeypatch.setattr(model, "MODEL_PATH", str(primary))
+    monkeypatch.setattr(settings, "SCORING_EXECUTOR", "inline")
+    yield tmp_path
+    if previous is not None:
+        model.activate(previous)
+
+
+def test_reload_swaps_the_active_version(models_dir):
+    registry = ModelRegistry(max_pending_shadow=4)
+
+    async def scenario():
+        return await registry.reload(str(models_dir / "candidate.json"))
+
+    info = asyncio.run(scenario())
+    assert info["path"].endswith("candidate.json")
+    assert model.active.path == info["path"]
+    assert registry.reloads == 1 and registry.last_error is None
+
+
+def test_only_files_next_to_the_model_are_loaded(models_dir, tmp_path_factory):
+    registry = ModelRegistry(max_pending_shadow=4)
+    outside = tmp_path_factory.mktemp("elsewhere") / "fraud_model.json"
+    shutil.copy(models_dir / "fraud_model.json", outside)
+    with pytest.raises(ValueError):
+        registry._resolve(str(outside))
+    with pytest.raises(ValueError):
+        registry._resolve(str(models_dir / "missing.json"))
+
+
+def test_shadow_aggregates_score_deltas(models_dir):
+    registry = ModelRegistry(max_pending_shadow=4)
+    primary = model.load_version(str(models_dir / "fraud_model.json"))
+    X = np.vstack([model.encode_features(f).copy() for f in FEATURES])
+    primary_scores = primary.predict(X)
+    results = [(float(s), None, None) for s in primary_scores]
+
+    async def scenario():
+        await registry.set_shadow(str(models_dir / "candidate.json"))
+        registry.observe(FEATURES, results)
+        while registry.shadow_batches == 0 and registry.shadow_errors == 0:
+            await asyncio.sleep(0.01)
+        await registry.stop()
+
+    asyncio.run(scenario())
+    stats = registry.shadow_stats()
+    expected = registry.shadow.predict(X) - primary_scores
+    assert stats["batches"] == 1 and stats["rows"] == len(FEATURES) and stats["errors"] == 0
+    assert stats["mean_delta"] == pytest.approx(expected.mean(), abs=1e-6)
+    assert stats["max_abs_delta"] == pytest.approx(np.abs(expected).max(), abs=1e-6)
+    assert stats["abs_delta"]["count"] == len(FEATURES)
+
+    registry.clear_shadow()
+    assert registry.shadow_stats() is None
+    # Nothing is queued without a candidate
+    registry.observe(FEATURES, results)
+    assert registry._shadow_pending == 0
+
+
+def test_shadow_skips_batches_when_its_queue_is_full(models_dir):
+    registry = ModelRegistry(max_pending_shadow=0)
+
+    async def scenario():
+        await registry.set_shadow(str(models_dir / "candidate.json"))
+        registry.observe(FEATURES, [(0.0, None, None)] * len(FEATURES))
+
+    asyncio.run(scenario())
+    assert registry.shadow_skipped == 1 and registry.shadow_batches == 0
+
+
+def test_promote_activates_the_candidate(models_dir):
+    registry = ModelRegistry(max_pending_shadow=4)
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await registry.promote()
+        shadow = await registry.set_shadow(str(models_dir / "candidate.json"))
+        return shadow, await registry.promote()
+
+    shadow, primary = asyncio.run(scenario())
+    assert primary["sha256"] == shadow["sha256"]
+    assert registry.shadow is None and registry.reloads == 1
+
+
+def test_process_promote_refuses_a_changed_file(models_dir, monkeypatch):
+    registry = ModelRegistry(max_pending_shadow=4)
+    candidate = models_dir / "candidate.json"
+
+    async def scenario():
+        await registry.set_shadow(str(candidate))
+        # Overwritten after it was shadow-validated
+        shutil.copy(models_dir / "fraud_model.json", candidate)
+        monkeypatch.setattr(settings, "SCORING_EXECUTOR", "process")
+        with pytest.raises(RuntimeError):
+            await registry.promote()
+
+    asyncio.run(scenario())
+    assert registry.shadow is not None
+    assert registry.last_error.startswith("RuntimeError") and registry.reloads == 0
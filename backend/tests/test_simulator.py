@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from app.fraud.schemas import TransactionInput
+from app.fraud.simulator import FEATURE_COLUMNS, TransactionGenerator, generate_transactions
+
+
+def test_batch_draws_columns_of_the_requested_length():
+    columns = TransactionGenerator(users=50, seed=1).batch(1000)
+    assert {len(values) for values in columns.values()} == {1000}
+    assert set(FEATURE_COLUMNS) <= set(columns)
+    assert columns["user_id"].min() >= 1000 and columns["user_id"].max() < 1050
+    # Suspicious rows are drawn from the fraud-like ranges
+    suspicious = columns["suspicious"]
+    assert (columns["amount"][suspicious] >= 500).all() and (columns["amount"][~suspicious] <= 300).all()
+
+
+def test_zipf_users_are_skewed_and_zero_is_uniform():
+    skewed = TransactionGenerator(users=1000, zipf_s=1.1, seed=2).batch(20000)["user_id"]
+    uniform = TransactionGenerator(users=1000, zipf_s=0.0, seed=2).batch(20000)["user_id"]
+    assert np.mean(skewed == 1000) > 0.05  # the hottest user
+    assert np.mean(uniform == 1000) < 0.005
+
+
+def test_transactions_are_valid_request_bodies():
+    bodies = TransactionGenerator(users=10, devices_per_user=2, seed=3).transactions(20)
+    for body in bodies:
+        TransactionInput(**body)
+        user = body["user_id"].removeprefix("user_")
+        assert body["device_id"] in (f"dev_{user}_0", f"dev_{user}_1")
+
+
+def test_seeded_generators_repeat():
+    assert TransactionGenerator(seed=4).transactions(5) == TransactionGenerator(seed=4).transactions(5)
+
+
+def test_stream_holds_the_requested_rate():
+    async def scenario():
+        stream = generate_transactions(rate=500, generator=TransactionGenerator(seed=5), batch_size=64)
+        started = time.monotonic()
+        events = [await stream.__anext__() for _ in range(200)]
+        return events, time.monotonic() - started
+
+    events, elapsed = asyncio.run(scenario())
+    assert len({e["id"] for e in events}) == 200
+    assert 200 / 500 * 0.8 <= elapsed < 2.0
+
+
+def test_loadgen_summary_percentiles():
+    loadgen = pytest.importorskip("benchmarks.loadgen")
+    recorder = loadgen.Recorder()
+    recorder.samples.extend(float(v) for v in range(1, 101))
+    recorder.errors = 2
+    summary = recorder.summary(seconds=10.0)
+    assert summary["count"] == 100 and summary["errors"] == 2 and summary["throughput_per_s"] == 10.0
+    assert summary["latency_ms"]["p50"] == pytest.approx(50.5) and summary["latency_ms"]["max"] == 100.0
+    assert loadgen._server_time("1970-01-01T00:01:00Z") == 60.0
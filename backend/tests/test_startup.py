@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_startup import HEAVY_MODULES
+
+
+def test_importing_the_app_defers_heavy_modules():
+    code = f"import sys, app.main; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", code], cwd=backend, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
+
+
+def test_ready_once_scoring_and_face_pipelines_are_warm(client):
+    deadline = time.monotonic() + 60
+    while (response := client.get("/ready")).status_code != 200:
+        assert response.status_code == 503
+        assert set(response.json()["components"]) == {"scoring", "face"}
+        assert all(c["error"] is None for c in response.json()["components"].values())
+        assert time.monotonic() < deadline, response.json()
+        time.sleep(0.02)
+    body = response.json()
+    assert body["ready"] and all(c["ready"] and c["seconds"] is not None for c in body["components"].values())
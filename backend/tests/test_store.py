@@ -0,0 +1,60 @@
+import asyncio
+import random
+
+from app.store import MemoryEventStore, RingBuffer
+
+
+def make_event(i: int, rng: random.Random) -> dict:
+    return {"id": f"E{i:05d}", "user_id": f"u{i % 7}", "risk_score": rng.random(), "is_fraud": rng.random() < 0.2}
+
+
+def test_ring_buffer_pages_match_reference():
+    """Fenwick-tree seeks against a plain scan of the slots, with wrap-around and deletes."""
+    rng = random.Random(1)
+    capacity = 64
+    buffer = RingBuffer(capacity)
+    slots = [None] * capacity  # reference: the same slot semantics, scanned linearly
+    cursor = 0
+    for i in range(500):
+        event = {"id": f"E{i % 150}"}
+        slots = [None if e is not None and e["id"] == event["id"] else e for e in slots]
+        evicted = buffer.append(event)
+        assert evicted is slots[cursor]
+        slots[cursor] = event
+        cursor = (cursor + 1) % capacity
+        if rng.random() < 0.2:
+            live = [e for e in slots if e is not None]
+            victim = rng.choice(live)
+            assert buffer.delete(victim["id"]) is victim
+            slots[slots.index(victim)] = None
+
+        newest = [e for e in slots[cursor:] + slots[:cursor] if e is not None][::-1]
+        assert len(buffer) == len(newest)
+        for skip, limit in ((0, 10), (rng.randrange(70), rng.randrange(1, 20))):
+            assert buffer.page(skip, limit) == newest[skip:skip + limit]
+        assert list(buffer) == newest
+
+
+def test_memory_store_get_delete_and_pages():
+    rng = random.Random(2)
+
+    async def scenario():
+        store = MemoryEventStore("test", 100)
+        for i in range(250):
+            await store.add(make_event(i, rng))
+        # Only the newest `capacity` events are kept
+        assert await store.count() == 100
+        assert await store.get("E00149") is None
+        assert (await store.get("E00200"))["id"] == "E00200"
+
+        assert await store.delete("E00200")
+        assert not await store.delete("E00200")
+        assert await store.get("E00200") is None
+
+        newest = [f"E{i:05d}" for i in range(249, 149, -1) if i != 200]
+        assert [e["id"] for e in await store.page(0, 10)] == newest[:10]
+        assert [e["id"] for e in await store.page(45, 10)] == newest[45:55]
+        assert await store.page(200, 10) == []
+        assert await store.count() == len(newest)
+
+    asyncio.run(scenario())
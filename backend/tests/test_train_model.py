@@ -0,0 +1,56 @@
+import json
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("xgboost")
+pytest.importorskip("sklearn")
+
+import train_model
+from train_model import FEATURE_NAMES
+
+
+def test_synthetic_chunks_are_deterministic_per_chunk():
+    chunks = list(train_model.synthetic_chunks(2500, chunk_rows=1000, seed=7))
+    assert [len(y) for _, y in chunks] == [1000, 1000, 500]
+    X, y = chunks[1]
+    assert X.dtype == np.float32 and X.shape == (1000, len(FEATURE_NAMES)) and y.dtype == np.int8
+    again = list(train_model.synthetic_chunks(2500, chunk_rows=1000, seed=7))[1]
+    np.testing.assert_array_equal(again[0], X)
+    np.testing.assert_array_equal(again[1], y)
+    # Roughly the same fraud rate as the demo data
+    assert 0.0 < y.mean() < 0.5
+
+
+def test_csv_shards_read_back_as_the_generated_chunks(tmp_path):
+    paths = train_model.write_synthetic_shards(1500, str(tmp_path), fmt="csv", chunk_rows=1000)
+    assert len(paths) == 2
+    read = list(train_model.shard_chunks(paths, chunk_rows=600))
+    X = np.concatenate([X for X, _ in read])
+    y = np.concatenate([y for _, y in read])
+    generated = list(train_model.synthetic_chunks(1500, chunk_rows=1000))
+    np.testing.assert_allclose(X, np.concatenate([X for X, _ in generated]), rtol=1e-6)
+    np.testing.assert_array_equal(y, np.concatenate([y for _, y in generated]))
+
+
+def test_train_scalable_writes_the_model_and_report(tmp_path):
+    model_path = str(tmp_path / "fraud_model.json")
+    report = train_model.train_scalable(
+        lambda: train_model.synthetic_chunks(4000, chunk_rows=1000),
+        model_path, ["synthetic:4000"], num_boost_round=20, early_stopping_rounds=5,
+    )
+    assert report["train_rows"] + report["valid_rows"] == 4000
+    assert report["valid_metrics"]["rows"] == report["valid_rows"]
+    assert report["best_iteration"] < 20
+    with open(tmp_path / "fraud_model.report.json") as fp:
+        assert json.load(fp)["best_iteration"] == report["best_iteration"]
+
+    from app.fraud.model import ModelVersion
+    version = ModelVersion(model_path, "xgboost")
+    assert version.predict(np.zeros((1, len(FEATURE_NAMES)), dtype=np.float32)).shape == (1,)
+
+
+def test_peak_rss_is_none_without_the_resource_module(monkeypatch):
+    monkeypatch.setitem(sys.modules, "resource", None)
+    assert train_model.peak_rss_mb() is None
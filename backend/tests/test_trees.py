@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.fraud.model import MODEL_PATH
+
+xgb = pytest.importorskip("xgboost")
+shap = pytest.importorskip("shap")
+
+from app.fraud.trees import TreeEnsemble  # noqa: E402
+from benchmarks.bench_trees import random_matrix  # noqa: E402
+
+pytestmark = pytest.mark.skipif(not os.path.exists(MODEL_PATH), reason="train_model.py has not been run")
+
+
+@pytest.fixture(scope="module")
+def models():
+    clf = xgb.XGBClassifier()
+    clf.load_model(MODEL_PATH)
+    return clf, shap.TreeExplainer(clf), TreeEnsemble.from_json(MODEL_PATH)
+
+
+@pytest.fixture(scope="module")
+def X():
+    X = random_matrix(np.random.default_rng(7), 5000)
+    X[:100, 2] = np.nan  # missing values take each split's default direction
+    return X
+
+
+def test_probabilities_match_xgboost(models, X):
+    clf, _, ensemble = models
+    np.testing.assert_allclose(ensemble.predict_proba(X), clf.predict_proba(X)[:, 1], atol=1e-6)
+
+
+def test_shap_values_match_tree_explainer(models, X):
+    _, explainer, ensemble = models
+    np.testing.assert_allclose(ensemble.shap_values(X[:1000]), explainer.shap_values(X[:1000]), atol=1e-5)
+
+
+def test_single_row(models, X):
+    clf, explainer, ensemble = models
+    row = X[:1]
+    np.testing.assert_allclose(ensemble.predict_proba(row), clf.predict_proba(row)[:, 1], atol=1e-6)
+    np.testing.assert_allclose(ensemble.shap_values(row), explainer.shap_values(row), atol=1e-5)
+
+
+def test_numpy_backend_serves_without_xgboost(monkeypatch):
+    from app.fraud import model
+
+    monkeypatch.setattr(model.settings, "SCORING_BACKEND", "numpy")
+    version = model.load_version(MODEL_PATH)
+    assert version.ensemble is not None and version.booster is None and version.explainer is None
+    row = model.encode_features(model.WARMUP_TRANSACTION).copy()
+    clf = xgb.XGBClassifier()
+    clf.load_model(MODEL_PATH)
+    np.testing.assert_allclose(version.predict(row), clf.predict_proba(row)[:, 1], atol=1e-6)
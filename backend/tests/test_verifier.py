@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.dao.verifier import FaceVerifier, VerifierBusy
+
+pytest.importorskip("cv2")
+
+
+def test_admission_refuses_past_max_pending():
+    async def scenario():
+        verifier = FaceVerifier(workers=2, max_pending=2)
+        try:
+            async with verifier.admitted(), verifier.admitted():
+                assert verifier.in_flight == 2
+                with pytest.raises(VerifierBusy) as busy:
+                    async with verifier.admitted():
+                        pass
+                assert busy.value.max_pending == 2 and busy.value.queue_position == 2
+            async with verifier.admitted():
+                pass
+        finally:
+            verifier.shutdown()
+        return verifier.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["in_flight"] == 0 and stats["completed"] == 3 and stats["rejected"] == 1
+
+
+def test_compare_runs_both_images_on_the_pool(monkeypatch):
+    from app.dao import face_detect
+
+    threads = []
+
+    def extract_face(img_bytes, timings=None):
+        threads.append(threading.current_thread().name)
+        return None, "No face detected" if img_bytes == b"blank" else "Failed to decode image", None
+
+    monkeypatch.setattr(face_detect, "extract_face", extract_face)
+
+    async def scenario():
+        verifier = FaceVerifier(workers=2, max_pending=2)
+        try:
+            async with verifier.admitted():
+                return await verifier.compare(b"blank", b"junk")
+        finally:
+            verifier.shutdown()
+
+    result = asyncio.run(scenario())
+    assert result == {"match": False, "score": 0.0, "error": "Image 1: No face detected"}
+    assert len(threads) == 2 and all(name.startswith("face") for name in threads)
+
+
+def test_verify_endpoint_answers_503_when_full(client, monkeypatch):
+    from app.dao.verifier import face_verifier
+
+    files = {"id_image": ("id.jpg", b"junk"), "camera_image": ("cam.jpg", b"junk")}
+    form = {"fullname": "Ada", "dob": "1990-01-01"}
+    response = client.post("/dao/verify", files=files, data=form)
+    assert response.status_code == 400 and response.json()["detail"].startswith("Image 1")
+
+    monkeypatch.setattr(face_verifier, "max_pending", 0)
+    response = client.post("/dao/verify", files=files, data=form)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert response.json()["detail"]["queue_position"] == 1
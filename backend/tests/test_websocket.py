@@ -0,0 +1,146 @@
+import asyncio
+import json
+
+import pytest
+
+from app.websocket.manager import ConnectionManager
+
+
+class FakeSocket:
+    """Records frames; a closed gate holds the sender task like a slow network."""
+
+    def __init__(self, fail: bool = False):
+        self.frames = []
+        self.fail = fail
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        await self.gate.wait()
+        if self.fail:
+            raise RuntimeError("connection reset")
+        self.frames.append(json.loads(text))
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_slow_client_drops_its_oldest_messages_only():
+    async def scenario():
+        manager = ConnectionManager(queue_size=2)
+        fast, slow = FakeSocket(), FakeSocket()
+        slow.gate.clear()
+        await manager.connect(fast)
+        await manager.connect(slow)
+        await settle()
+
+        for i in range(5):
+            await manager.broadcast({"n": i})
+            await settle()
+        assert [frame["n"] for frame in fast.frames] == [0, 1, 2, 3, 4]
+
+        # The first message is stuck in send_text; the queue kept the newest two
+        slow.gate.set()
+        await settle()
+        assert [frame["n"] for frame in slow.frames] == [0, 3, 4]
+        assert manager.stats()["messages_dropped"] == 2
+        assert manager.stats()["connections"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_disconnect_policy_closes_laggards():
+    async def scenario():
+        manager = ConnectionManager(queue_size=1, slow_client_policy="disconnect")
+        slow = FakeSocket()
+        slow.gate.clear()
+        await manager.connect(slow)
+        await settle()
+        for i in range(3):
+            await manager.broadcast({"n": i})
+        await settle()
+        assert manager.stats()["connections"] == 0
+        assert manager.stats()["slow_disconnects"] == 1
+        assert slow.closed_with == 1013
+
+    asyncio.run(scenario())
+
+
+def test_dead_sockets_are_pruned():
+    async def scenario():
+        manager = ConnectionManager()
+        dead, alive = FakeSocket(fail=True), FakeSocket()
+        await manager.connect(dead)
+        await manager.connect(alive)
+        await manager.broadcast({"n": 1})
+        await settle()
+        assert manager.active_connections == [alive]
+        assert manager.stats()["send_failures"] == 1
+        await manager.broadcast({"n": 2})
+        await settle()
+        assert [frame["n"] for frame in alive.frames] == [1, 2]
+
+    asyncio.run(scenario())
+
+
+def test_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        ConnectionManager(slow_client_policy="ignore")
+
+
+def test_subscriptions_filter_strip_and_coalesce():
+    from app.fraud.schemas import StreamSubscription
+
+    async def scenario():
+        manager = ConnectionManager()
+        everything, flagged = FakeSocket(), FakeSocket()
+        await manager.connect(everything)
+        await manager.connect(flagged)
+        manager.subscribe(flagged, StreamSubscription(flagged_only=True, min_risk=0.5, summary_only=True, batch_ms=20))
+
+        events = [
+            {"id": "T1", "user_id": "u1", "risk_score": 0.9, "is_fraud": True, "explanations": [{"feature": "amount"}]},
+            {"id": "T2", "user_id": "u1", "risk_score": 0.2, "is_fraud": False, "explanations": None},
+            {"id": "T3", "user_id": "u2", "risk_score": 0.7, "is_fraud": True, "explanations": []},
+            {"action": "delete", "id": "T2"},
+        ]
+        for event in events:
+            await manager.broadcast(event)
+        await settle()
+        assert everything.frames == events
+        assert flagged.frames == []  # still inside the batch tick
+
+        await asyncio.sleep(0.05)
+        assert flagged.frames == [{"action": "batch", "events": [
+            {"id": "T1", "user_id": "u1", "risk_score": 0.9, "is_fraud": True},
+            {"id": "T3", "user_id": "u2", "risk_score": 0.7, "is_fraud": True},
+            {"action": "delete", "id": "T2"},
+        ]}]
+
+    asyncio.run(scenario())
+
+
+def test_stream_endpoint_accepts_a_subscription(client):
+    from conftest import auth_headers
+
+    token = auth_headers()["Authorization"].split()[1]
+    with client.websocket_connect(f"/fraud/stream?token={token}") as ws:
+        ws.send_text(json.dumps({"action": "subscribe", "user_ids": ["ws-user"], "batch_ms": 0}))
+        assert ws.receive_json()["action"] == "subscribed"
+        ws.send_text(json.dumps({"action": "subscribe", "batch_ms": -1}))
+        assert ws.receive_json()["action"] == "error"
+
+        features = {"amount": 10.0, "user_age_days": 500, "device_trust_score": 0.9, "velocity_1h": 0, "distance_from_home": 1.0}
+        headers = auth_headers()
+        client.post("/fraud/transactions", json={"user_id": "someone-else", "features": features}, headers=headers)
+        tx = client.post("/fraud/transactions", json={"user_id": "ws-user", "features": features}, headers=headers).json()
+        assert ws.receive_json()["id"] == tx["transaction"]["id"]
@@ -1,9 +1,32 @@
+import argparse
+import gc
+import glob
 import json
+import os
+import sys
+import tempfile
+import time
 import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
+import xgboost as xgb
 from xgboost import XGBClassifier
-import os
+
+FEATURE_NAMES = ['amount', 'user_age_days', 'device_trust_score', 'velocity_1h', 'distance_from_home']
+LABEL = 'is_fraud'
+
+def fraud_labels(amount, velocity_1h, distance, device_trust, noise):
+    # Simple logic for fraud: High amount + high velocity + far away + low device trust
+    fraud_prob = (
+        (amount > 500) * 0.3 +
+        (velocity_1h > 5) * 0.3 +
+        (distance > 500) * 0.2 +
+        (device_trust < 0.3) * 0.4
+    )
+
+    # Add some noise
+    fraud_prob = fraud_prob + noise
+    return (fraud_prob > 0.6).astype(np.int8)
 
 # Create dummy transaction dataset
 def generate_synthetic_data(num_samples=5000):
@@ -22,30 +45,226 @@ def generate_synthetic_data(num_samples=5000):
         'velocity_1h': velocity_1h,
         'distance_from_home': distance
     })
+    noise = np.random.normal(0, 0.1, size=num_samples)
+    df['is_fraud'] = fraud_labels(amount, velocity_1h, distance, device_trust, noise).astype(int)
 
-    # Simple logic for fraud: High amount + high velocity + far away + low device trust
-    fraud_prob = (
-        (df['amount'] > 500).astype(int) * 0.3 + 
-        (df['velocity_1h'] > 5).astype(int) * 0.3 + 
-        (df['distance_from_home'] > 500).astype(int) * 0.2 + 
-        (df['device_trust_score'] < 0.3).astype(int) * 0.4
-    )
-    
-    # Add some noise
-    fraud_prob += np.random.normal(0, 0.1, size=num_samples)
-    df['is_fraud'] = (fraud_prob > 0.6).astype(int)
-    
     return df
 
+def synthetic_chunks(num_samples, chunk_rows=1_000_000, seed=42):
+    """
+    Same distribution as generate_synthetic_data, generated chunk by chunk as
+    (float32 X in FEATURE_NAMES order, int8 y), so any number of rows fits in
+    memory. Chunk i always has the same rows for a given seed.
+    """
+    for index, start in enumerate(range(0, num_samples, chunk_rows)):
+        n = min(chunk_rows, num_samples - start)
+        rng = np.random.default_rng([seed, index])
+        X = np.empty((n, len(FEATURE_NAMES)), dtype=np.float32)
+        X[:, 0] = rng.exponential(scale=100, size=n)
+        X[:, 1] = rng.integers(1, 3650, size=n)
+        X[:, 2] = rng.uniform(0.1, 1.0, size=n)
+        X[:, 3] = rng.poisson(lam=2, size=n)
+        X[:, 4] = rng.exponential(scale=50, size=n)
+        y = fraud_labels(X[:, 0], X[:, 3], X[:, 4], X[:, 2], rng.normal(0, 0.1, size=n))
+        yield X, y
+
+def write_synthetic_shards(num_samples, out_dir, fmt='parquet', chunk_rows=1_000_000, seed=42):
+    """Writes synthetic_chunks as one Parquet / CSV shard per chunk (part-00000.<fmt>, ...)."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for index, (X, y) in enumerate(synthetic_chunks(num_samples, chunk_rows, seed)):
+        df = pd.DataFrame(X, columns=FEATURE_NAMES)
+        df[LABEL] = y
+        path = os.path.join(out_dir, f'part-{index:05d}.{fmt}')
+        if fmt == 'parquet':
+            df.to_parquet(path, index=False)  # needs pyarrow
+        else:
+            df.to_csv(path, index=False)
+        paths.append(path)
+        print(f"Wrote {path} ({len(df)} rows)")
+    return paths
+
+def shard_chunks(paths, chunk_rows=1_000_000):
+    """(X, y) chunks read from Parquet / CSV shards without loading a whole shard."""
+    columns = FEATURE_NAMES + [LABEL]
+    for path in paths:
+        if path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            batches = (b.to_pandas() for b in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns))
+        else:
+            batches = pd.read_csv(path, usecols=columns, chunksize=chunk_rows)
+        for df in batches:
+            yield df[FEATURE_NAMES].to_numpy(dtype=np.float32), df[LABEL].to_numpy(dtype=np.int8)
+
+class ChunkIter(xgb.DataIter):
+    """
+    Feeds XGBoost one chunk at a time. Each chunk's rows are split into train /
+    validation with a generator seeded by the chunk number, so every pass
+    (XGBoost iterates more than once) sees the same split.
+    """
+
+    def __init__(self, make_chunks, part, valid_fraction, seed=42, cache_prefix=None):
+        self.make_chunks = make_chunks
+        self.part = part  # 'train' or 'valid'
+        self.valid_fraction = valid_fraction
+        self.seed = seed
+        self.rows = 0
+        self._chunks = None
+        self._index = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def reset(self):
+        self._chunks = None
+        self._index = 0
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = iter(self.make_chunks())
+            self.rows = 0
+        for X, y in self._chunks:
+            in_valid = np.random.default_rng([self.seed, self._index]).random(len(y)) < self.valid_fraction
+            self._index += 1
+            keep = in_valid if self.part == 'valid' else ~in_valid
+            if not keep.any():
+                continue
+            self.rows += int(keep.sum())
+            input_data(data=X[keep], label=y[keep], feature_names=FEATURE_NAMES)
+            return 1
+        return 0
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None where it isn't available (Windows)."""
+    try:
+        import resource  # Unix only
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, KB on Linux
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+def validation_metrics(booster, make_chunks, valid_fraction, seed):
+    """Streams the validation rows once: confusion counts at 0.5 plus AUC."""
+    it = ChunkIter(make_chunks, 'valid', valid_fraction, seed)
+    scores, labels = [], []
+
+    def collect(data, label, feature_names):
+        scores.append(booster.inplace_predict(data))
+        labels.append(label)
+
+    while it.next(collect):
+        pass
+    scores, labels = np.concatenate(scores), np.concatenate(labels)
+    predicted = scores > 0.5
+    tp = int((predicted & (labels == 1)).sum())
+    fp = int((predicted & (labels == 0)).sum())
+    fn = int((~predicted & (labels == 1)).sum())
+    from sklearn.metrics import roc_auc_score
+    return {
+        'rows': int(len(labels)),
+        'fraud_rate': float(labels.mean()),
+        'accuracy': float((predicted == (labels == 1)).mean()),
+        'precision': tp / (tp + fp) if tp + fp else 0.0,
+        'recall': tp / (tp + fn) if tp + fn else 0.0,
+        'auc': float(roc_auc_score(labels, scores)) if 0 < labels.sum() < len(labels) else None,
+    }
+
+def train_scalable(make_chunks, model_path, sources, valid_fraction=0.1, num_boost_round=1000,
+                   early_stopping_rounds=20, max_depth=4, learning_rate=0.1, max_bin=256,
+                   external_memory=False, seed=42):
+    """
+    Trains with tree_method=hist on all cores from a stream of (X, y) chunks,
+    with early stopping on a held-out fraction of every chunk. By default the
+    chunks are quantized into a QuantileDMatrix (about one byte per value, raw
+    chunks are dropped as they are consumed); with external_memory the pages
+    are cached on disk instead. Writes the model and <model>.report.json.
+    """
+    started = time.perf_counter()
+    cache_dir = tempfile.mkdtemp(prefix='xgb-cache-') if external_memory else None
+    cache = (lambda name: os.path.join(cache_dir, name)) if external_memory else (lambda name: None)
+    train_iter = ChunkIter(make_chunks, 'train', valid_fraction, seed, cache_prefix=cache('train'))
+    valid_iter = ChunkIter(make_chunks, 'valid', valid_fraction, seed, cache_prefix=cache('valid'))
+    if external_memory:
+        dtrain = xgb.DMatrix(train_iter)
+        dvalid = xgb.DMatrix(valid_iter)
+    else:
+        dtrain = xgb.QuantileDMatrix(train_iter, max_bin=max_bin)
+        dvalid = xgb.QuantileDMatrix(valid_iter, ref=dtrain)
+    load_seconds = time.perf_counter() - started
+    print(f"Loaded {train_iter.rows} train / {valid_iter.rows} validation rows in {load_seconds:.1f}s")
+
+    params = {
+        'objective': 'binary:logistic',
+        'eval_metric': ['auc', 'logloss'],
+        'tree_method': 'hist',
+        'max_bin': max_bin,
+        'max_depth': max_depth,
+        'learning_rate': learning_rate,
+        'nthread': os.cpu_count() or 1,
+        'seed': seed,
+    }
+    evals_result = {}
+    fit_started = time.perf_counter()
+    # Stop on validation logloss explicitly: by default XGBoost watches the last
+    # eval_metric, and AUC can peak after a single tree of a badly calibrated model
+    early_stopping = xgb.callback.EarlyStopping(
+        rounds=early_stopping_rounds, metric_name='logloss', data_name='valid', save_best=False,
+    )
+    booster = xgb.train(
+        params, dtrain, num_boost_round=num_boost_round,
+        evals=[(dtrain, 'train'), (dvalid, 'valid')], evals_result=evals_result,
+        callbacks=[early_stopping], verbose_eval=50,
+    )
+    train_seconds = time.perf_counter() - fit_started
+    # The DMatrices hold the external-memory cache files open until freed
+    del dtrain, dvalid
+    gc.collect()
+    # Keep only the rounds up to the best validation logloss
+    best_iteration = getattr(booster, 'best_iteration', num_boost_round - 1)
+    booster = booster[:best_iteration + 1]
+
+    os.makedirs(os.path.dirname(model_path) or '.', exist_ok=True)
+    booster.save_model(model_path)
+
+    metrics = validation_metrics(booster, make_chunks, valid_fraction, seed)
+    peak_rss = peak_rss_mb()
+    report = {
+        'model_path': model_path,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'sources': sources,
+        'external_memory': external_memory,
+        'train_rows': train_iter.rows,
+        'valid_rows': valid_iter.rows,
+        'params': params,
+        'num_boost_round': num_boost_round,
+        'early_stopping_rounds': early_stopping_rounds,
+        'best_iteration': best_iteration,
+        'load_seconds': round(load_seconds, 3),
+        'train_seconds': round(train_seconds, 3),
+        'total_seconds': round(time.perf_counter() - started, 3),
+        'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+        'valid_logloss': evals_result['valid']['logloss'][best_iteration],
+        'valid_metrics': metrics,
+    }
+    report_path = os.path.splitext(model_path)[0] + '.report.json'
+    with open(report_path, 'w') as fp:
+        json.dump(report, fp, indent=2)
+    print(f"Model saved to {model_path}, report in {report_path}")
+    print(f"Validation AUC {metrics['auc']}, accuracy {metrics['accuracy']:.4f}, best iteration {best_iteration}")
+
+    if cache_dir:
+        import shutil
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return report
+
 def train_and_save():
     print("Generating synthetic data...")
     df = generate_synthetic_data(10000)
-    
+
     X = df.drop('is_fraud', axis=1)
     y = df['is_fraud']
-    
+
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
+
     print("Training XGBoost model...")
     model = XGBClassifier(
         n_estimators=100,
@@ -55,14 +274,70 @@ def train_and_save():
         eval_metric='logloss'
     )
     model.fit(X_train, y_train)
-    
+
     accuracy = model.score(X_test, y_test)
     print(f"Model accuracy on test set: {accuracy:.4f}")
-    
+
     os.makedirs('app/models', exist_ok=True)
     model_path = 'app/models/fraud_model.json'
     model.save_model(model_path)
     print(f"Model saved to {model_path}")
 
+def main():
+    parser = argparse.ArgumentParser(
+        description="Train the fraud model. Without a command: the 10k-row demo model.",
+        epilog=(
+            "examples:\n"
+            "  python train_model.py synthetic --rows 50000000 --out data/train\n"
+            "  python train_model.py train --data 'data/train/*.parquet'\n"
+            "  python train_model.py train --synthetic-rows 20000000 --external-memory"
+        ),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    commands = parser.add_subparsers(dest='command')
+
+    synthetic = commands.add_parser('synthetic', help='write synthetic Parquet / CSV shards')
+    synthetic.add_argument('--rows', type=int, required=True)
+    synthetic.add_argument('--out', required=True, help='output directory')
+    synthetic.add_argument('--format', choices=('parquet', 'csv'), default='parquet')
+    synthetic.add_argument('--chunk-rows', type=int, default=1_000_000, help='rows per shard')
+    synthetic.add_argument('--seed', type=int, default=42)
+
+    train = commands.add_parser('train', help='out-of-core training on shards (or generated data)')
+    source = train.add_mutually_exclusive_group(required=True)
+    source.add_argument('--data', nargs='+', help='Parquet / CSV files or glob patterns')
+    source.add_argument('--synthetic-rows', type=int, help='stream this many generated rows instead')
+    train.add_argument('--out', default='app/models/fraud_model.json', help='model path')
+    train.add_argument('--chunk-rows', type=int, default=1_000_000)
+    train.add_argument('--valid-fraction', type=float, default=0.1)
+    train.add_argument('--num-boost-round', type=int, default=1000)
+    train.add_argument('--early-stopping-rounds', type=int, default=20)
+    train.add_argument('--max-depth', type=int, default=4)
+    train.add_argument('--learning-rate', type=float, default=0.1)
+    train.add_argument('--max-bin', type=int, default=256)
+    train.add_argument('--external-memory', action='store_true', help='cache quantized pages on disk')
+    train.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if args.command == 'synthetic':
+        write_synthetic_shards(args.rows, args.out, args.format, args.chunk_rows, args.seed)
+    elif args.command == 'train':
+        if args.data:
+            paths = sorted(p for pattern in args.data for p in (glob.glob(pattern) or [pattern]))
+            make_chunks = lambda: shard_chunks(paths, args.chunk_rows)
+            sources = paths
+        else:
+            make_chunks = lambda: synthetic_chunks(args.synthetic_rows, args.chunk_rows, args.seed)
+            sources = [f'synthetic:{args.synthetic_rows}']
+        train_scalable(
+            make_chunks, args.out, sources,
+            valid_fraction=args.valid_fraction, num_boost_round=args.num_boost_round,
+            early_stopping_rounds=args.early_stopping_rounds, max_depth=args.max_depth,
+            learning_rate=args.learning_rate, max_bin=args.max_bin,
+            external_memory=args.external_memory, seed=args.seed,
+        )
+    else:
+        train_and_save()
+
 if __name__ == "__main__":
-    train_and_save()
+    main()
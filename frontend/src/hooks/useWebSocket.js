@@ -8,7 +8,10 @@ const useWebSocket = (url) => {
 
     const connect = useCallback(() => {
         try {
-            ws.current = new WebSocket(url);
+            // Browsers can't send an Authorization header on a WebSocket, so the token rides in the query string
+            const token = localStorage.getItem('token');
+            const authedUrl = token ? `${url}${url.includes('?') ? '&' : '?'}token=${encodeURIComponent(token)}` : url;
+            ws.current = new WebSocket(authedUrl);
 
             ws.current.onopen = () => {
                 setIsConnected(true);
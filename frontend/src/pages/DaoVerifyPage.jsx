@@ -111,6 +111,17 @@ const DaoVerifyPage = () => {
                             )}
                         </div>
 
+                        {result.duplicate_suspected && (
+                            <div style={{ marginTop: '16px', color: 'var(--danger)' }}>
+                                <span style={{ fontSize: '0.85rem', fontWeight: 'bold' }}>Possible duplicate enrollment</span>
+                                {result.similar_identities.map((match) => (
+                                    <div key={match.blockchain_did} style={{ fontSize: '0.85rem' }}>
+                                        {match.name} ({(match.similarity * 100).toFixed(1)}% similar)
+                                    </div>
+                                ))}
+                            </div>
+                        )}
+
                         <button className="btn-primary" style={{ marginTop: '24px' }} onClick={() => { setResult(null); setImgSrc(null); setIdFile(null); }}>
                             Verify Another Identity
                         </button>
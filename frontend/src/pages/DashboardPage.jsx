@@ -45,6 +45,19 @@ const DashboardPage = () => {
         }
     }, [wsData]);
 
+    // Non-flagged transactions arrive without SHAP explanations; fetch them on demand
+    const latestTx = transactions[0];
+    useEffect(() => {
+        if (!latestTx || latestTx.explanations) return;
+        client.get(`/fraud/transactions/${latestTx.id}/explanations`)
+            .then(res => {
+                setTransactions(prev => prev.map(tx =>
+                    tx.id === latestTx.id ? { ...tx, explanations: res.data.explanations } : tx
+                ));
+            })
+            .catch(err => console.error(`Failed to load explanations for ${latestTx.id}`, err));
+    }, [latestTx?.id]);
+
     const handleDelete = async (txId) => {
         try {
             await client.delete(`/fraud/transactions/${txId}`);
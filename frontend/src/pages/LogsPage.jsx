@@ -10,7 +10,7 @@ const LogsPage = () => {
     const [loadingMore, setLoadingMore] = useState(false);
     const [searchTerm, setSearchTerm] = useState('');
     const [selectedLog, setSelectedLog] = useState(null);
-    const [skip, setSkip] = useState(0);
+    const [cursor, setCursor] = useState(null);
     const [hasMore, setHasMore] = useState(true);
     const LIMIT = 50;
 
@@ -21,24 +21,28 @@ const LogsPage = () => {
             .catch(err => console.error("Error loading analytics", err));
 
         // Fetch initial logs
-        fetchLogs(0);
+        fetchLogs(null);
     }, []);
 
-    const fetchLogs = (currentSkip) => {
-        const isInitial = currentSkip === 0;
+    const fetchLogs = (before) => {
+        const isInitial = before === null;
         if (!isInitial) setLoadingMore(true);
 
-        client.get(`/logs?skip=${currentSkip}&limit=${LIMIT}`)
+        const params = { limit: LIMIT };
+        if (before) params.before = before;
+
+        client.get('/logs', { params })
             .then(res => {
                 const newLogs = res.data.logs;
+                setCursor(res.data.next_cursor);
                 if (isInitial) {
                     setLogs(newLogs);
                 } else {
                     setLogs(prev => [...prev, ...newLogs]);
                 }
 
-                // If we received less than the limit, we've reached the end
-                if (newLogs.length < LIMIT) {
+                // No cursor means we've reached the end
+                if (!res.data.next_cursor) {
                     setHasMore(false);
                 }
 
@@ -53,9 +57,7 @@ const LogsPage = () => {
     };
 
     const handleLoadMore = () => {
-        const nextSkip = skip + LIMIT;
-        setSkip(nextSkip);
-        fetchLogs(nextSkip);
+        fetchLogs(cursor);
     };
 
     const filteredLogs = logs.filter(log =>